@@ -0,0 +1,430 @@
+# Chronic-absence analytics for School Attendance System
+# Loads a date range of attendance, live and archived, into a NumPy matrix
+# of status codes (students x days) and computes absence rates, absence
+# streaks, trends and class percentiles over whole arrays at once. Loaded
+# matrices stay cached per process and are kept current from
+# report_versions: a saved day reloads only that class and month, a
+# roster change only that class's rows, and a later end date only the
+# new days.
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Optional
+
+import numpy as np
+
+from constants import (
+    STATUS_ABSENT, ANALYTICS_CHRONIC_RATE, ANALYTICS_STREAK_ALERT, ANALYTICS_TREND_DAYS, ANALYTICS_RISE,
+    ANALYTICS_CACHE_SIZE
+)
+from database import execute_query, partition_source
+from report_cache import ALL_MONTHS
+from reports import STATUS_CODES, month_bounds
+
+ABSENT = STATUS_CODES[STATUS_ABSENT]
+PERCENTILES = (10, 25, 50, 75, 90)
+_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)  # the four codes of a packed archive byte
+
+
+class AttendanceMatrix:
+    """Status codes (see reports.STATUS_CODES) for students x calendar days.
+
+    ``cells[i, j]`` is ``students[i]`` on ``start + j`` days; rows are in
+    student id order and ``class_ids[i]`` is the student's class.
+    ``versions`` is the report_versions snapshot the cells reflect.
+    """
+
+    def __init__(self, start: date, end: date, class_id: Optional[int]):
+        self.start = start
+        self.end = end
+        self.class_id = class_id
+        self.students = np.empty(0, np.int64)
+        self.class_ids = np.empty(0, np.int64)
+        self.cells = np.zeros((0, (end - start).days + 1), np.uint8)
+        self.versions: Optional[dict[tuple[str, int], int]] = None  # None until loaded
+        self.lock = threading.Lock()
+
+
+def _months(start: date, end: date) -> list[str]:
+    """The YYYY-MM months from start to end, inclusive."""
+    first, last = start.year * 12 + start.month - 1, end.year * 12 + end.month - 1
+    return [f"{n // 12:04d}-{n % 12 + 1:02d}" for n in range(first, last + 1)]
+
+
+def _row_index(students: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Row of each id in the sorted ``students`` array, or -1."""
+    if not len(students):
+        return np.full(len(ids), -1, np.int64)
+    rows = np.searchsorted(students, ids)
+    rows[rows == len(students)] = 0
+    return np.where(students[rows] == ids, rows, -1)
+
+
+def _versions(matrix: AttendanceMatrix) -> dict[tuple[str, int], int]:
+    rows = execute_query("""
+        SELECT month, class_id, version FROM report_versions
+        WHERE (month BETWEEN ? AND ? OR month = ?) AND (? IS NULL OR class_id = ?)
+    """, (matrix.start.isoformat()[:7], matrix.end.isoformat()[:7], ALL_MONTHS, matrix.class_id, matrix.class_id),
+        readonly=True)
+    return {(month, class_id): version for month, class_id, version in rows}
+
+
+def _load_roster(matrix: AttendanceMatrix) -> None:
+    """Reread the students, keeping the loaded cells of those still enrolled."""
+    if matrix.class_id is None:
+        rows = execute_query("SELECT id, class_id FROM students ORDER BY id", readonly=True)
+    else:
+        rows = execute_query("SELECT id, class_id FROM students WHERE class_id = ? ORDER BY id",
+                             (matrix.class_id,), readonly=True)
+    students = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+    cells = np.zeros((len(students), matrix.cells.shape[1]), np.uint8)
+    old = _row_index(matrix.students, students)
+    kept = old >= 0
+    cells[kept] = matrix.cells[old[kept]]
+    matrix.students = students
+    matrix.class_ids = np.fromiter((row[1] for row in rows), np.int64, len(rows))
+    matrix.cells = cells
+
+
+def _load_month(matrix: AttendanceMatrix, month: str, class_id: Optional[int] = None,
+                since: Optional[date] = None) -> None:
+    """Write one month of attendance (one class's, or every class's) into the matrix.
+
+    ``since`` skips the days before it, live or archived.
+    """
+    year, mon = int(month[:4]), int(month[5:7])
+    days, first, last = month_bounds(year, mon)
+    offset = (date(year, mon, 1) - matrix.start).days  # column of the 1st
+    low = max(first, (since or matrix.start).isoformat())
+    high = min(last, matrix.end.isoformat())
+    if class_id is None:
+        # Walk the covering index class by class rather than the date index
+        class_filter, params = "class_id IN (SELECT id FROM classes)", ()
+    else:
+        class_filter, params = "class_id = ?", (class_id,)
+
+    ids, day_numbers, codes = [], [], []
+    # Closed academic years: one packed row per student and month, unpacked all at once
+    archived = execute_query(f"""
+        SELECT student_id, codes FROM {partition_source('attendance_archive', first, last)}
+        WHERE {class_filter} AND month = ?
+    """, params + (month,), readonly=True)
+    if archived:
+        packed = np.frombuffer(b"".join(row[1] for row in archived), np.uint8).reshape(len(archived), -1)
+        unpacked = ((packed[:, :, None] >> _SHIFTS) & 3).reshape(len(archived), -1)[:, :days]
+        unpacked[:, :int(low[8:10]) - 1] = 0
+        row, day = np.nonzero(unpacked)
+        ids.append(np.fromiter((r[0] for r in archived), np.int64, len(archived))[row])
+        day_numbers.append(day + 1)
+        codes.append(unpacked[row, day])
+
+    # Live attendance: one string per student with a character per record,
+    # day * 4 + code, so the rows arrive already packed and decode as one array
+    live = execute_query(f"""
+        SELECT student_id, group_concat(char(CAST(substr(date, 9, 2) AS INTEGER) * 4
+               + CASE status WHEN 'present' THEN 1 WHEN 'absent' THEN 2 ELSE 3 END), '')
+        FROM attendance
+        WHERE {class_filter} AND date BETWEEN ? AND ?
+        GROUP BY student_id
+    """, params + (low, high), readonly=True)
+    if live:
+        chars = np.frombuffer("".join(row[1] for row in live).encode("ascii"), np.uint8)
+        counts = np.fromiter((len(row[1]) for row in live), np.int64, len(live))
+        ids.append(np.repeat(np.fromiter((row[0] for row in live), np.int64, len(live)), counts))
+        day_numbers.append(chars >> 2)
+        codes.append(chars & 3)
+
+    if not ids:
+        return
+    rows = _row_index(matrix.students, np.concatenate(ids))
+    cols = offset + np.concatenate(day_numbers).astype(np.int64) - 1
+    keep = (rows >= 0) & (cols >= 0) & (cols < matrix.cells.shape[1])
+    matrix.cells[rows[keep], cols[keep]] = np.concatenate(codes).astype(np.uint8)[keep]
+
+
+def load_matrix(matrix: AttendanceMatrix) -> None:
+    """Fill a new matrix from the database."""
+    # Snapshot first: anything saved while loading shows up as a changed version
+    versions = _versions(matrix)
+    matrix.students = np.empty(0, np.int64)
+    _load_roster(matrix)
+    for month in _months(matrix.start, matrix.end):
+        _load_month(matrix, month, matrix.class_id)
+    matrix.versions = versions
+
+
+def refresh_matrix(matrix: AttendanceMatrix, end: Optional[date] = None) -> int:
+    """Bring a loaded matrix up to date, extending it to ``end`` if that is later.
+
+    Returns the number of (class, month) blocks reloaded.
+    """
+    reloaded = 0
+    if end is not None and end > matrix.end:
+        since = matrix.end + timedelta(days=1)
+        extra = np.zeros((len(matrix.students), (end - matrix.end).days), np.uint8)
+        matrix.cells = np.concatenate([matrix.cells, extra], axis=1)
+        matrix.end = end
+        versions = _versions(matrix)
+        for month in _months(since, end):
+            _load_month(matrix, month, matrix.class_id, since)
+            reloaded += 1
+    else:
+        versions = _versions(matrix)
+
+    changed = {key for key in versions.keys() | matrix.versions.keys()
+               if versions.get(key) != matrix.versions.get(key)}
+    matrix.versions = versions
+    roster = {class_id for month, class_id in changed if month == ALL_MONTHS}
+    if roster:
+        _load_roster(matrix)  # new students start as empty rows
+        for class_id in roster:
+            matrix.cells[matrix.class_ids == class_id] = 0
+            for month in _months(matrix.start, matrix.end):
+                _load_month(matrix, month, class_id)
+            reloaded += 1
+    for month, class_id in changed:
+        if month == ALL_MONTHS or class_id in roster:
+            continue
+        year, mon = int(month[:4]), int(month[5:7])
+        first = max((date(year, mon, 1) - matrix.start).days, 0)
+        last = (date(year, mon, month_bounds(year, mon)[0]) - matrix.start).days + 1
+        matrix.cells[matrix.class_ids == class_id, first:last] = 0
+        _load_month(matrix, month, class_id)
+        reloaded += 1
+    return reloaded
+
+
+class MatrixCache:
+    """LRU cache of attendance matrices keyed by (start, class_id).
+
+    A request for a later end date extends the cached matrix; an earlier
+    one reads a prefix of it.
+    """
+
+    def __init__(self, max_entries: int = ANALYTICS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[date, Optional[int]], AttendanceMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matrix(self, start: date, end: date, class_id: Optional[int] = None) -> AttendanceMatrix:
+        """The cached matrix for a range, current as of now. Hold its lock while reading it."""
+        key = (start, class_id)
+        with self._lock:
+            matrix = self._entries.get(key)
+            if matrix is None:
+                matrix = self._entries[key] = AttendanceMatrix(start, end, class_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        # Loaded under the matrix's own lock, so concurrent requests wait for one load
+        with matrix.lock:
+            try:
+                if matrix.versions is None:
+                    load_matrix(matrix)
+                else:
+                    refresh_matrix(matrix, end)
+            except BaseException:
+                matrix.versions = None  # half-applied; load it afresh next time
+                raise
+        return matrix
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+matrix_cache = MatrixCache()
+
+
+def _rates(absent: np.ndarray, marked: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-row absence rate and marked-day count of boolean day matrices."""
+    days_marked = marked.sum(axis=1, dtype=np.int32)
+    days_absent = absent.sum(axis=1, dtype=np.int32)
+    return np.divide(days_absent, days_marked, out=np.zeros(len(marked)), where=days_marked > 0), days_marked
+
+
+def compute_metrics(cells: np.ndarray, class_ids: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-student absence metrics over the school days of a codes matrix.
+
+    School days are the columns with any record; a student's unmarked
+    days count neither way, and don't break an absence streak.
+    """
+    school_days = np.flatnonzero(cells.any(axis=0))
+    codes = cells[:, school_days]
+    marked = codes != 0
+    absent = codes == ABSENT
+    rate, days_marked = _rates(absent, marked)
+    days_absent = absent.sum(axis=1, dtype=np.int32)
+
+    # Streaks: absences so far, minus the absences counted on the student's last attended day
+    counted = np.cumsum(absent, axis=1, dtype=np.int16 if len(school_days) < 2 ** 15 else np.int32)
+    attended = np.where(marked & ~absent, counted, 0)
+    np.maximum.accumulate(attended, axis=1, out=attended)
+    counted -= attended
+    longest = counted.max(axis=1, initial=0)
+    current = counted[:, -1] if len(school_days) else np.zeros(len(codes), counted.dtype)
+
+    # Trend: the last window of school days against the one before
+    window = min(ANALYTICS_TREND_DAYS, len(school_days) // 2)
+    recent, recent_marked = _rates(absent[:, -window:], marked[:, -window:])
+    previous, previous_marked = _rates(absent[:, -2 * window:-window], marked[:, -2 * window:-window])
+    if not window:
+        recent_marked[:] = 0
+    rise = np.where((recent_marked > 0) & (previous_marked > 0), recent - previous, 0.0)
+
+    # School-wide daily rate and its rolling mean over the trend window
+    daily_absent = np.cumsum(np.r_[0, absent.sum(axis=0)])
+    daily_marked = np.cumsum(np.r_[0, marked.sum(axis=0)])
+    span = min(ANALYTICS_TREND_DAYS, len(school_days)) or 1
+    rolling_absent = daily_absent[1:] - daily_absent[np.maximum(np.arange(1, len(school_days) + 1) - span, 0)]
+    rolling_marked = daily_marked[1:] - daily_marked[np.maximum(np.arange(1, len(school_days) + 1) - span, 0)]
+
+    percentile = np.zeros(len(codes))
+    has_marks = days_marked > 0
+    class_stats = _class_percentiles(class_ids[has_marks], rate[has_marks])
+    percentile[has_marks] = class_stats.pop("rank")
+    return {
+        "school_days": school_days,
+        "days_marked": days_marked,
+        "days_absent": days_absent,
+        "rate": rate,
+        "longest_streak": longest,
+        "current_streak": current,
+        "recent_rate": recent,
+        "previous_rate": previous,
+        "rise": rise,
+        "class_percentile": percentile,
+        "daily_rate": np.divide(np.diff(daily_absent), np.diff(daily_marked),
+                                out=np.zeros(len(school_days)), where=np.diff(daily_marked) > 0),
+        "rolling_rate": np.divide(rolling_absent, rolling_marked, out=np.zeros(len(school_days)),
+                                  where=rolling_marked > 0),
+        **class_stats,
+    }
+
+
+def _class_percentiles(class_ids: np.ndarray, rate: np.ndarray) -> dict[str, np.ndarray]:
+    """Each student's percentile within their class, and every class's rate percentiles.
+
+    A student's percentile is the share of classmates with a lower absence
+    rate; class percentiles interpolate linearly between students.
+    """
+    if not len(rate):
+        return {"rank": rate, "classes": class_ids, "class_sizes": class_ids,
+                "class_percentiles": np.zeros((0, len(PERCENTILES)))}
+    order = np.lexsort((rate, class_ids))
+    sorted_classes, sorted_rates = class_ids[order], rate[order]
+    new_class = np.r_[True, sorted_classes[1:] != sorted_classes[:-1]]
+    starts = np.flatnonzero(new_class)
+    sizes = np.diff(np.r_[starts, len(order)])
+
+    # Below = position of the first classmate with the same rate - position of the class's first student
+    new_value = new_class | np.r_[True, sorted_rates[1:] != sorted_rates[:-1]]
+    first_equal = np.maximum.accumulate(np.where(new_value, np.arange(len(order)), 0))
+    below = first_equal - np.repeat(starts, sizes)
+    rank = np.empty(len(order))
+    rank[order] = below / np.maximum(np.repeat(sizes, sizes) - 1, 1) * 100
+
+    position = starts[:, None] + np.array(PERCENTILES) / 100 * (sizes[:, None] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    values = sorted_rates[low] + (sorted_rates[high] - sorted_rates[low]) * (position - low)
+    return {"rank": rank, "classes": sorted_classes[starts], "class_sizes": sizes, "class_percentiles": values}
+
+
+def _percent(value: float) -> float:
+    return round(float(value) * 100, 1)
+
+
+def chronic_absence_report(start: date, end: date, class_id: Optional[int] = None,
+                           limit: int = 100) -> dict[str, Any]:
+    """Absence analytics for a date range: summary, flagged students, classes and the daily trend.
+
+    Students are flagged for a chronic absence rate, a current absence
+    streak or a rising absence rate; the ``limit`` worst are listed.
+    """
+    matrix = matrix_cache.matrix(start, end, class_id)
+    with matrix.lock:
+        students, class_ids = matrix.students, matrix.class_ids
+        metrics = compute_metrics(matrix.cells[:, :(end - start).days + 1], class_ids)
+
+    chronic = metrics["rate"] > ANALYTICS_CHRONIC_RATE
+    on_streak = metrics["current_streak"] >= ANALYTICS_STREAK_ALERT
+    rising = metrics["rise"] >= ANALYTICS_RISE
+    flagged = np.flatnonzero(chronic | on_streak | rising)
+    flagged = flagged[np.lexsort((-metrics["current_streak"][flagged], -metrics["rate"][flagged]))][:limit]
+
+    names = {}
+    if len(flagged):
+        ids = [int(i) for i in students[flagged]]
+        names = {row['id']: row for row in execute_query(f"""
+            SELECT s.id, s.name_en, s.roll_no, c.name AS class_name
+            FROM students s JOIN classes c ON s.class_id = c.id
+            WHERE s.id IN ({', '.join('?' * len(ids))})
+        """, tuple(ids), readonly=True)}
+    flagged_students = []
+    for i in flagged:
+        row = names.get(int(students[i]))
+        flagged_students.append({
+            "student_id": int(students[i]),
+            "name_en": row['name_en'] if row else None,
+            "roll_no": row['roll_no'] if row else None,
+            "class_id": int(class_ids[i]),
+            "class_name": row['class_name'] if row else None,
+            "days_marked": int(metrics["days_marked"][i]),
+            "days_absent": int(metrics["days_absent"][i]),
+            "absence_rate": _percent(metrics["rate"][i]),
+            "longest_streak": int(metrics["longest_streak"][i]),
+            "current_streak": int(metrics["current_streak"][i]),
+            "recent_absence_rate": _percent(metrics["recent_rate"][i]),
+            "previous_absence_rate": _percent(metrics["previous_rate"][i]),
+            "class_percentile": round(float(metrics["class_percentile"][i]), 1),
+            "flags": [flag for flag, hit in (("chronic", chronic[i]), ("streak", on_streak[i]), ("rising", rising[i]))
+                      if hit],
+        })
+
+    class_names = {row['id']: row['name'] for row in execute_query("SELECT id, name FROM classes", readonly=True)}
+    # The class percentiles cover exactly the students with marked days
+    has_marks = metrics["days_marked"] > 0
+    group = np.searchsorted(metrics["classes"], class_ids[has_marks])
+    count = len(metrics["classes"])
+    chronic_per_class = np.bincount(group[chronic[has_marks]], minlength=count)
+    absent_per_class = np.bincount(group, metrics["days_absent"][has_marks], count)
+    marked_per_class = np.bincount(group, metrics["days_marked"][has_marks], count)
+    classes = [{
+        "class_id": int(cid),
+        "class_name": class_names.get(int(cid)),
+        "students": int(metrics["class_sizes"][k]),
+        "chronic": int(chronic_per_class[k]),
+        "absence_rate": _percent(absent_per_class[k] / marked_per_class[k]) if marked_per_class[k] else 0.0,
+        "percentiles": {f"p{p}": _percent(value) for p, value in zip(PERCENTILES, metrics["class_percentiles"][k])},
+    } for k, cid in enumerate(metrics["classes"])]
+
+    days_marked = int(metrics["days_marked"].sum())
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "class_id": class_id,
+        "school_days": len(metrics["school_days"]),
+        "summary": {
+            "students": len(students),
+            "absence_rate": _percent(metrics["days_absent"].sum() / days_marked) if days_marked else 0.0,
+            "chronic": int(chronic.sum()),
+            "on_streak": int(on_streak.sum()),
+            "rising": int(rising.sum()),
+            "flagged": int((chronic | on_streak | rising).sum()),
+        },
+        "thresholds": {
+            "chronic_rate": _percent(ANALYTICS_CHRONIC_RATE),
+            "streak_days": ANALYTICS_STREAK_ALERT,
+            "trend_days": ANALYTICS_TREND_DAYS,
+            "rise": _percent(ANALYTICS_RISE),
+        },
+        "students": flagged_students,
+        "classes": classes,
+        "trend": [{
+            "date": (start + timedelta(days=int(day))).isoformat(),
+            "absence_rate": _percent(daily),
+            "rolling_absence_rate": _percent(rolling),
+        } for day, daily, rolling in zip(metrics["school_days"], metrics["daily_rate"], metrics["rolling_rate"])],
+    }
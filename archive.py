@@ -0,0 +1,192 @@
+# Cold storage for closed academic years in School Attendance System
+# Moves a finished academic year out of attendance into attendance_archive:
+# one row per student and month, with each day's status packed into two
+# bits (see reports.pack_codes), so a month of attendance takes 8 bytes
+# instead of up to 31 indexed rows. Reports, history, student reports and
+# exports read both tables; archived dates can no longer be marked.
+#
+# Usage: python archive.py status | compact [--year 2023] [--dry-run] [--vacuum]
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import date
+from typing import Any, Optional
+
+from constants import ACADEMIC_YEAR_START_MONTH
+from database import execute_query, get_db_connection, init_db, transaction
+from reports import STATUS_CODES, month_bounds, pack_codes
+
+
+def academic_year(day: str) -> int:
+    """The academic year a date (YYYY-MM-DD) falls in, by the calendar year it starts in."""
+    year, month = int(day[:4]), int(day[5:7])
+    return year if month >= ACADEMIC_YEAR_START_MONTH else year - 1
+
+
+def year_bounds(year: int) -> tuple[str, str]:
+    """First and last date of an academic year."""
+    start = date(year, ACADEMIC_YEAR_START_MONTH, 1)
+    end = date(year + 1, ACADEMIC_YEAR_START_MONTH, 1).toordinal() - 1
+    return start.isoformat(), date.fromordinal(end).isoformat()
+
+
+def year_label(year: int) -> str:
+    """e.g. 2024 -> "2024-25" (or "2024" when the academic year is the calendar year)."""
+    return f"{year}-{(year + 1) % 100:02d}" if ACADEMIC_YEAR_START_MONTH > 1 else str(year)
+
+
+def archived_until(conn: Optional[sqlite3.Connection] = None) -> Optional[str]:
+    """The last archived date, or None if nothing is archived.
+
+    Years are archived oldest first, so every date up to this one lives
+    in attendance_archive and every later date in attendance.
+    """
+    sql = "SELECT MAX(end_date) FROM archive_years"
+    rows = conn.execute(sql).fetchall() if conn else execute_query(sql, readonly=True)
+    return rows[0][0]
+
+
+def _months(start: str, end: str) -> list[str]:
+    """The YYYY-MM months from start to end, inclusive."""
+    first, last = int(start[:4]) * 12 + int(start[5:7]) - 1, int(end[:4]) * 12 + int(end[5:7]) - 1
+    return [f"{n // 12:04d}-{n % 12 + 1:02d}" for n in range(first, last + 1)]
+
+
+def pack_year(conn: sqlite3.Connection, year: int) -> tuple[list[tuple[int, str, int, bytes]], int]:
+    """Read one academic year of attendance as archive rows; returns (rows, records read)."""
+    start, end = year_bounds(year)
+    cells: dict[tuple[int, str, int], bytearray] = {}
+    days_in = {month: month_bounds(int(month[:4]), int(month[5:7]))[0] for month in _months(start, end)}
+    records = 0
+    for class_id, student_id, day, status in conn.execute("""
+        SELECT class_id, student_id, date, status FROM attendance
+        WHERE date BETWEEN ? AND ?
+    """, (start, end)):
+        month = day[:7]
+        key = (class_id, month, student_id)
+        codes = cells.get(key)
+        if codes is None:
+            codes = cells[key] = bytearray(days_in[month])
+        codes[int(day[8:10]) - 1] = STATUS_CODES[status]
+        records += 1
+    return [(*key, pack_codes(codes)) for key, codes in sorted(cells.items())], records
+
+
+def compact_year(year: int, dry_run: bool = False, today: Optional[date] = None) -> dict[str, Any]:
+    """Move a closed academic year from attendance to attendance_archive in one transaction.
+
+    The year must have ended, and no older year may still hold live
+    attendance. daily_class_summary and student_attendance_stats rows
+    are left as they are; they already count the moved records.
+    Attendance ids, marked_by and created_at are not kept.
+    """
+    start, end = year_bounds(year)
+    today = today or date.today()
+    if end >= today.isoformat():
+        raise ValueError(f"Academic year {year_label(year)} has not ended yet")
+
+    with transaction() as conn:
+        if conn.execute("SELECT 1 FROM archive_years WHERE year = ?", (year,)).fetchone():
+            raise ValueError(f"Academic year {year_label(year)} is already archived")
+        older = conn.execute("SELECT MIN(date) FROM attendance WHERE date < ?", (start,)).fetchone()[0]
+        if older:
+            raise ValueError(f"Archive academic year {year_label(academic_year(older))} first")
+
+        started = time.perf_counter()
+        rows, records = pack_year(conn, year)
+        conn.executemany(
+            "INSERT INTO attendance_archive (class_id, month, student_id, codes) VALUES (?, ?, ?, ?)", rows
+        )
+        conn.execute("DELETE FROM attendance WHERE date BETWEEN ? AND ?", (start, end))
+        conn.execute(
+            "INSERT INTO archive_years (year, start_date, end_date, records) VALUES (?, ?, ?, ?)",
+            (year, start, end, records)
+        )
+        result = {
+            "year": year_label(year),
+            "records": records,
+            "archive_rows": len(rows),
+            "archive_bytes": sum(len(row[3]) for row in rows),
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        if dry_run:
+            conn.rollback()
+    return result
+
+
+def closed_years(today: Optional[date] = None) -> list[int]:
+    """Academic years that have ended and still have live attendance, oldest first."""
+    today = today or date.today()
+    oldest = execute_query("SELECT MIN(date) FROM attendance", readonly=True)[0][0]
+    if oldest is None:
+        return []
+    current = academic_year(today.isoformat())
+    return [year for year in range(academic_year(oldest), current)
+            if execute_query("SELECT 1 FROM attendance WHERE date BETWEEN ? AND ? LIMIT 1",
+                             year_bounds(year), readonly=True)]
+
+
+def storage_bytes(conn: sqlite3.Connection) -> dict[str, int]:
+    """On-disk bytes of attendance and attendance_archive, indexes included.
+
+    Needs the dbstat virtual table; raises sqlite3.OperationalError without it.
+    """
+    sizes = {"attendance": 0, "attendance_archive": 0}
+    for table, size in conn.execute("""
+        SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+        WHERE m.tbl_name IN ('attendance', 'attendance_archive')
+        GROUP BY m.tbl_name
+    """):
+        sizes[table] = size
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move closed academic years to the attendance archive")
+    parser.add_argument("command", choices=["status", "compact"])
+    parser.add_argument("--year", type=int, help="academic year to compact, by its first calendar year "
+                                                 "(default: every closed year)")
+    parser.add_argument("--dry-run", action="store_true", help="pack and report, but keep the live rows")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "status":
+        for row in execute_query("SELECT * FROM archive_years ORDER BY year", readonly=True):
+            print(f"{year_label(row['year'])}: {row['records']} records archived at {row['archived_at']}")
+        pending = closed_years()
+        print(f"Closed years not archived: {', '.join(map(year_label, pending)) or 'none'}")
+    else:
+        years = [args.year] if args.year is not None else closed_years()
+        for year in years:
+            try:
+                result = compact_year(year, dry_run=args.dry_run)
+            except ValueError as e:
+                print(e)
+                sys.exit(1)
+            print(f"{result['year']}: {result['records']} records -> {result['archive_rows']} archive rows "
+                  f"({result['archive_bytes']} bytes of codes) in {result['seconds']} s"
+                  + (" (dry run)" if args.dry_run else ""))
+        if not years:
+            print("No closed academic years to archive")
+
+    conn = get_db_connection()
+    if args.vacuum and not args.dry_run:
+        conn.execute("VACUUM")
+    try:
+        sizes = storage_bytes(conn)
+    except sqlite3.OperationalError:
+        # SQLite built without the dbstat table; the changes above are already committed
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+        print(f"database: {pages / 1024:.0f} KB")
+    else:
+        print(f"attendance: {sizes['attendance'] / 1024:.0f} KB, "
+              f"attendance_archive: {sizes['attendance_archive'] / 1024:.0f} KB")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
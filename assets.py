@@ -0,0 +1,125 @@
+# Static asset delivery for School Attendance System
+# Loads pages and assets into memory at startup, precompresses them and
+# serves assets under content-hash fingerprinted URLs
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Optional
+
+import brotli
+from fastapi import Request, Response
+
+from report_cache import accepts_encoding, etag_matches
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 256
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+class Asset:
+    """One file held in memory with its precompressed variants."""
+
+    def __init__(self, name: str, content: bytes, mtime: float):
+        self.name = name
+        self.content = content
+        self.mtime = mtime
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/"):
+            self.media_type += "; charset=utf-8"
+        self.digest = hashlib.sha256(content).hexdigest()[:12]
+        self.variants: dict[str, bytes] = {}  # in order of preference
+        if self.media_type.startswith(COMPRESSIBLE_TYPES) and len(content) >= MIN_COMPRESS_BYTES:
+            self.variants["br"] = brotli.compress(content)
+            self.variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+
+    @property
+    def fingerprinted_name(self) -> str:
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.digest}{ext}"
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """Pick the best encoding the client accepts; 304 if its copy is current."""
+        accepted = request.headers.get("accept-encoding")
+        encoding = next((e for e in self.variants if accepts_encoding(accepted, e)), None)
+        etag = f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
+        return Response(content=self.content, media_type=self.media_type, headers=headers)
+
+
+class AssetStore:
+    """In-memory copy of the static directory.
+
+    HTML pages are rewritten so /static/ references point at fingerprinted
+    URLs, which can then be cached forever. In dev mode files are
+    re-read whenever their modification time changes.
+    """
+
+    def __init__(self, directory: str, dev_mode: bool = False):
+        self.directory = directory
+        self.dev_mode = dev_mode
+        self._assets: dict[str, Asset] = {}
+        self._by_fingerprint: dict[str, Asset] = {}
+        self._lock = threading.Lock()
+
+    def _scan(self) -> dict[str, float]:
+        return {
+            entry.name: entry.stat().st_mtime
+            for entry in os.scandir(self.directory) if entry.is_file()
+        }
+
+    def load(self) -> None:
+        """Read, fingerprint and compress every file in the directory."""
+        mtimes = self._scan()
+        assets: dict[str, Asset] = {}
+        for name, mtime in mtimes.items():
+            if not name.endswith(".html"):
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    assets[name] = Asset(name, f.read(), mtime)
+
+        def fingerprint(match: re.Match) -> str:
+            asset = assets.get(match.group(1))
+            return f"/static/{asset.fingerprinted_name}" if asset else match.group(0)
+
+        for name, mtime in mtimes.items():
+            if name.endswith(".html"):
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    html = re.sub(r"/static/([\w.-]+)", fingerprint, f.read())
+                assets[name] = Asset(name, html.encode("utf-8"), mtime)
+
+        with self._lock:
+            self._assets = assets
+            self._by_fingerprint = {a.fingerprinted_name: a for a in assets.values() if not a.name.endswith(".html")}
+
+    def _reload_if_changed(self) -> None:
+        if self.dev_mode and self._scan() != {n: a.mtime for n, a in self._assets.items()}:
+            self.load()
+
+    def get(self, name: str) -> tuple[Optional[Asset], bool]:
+        """Look up an asset by plain or fingerprinted name; returns (asset, fingerprinted)."""
+        self._reload_if_changed()
+        asset = self._by_fingerprint.get(name)
+        if asset is not None:
+            return asset, True
+        return self._assets.get(name), False
+
+    def page_response(self, request: Request, name: str) -> Response:
+        """Serve an HTML page; pages always revalidate so new fingerprints are picked up."""
+        asset, _ = self.get(name)
+        return asset.response(request, REVALIDATE_CACHE)
+
+    def static_response(self, request: Request, name: str) -> Optional[Response]:
+        """Serve a static asset, or None if there is no such file."""
+        asset, fingerprinted = self.get(name)
+        if asset is None:
+            return None
+        return asset.response(request, IMMUTABLE_CACHE if fingerprinted else REVALIDATE_CACHE)
@@ -1,15 +1,36 @@
 # Authentication module for School Attendance System
 # Handles password hashing and session management
 
+import asyncio
 import bcrypt
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
-from database import execute_query, execute_insert, row_to_dict
+from constants import (
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, USER_CACHE_TTL, USER_CACHE_SIZE, SESSION_CACHE_TTL, SESSION_CACHE_SIZE,
+    SESSION_BACKEND, SESSION_TTL, SESSION_TOUCH_INTERVAL, SESSION_SWEEP_INTERVAL
+)
+from database import (
+    execute_query, execute_insert, execute_update, transaction, row_to_dict, rows_to_list, query_async, run_db
+)
 
+logger = logging.getLogger(__name__)
 
-def hash_password(password: str) -> str:
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the
+# event loop without blocking other requests on the worker.
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
     """Hash a password using bcrypt."""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
@@ -18,6 +39,29 @@ def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 
+def hash_passwords(passwords: list[str], rounds: int = BCRYPT_ROUNDS) -> list[str]:
+    """Hash many passwords in parallel on the hashing pool."""
+    return list(_hash_executor.map(lambda password: hash_password(password, rounds), passwords))
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, verify_password, password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Check whether a hash uses fewer rounds than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split('$')[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
 def create_user(username: str, password: str, role: str, name_en: str, name_ur: Optional[str] = None) -> int:
     """Create a new user with hashed password."""
     hashed = hash_password(password)
@@ -27,6 +71,29 @@ def create_user(username: str, password: str, role: str, name_en: str, name_ur:
     )
 
 
+def create_users(users: list[tuple]) -> list[int]:
+    """Create many users in one transaction.
+
+    Each item is (username, password, role, name_en, name_ur). Passwords
+    are hashed in parallel; returns the new user IDs in input order.
+    """
+    hashes = hash_passwords([u[1] for u in users])
+    ids = []
+    with transaction() as conn:
+        for (username, _, role, name_en, name_ur), hashed in zip(users, hashes):
+            cursor = conn.execute(
+                "INSERT INTO users (username, password, role, name_en, name_ur) VALUES (?, ?, ?, ?, ?)",
+                (username, hashed, role, name_en, name_ur)
+            )
+            ids.append(cursor.lastrowid)
+    return ids
+
+
+def _upgrade_password_hash(user_id: int, hashed: str) -> None:
+    """Store a re-hashed password after a work-factor increase."""
+    execute_update("UPDATE users SET password = ? WHERE id = ?", (hashed, user_id))
+
+
 def authenticate_user(username: str, password: str) -> Optional[dict]:
     """Authenticate a user by username and password."""
     rows = execute_query(
@@ -38,6 +105,25 @@ def authenticate_user(username: str, password: str) -> Optional[dict]:
 
     user = row_to_dict(rows[0])
     if verify_password(password, user['password']):
+        if needs_rehash(user['password']):
+            _upgrade_password_hash(user['id'], hash_password(password))
+        return user
+    return None
+
+
+async def authenticate_user_async(username: str, password: str) -> Optional[dict]:
+    """Authenticate a user with bcrypt work done on the hashing pool."""
+    rows = await query_async(
+        "SELECT * FROM users WHERE username = ?",
+        (username,)
+    )
+    if not rows:
+        return None
+
+    user = row_to_dict(rows[0])
+    if await verify_password_async(password, user['password']):
+        if needs_rehash(user['password']):
+            await run_db(_upgrade_password_hash, user['id'], await hash_password_async(password))
         return user
     return None
 
@@ -70,41 +156,282 @@ def get_all_teachers() -> list[dict]:
     return rows_to_list(rows)
 
 
-def delete_user(user_id: int) -> None:
-    """Delete a user by ID."""
-    from database import execute_update
-    execute_update("DELETE FROM users WHERE id = ?", (user_id,))
+def delete_user(user_id: int, role: Optional[str] = None) -> bool:
+    """Delete a user by ID (only if they have ``role``, when given) and end their sessions.
+
+    Returns False if there was no such user. Other worker processes may
+    still accept a session they resolved in the last SESSION_CACHE_TTL
+    seconds; after that, with the sessions gone, nobody is signed in as them.
+    """
+    with transaction() as conn:
+        deleted = conn.execute(
+            "DELETE FROM users WHERE id = ? AND (? IS NULL OR role = ?)", (user_id, role, role)
+        ).rowcount
+        if deleted:
+            # In the same transaction, so no session outlives the user
+            get_session_backend().delete_user_sessions(user_id, conn)
+    invalidate_user(user_id)
+    forget_sessions(user_id=user_id)
+    return bool(deleted)
+
+
+# User cache keyed by user id, so authenticated requests skip the users
+# table. Entries expire after USER_CACHE_TTL seconds; the least recently
+# used entry is evicted once USER_CACHE_SIZE is reached.
+_user_cache: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def get_cached_user(user_id: int) -> Optional[dict]:
+    """Get user by ID through the in-process cache."""
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _user_cache.move_to_end(user_id)
+            return dict(entry[1])
+
+    user = get_user_by_id(user_id)
+    if user is not None:
+        with _user_cache_lock:
+            _user_cache[user_id] = (now + USER_CACHE_TTL, user)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+        return dict(user)
+    return None
+
+
+def invalidate_user(user_id: Optional[int] = None) -> None:
+    """Drop a user from the cache, or the whole cache if no ID is given."""
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
+
+# Session management
+# Sessions live behind a pluggable backend. The SQLite backend is shared by
+# every worker process; the memory backend only suits a single worker.
 
+class MemorySessionBackend:
+    """Sessions in a process-local dict with sliding expiry."""
 
-# Session management (in-memory for simplicity)
-# In production, use Redis or database-backed sessions
-_sessions: dict[str, dict] = {}
+    def __init__(self, ttl: int = SESSION_TTL):
+        self.ttl = ttl
+        self._sessions: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, user_id: int) -> str:
+        session_id = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[session_id] = {
+                'user_id': user_id,
+                'created_at': datetime.now().isoformat(),
+                'expires_at': time.time() + self.ttl
+            }
+        return session_id
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session['expires_at'] <= now:
+                del self._sessions[session_id]
+                return None
+            session['expires_at'] = now + self.ttl
+            return dict(session)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def delete_user_sessions(self, user_id: int, conn: Optional[sqlite3.Connection] = None) -> None:
+        with self._lock:
+            for session_id in [k for k, v in self._sessions.items() if v['user_id'] == user_id]:
+                del self._sessions[session_id]
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, v in self._sessions.items() if v['expires_at'] <= now]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+
+class SQLiteSessionBackend:
+    """Sessions in the sessions table, visible to every worker process.
+
+    Expiry slides on use, but the row is only rewritten once per
+    SESSION_TOUCH_INTERVAL so most lookups stay read-only.
+    """
+
+    def __init__(self, ttl: int = SESSION_TTL, touch_interval: int = SESSION_TOUCH_INTERVAL):
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+
+    def create(self, user_id: int) -> str:
+        session_id = secrets.token_urlsafe(32)
+        execute_insert(
+            "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
+            (session_id, user_id, time.time() + self.ttl)
+        )
+        return session_id
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.time()
+        rows = execute_query(
+            "SELECT user_id, created_at, expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+            (session_id, now)
+        )
+        if not rows:
+            return None
+        session = row_to_dict(rows[0])
+        if session['expires_at'] - now < self.ttl - self.touch_interval:
+            session['expires_at'] = now + self.ttl
+            execute_update(
+                "UPDATE sessions SET expires_at = ? WHERE id = ?",
+                (session['expires_at'], session_id)
+            )
+        return session
+
+    def delete(self, session_id: str) -> None:
+        execute_update("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def delete_user_sessions(self, user_id: int, conn: Optional[sqlite3.Connection] = None) -> None:
+        """Delete a user's sessions, inside the caller's transaction when ``conn`` is given."""
+        if conn is not None:
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        else:
+            execute_update("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    def sweep(self) -> int:
+        with transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+SESSION_BACKENDS = {
+    'memory': MemorySessionBackend,
+    'sqlite': SQLiteSessionBackend,
+}
+
+_session_backend = None
+
+
+def get_session_backend():
+    """Get the configured session backend, creating it on first use."""
+    global _session_backend
+    if _session_backend is None:
+        _session_backend = SESSION_BACKENDS[SESSION_BACKEND]()
+    return _session_backend
+
+
+def set_session_backend(backend) -> None:
+    """Replace the session backend (e.g. MemorySessionBackend() for scripts)."""
+    global _session_backend
+    _session_backend = backend
 
 
 def create_session(user_id: int) -> str:
     """Create a new session for a user."""
-    session_id = f"{user_id}_{datetime.now().timestamp()}"
-    _sessions[session_id] = {
-        'user_id': user_id,
-        'created_at': datetime.now().isoformat()
-    }
-    return session_id
+    return get_session_backend().create(user_id)
 
 
 def get_session(session_id: str) -> Optional[dict]:
-    """Get session data."""
-    return _sessions.get(session_id)
+    """Get session data, extending its expiry."""
+    return get_session_backend().get(session_id)
 
 
 def delete_session(session_id: str) -> None:
     """Delete a session."""
-    if session_id in _sessions:
-        del _sessions[session_id]
+    get_session_backend().delete(session_id)
+    forget_sessions(session_id=session_id)
+
+
+def sweep_sessions() -> int:
+    """Remove expired sessions and return how many were removed."""
+    return get_session_backend().sweep()
+
+
+_sweeper_stop = threading.Event()
+_sweeper_thread: Optional[threading.Thread] = None
+
+
+def start_session_sweeper(interval: int = SESSION_SWEEP_INTERVAL) -> None:
+    """Start a daemon thread that sweeps expired sessions periodically."""
+    global _sweeper_thread
+    if _sweeper_thread is not None and _sweeper_thread.is_alive():
+        return
+    _sweeper_stop.clear()
+
+    def run():
+        while not _sweeper_stop.wait(interval):
+            try:
+                sweep_sessions()
+            except sqlite3.Error:
+                logger.exception("Session sweep failed")
+
+    _sweeper_thread = threading.Thread(target=run, name="session-sweeper", daemon=True)
+    _sweeper_thread.start()
+
+
+def stop_session_sweeper() -> None:
+    """Stop the session sweeper thread."""
+    global _sweeper_thread
+    _sweeper_stop.set()
+    if _sweeper_thread is not None:
+        _sweeper_thread.join(timeout=5)
+        _sweeper_thread = None
+
+
+# Session cache: session id -> (expiry, user id), so most authenticated
+# requests skip the sessions table as well as the users table. Entries
+# live for SESSION_CACHE_TTL seconds (never past the session's own
+# expiry), the least recently used going once SESSION_CACHE_SIZE is
+# reached. Logout and delete_user drop them at once in this process.
+_session_cache: OrderedDict[str, tuple[float, int]] = OrderedDict()
+_session_cache_lock = threading.Lock()
+
+
+def forget_sessions(session_id: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Drop a session, or every session of a user, or (with neither) all sessions from the cache."""
+    with _session_cache_lock:
+        if session_id is not None:
+            _session_cache.pop(session_id, None)
+        elif user_id is not None:
+            for key in [k for k, (_, uid) in _session_cache.items() if uid == user_id]:
+                del _session_cache[key]
+        else:
+            _session_cache.clear()
 
 
 def get_user_from_session(session_id: str) -> Optional[dict]:
-    """Get user from session ID."""
-    session = get_session(session_id)
-    if session:
-        return get_user_by_id(session['user_id'])
-    return None
+    """Get user from session ID through the session and user caches."""
+    now = time.time()
+    with _session_cache_lock:
+        entry = _session_cache.get(session_id)
+        if entry is not None and entry[0] > now:
+            _session_cache.move_to_end(session_id)
+            user_id = entry[1]
+        else:
+            user_id = None
+
+    if user_id is None:
+        session = get_session(session_id)
+        if not session:
+            return None
+        user_id = session['user_id']
+        with _session_cache_lock:
+            _session_cache[session_id] = (min(now + SESSION_CACHE_TTL, session['expires_at']), user_id)
+            _session_cache.move_to_end(session_id)
+            while len(_session_cache) > SESSION_CACHE_SIZE:
+                _session_cache.popitem(last=False)
+
+    user = get_cached_user(user_id)
+    if user is None:
+        forget_sessions(session_id=session_id)
+    return user
@@ -0,0 +1,83 @@
+# Chronic-absence analytics benchmark
+# Times the vectorized metrics on a synthetic students x school days matrix
+# (default 100,000 x 200), then generates a school and times loading its
+# attendance matrix cold, refreshing it when nothing changed, after one
+# class's day is saved and after the range grows by a day.
+#
+# Usage: python -m benchmarks.bench_analytics [--students 100000] [--days 200] [--classes 40] [--per-class 40]
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import database
+import generate_data
+from analytics import AttendanceMatrix, compute_metrics, load_matrix, refresh_matrix
+from main import _save_attendance
+
+END = date(2026, 3, 20)
+
+
+def timed(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def synthetic(students: int, days: int, seed: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """Random codes for weekdays over enough calendar days for ``days`` school days, 100 students a class."""
+    rng = np.random.default_rng(seed)
+    calendar_days = days * 7 // 5
+    cells = rng.choice(np.array([1, 2, 3], np.uint8), p=[0.90, 0.07, 0.03], size=(students, calendar_days))
+    weekend = np.arange(calendar_days) % 7 >= 5
+    cells[:, weekend] = 0
+    cells[rng.random((students, calendar_days)) < 0.01] = 0  # the odd unmarked day
+    return cells, np.arange(students) // 100 + 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the absence analytics")
+    parser.add_argument("--students", type=int, default=100_000, help="rows of the synthetic matrix")
+    parser.add_argument("--days", type=int, default=200, help="school days of the synthetic matrix")
+    parser.add_argument("--classes", type=int, default=40, help="classes in the generated school")
+    parser.add_argument("--per-class", type=int, default=40, help="students per class in the generated school")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cells, class_ids = synthetic(args.students, args.days)
+    compute_metrics(cells, class_ids)
+    ms = timed(lambda: compute_metrics(cells, class_ids), args.repeat)
+    print(f"metrics, {args.students:,} students x {args.days} school days: {ms:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        generate_data.generate(generate_data.build_parser().parse_args([
+            "--db", db, "--classes", str(args.classes), "--students", str(args.per_class),
+            "--years", "1", "--end", END.isoformat(), "--bcrypt-rounds", "4",
+        ]))
+        start = END - timedelta(days=280)
+        matrix = AttendanceMatrix(start, END - timedelta(days=1), None)
+        ms = timed(lambda: load_matrix(matrix))
+        rows, cols = matrix.cells.shape
+        print(f"\ngenerated school, {rows:,} students x {cols} calendar days "
+              f"({int(np.count_nonzero(matrix.cells)):,} records)")
+        print(f"  cold load:                       {ms:8.1f} ms")
+        print(f"  refresh, nothing changed:        {timed(lambda: refresh_matrix(matrix), args.repeat):8.1f} ms")
+
+        class_id = database.execute_query("SELECT MIN(id) FROM classes")[0][0]
+        students = database.execute_query("SELECT id FROM students WHERE class_id = ?", (class_id,))
+        _save_attendance(class_id, (END - timedelta(days=3)).isoformat(), {row[0]: "absent" for row in students}, 1)
+        print(f"  refresh, one class day saved:    {timed(lambda: refresh_matrix(matrix)):8.1f} ms")
+        print(f"  refresh, range grown by a day:   {timed(lambda: refresh_matrix(matrix, END)):8.1f} ms")
+        print(f"  metrics:                         "
+              f"{timed(lambda: compute_metrics(matrix.cells, matrix.class_ids), args.repeat):8.1f} ms")
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Attendance archive benchmark
+# Generates a school with two academic years of attendance, times the report,
+# history, student report and export reads for a month of the older year,
+# then compacts that year into attendance_archive and times the same reads
+# again. Also reports the storage taken by the year before and after.
+#
+# Usage: python -m benchmarks.bench_archive [--classes 40] [--students 40] [--repeat 5]
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+from typing import Callable
+
+import database
+import generate_data
+from archive import compact_year, storage_bytes, year_bounds, year_label
+from exports import iter_attendance_rows
+from main import STUDENT_RECORDS
+from reports import build_history_matrix, build_monthly_matrix, stream_student_months
+from rollups import student_summary
+
+YEAR = 2024  # the academic year that is archived
+END = date(2026, 3, 31)  # last generated day: two academic years, both closed
+MONTH = (2024, 11)
+
+
+def cases(class_id: int, student_id: int) -> dict[str, Callable[[], object]]:
+    month_start = f"{MONTH[0]}-{MONTH[1]:02d}-01"
+    start, end = year_bounds(YEAR)
+    fields = STUDENT_RECORDS.fields(None)
+    records_sql, records_params, _ = STUDENT_RECORDS.query(
+        fields, None, 30, ["student_id = ?", "date <= ?"], [student_id, end]
+    )
+    return {
+        "report, whole school": lambda: build_monthly_matrix(*MONTH),
+        "report, one class": lambda: build_monthly_matrix(*MONTH, class_id),
+        "export stream, one class": lambda: list(stream_student_months(*MONTH, class_id)),
+        "history, 90 days": lambda: build_history_matrix(class_id, month_start, f"{MONTH[0] + 1}-01-29"),
+        "student summary, year": lambda: student_summary(student_id, start, end),
+        "student summary, 45 days": lambda: student_summary(student_id, "2024-10-10", "2024-11-23"),
+        "student records, 30 newest": lambda: database.execute_query(records_sql, records_params, readonly=True),
+        "raw CSV rows, one month": lambda: sum(1 for _ in iter_attendance_rows(month_start, f"{month_start[:8]}30")),
+    }
+
+
+def time_cases(class_id: int, student_id: int, repeat: int) -> dict[str, float]:
+    timings = {}
+    for name, fn in cases(class_id, student_id).items():
+        fn()  # warm the page cache
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings[name] = (time.perf_counter() - start) / repeat * 1000
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark archiving a closed academic year")
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--students", type=int, default=40, help="students per class")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        generate_data.generate(generate_data.build_parser().parse_args([
+            "--db", db, "--classes", str(args.classes), "--students", str(args.students),
+            "--years", "2", "--end", END.isoformat(), "--bcrypt-rounds", "4",
+        ]))
+        class_id = database.execute_query("SELECT MIN(id) FROM classes")[0][0]
+        student_id = database.execute_query("SELECT MIN(id) FROM students WHERE class_id = ?", (class_id,))[0][0]
+
+        live = time_cases(class_id, student_id, args.repeat)
+        conn = database.get_db_connection()
+        before = storage_bytes(conn)
+        conn.close()
+
+        result = compact_year(YEAR, today=END.replace(year=END.year + 1))
+        database.close_pools()
+        conn = database.get_db_connection()
+        conn.execute("VACUUM")
+        after = storage_bytes(conn)
+        conn.close()
+        archived = time_cases(class_id, student_id, args.repeat)
+
+        print(f"\nArchived {result['year']}: {result['records']:,} records -> {result['archive_rows']:,} rows "
+              f"in {result['seconds']} s")
+        moved = before["attendance"] - after["attendance"]
+        print(f"  attendance (+ indexes) freed: {moved / 1024:>9,.0f} KB")
+        print(f"  attendance_archive:           {after['attendance_archive'] / 1024:>9,.0f} KB "
+              f"({moved / max(after['attendance_archive'], 1):.0f}x smaller)")
+        print(f"  per record: {moved / result['records']:.1f} bytes live, "
+              f"{after['attendance_archive'] / result['records']:.2f} bytes archived")
+
+        print(f"\n{'read (' + year_label(YEAR) + ')':<30} {'live':>10} {'archived':>10}")
+        for name in live:
+            print(f"{name:<30} {live[name]:>8.2f}ms {archived[name]:>8.2f}ms")
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Report/request concurrency benchmark
+# Polls /api/me while whole-school monthly reports are rendered, first with
+# the report run directly on the event loop (how the routes used to call
+# the database) and then through the app's async database layer, and fails
+# if a report still blocks /api/me. Also checks the per-query timeout.
+#
+# Usage: python -m benchmarks.bench_concurrency [--students 10000] [--reports 3] [--max-me-ms 250]
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+import database
+from benchmarks.bench_reports import setup_database, YEAR, MONTH
+from database import QueryTimeoutError, run_db
+from reports import build_monthly_matrix
+
+
+async def poll_me(client: httpx.AsyncClient, cookie: str, done: asyncio.Event) -> list[float]:
+    """Call /api/me back to back until `done` is set; returns latencies in ms."""
+    latencies = []
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get("/api/me", cookies={"session": cookie})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+def summary(name: str, latencies: list[float], elapsed: float) -> float:
+    worst = max(latencies) if latencies else float("inf")
+    median = statistics.median(latencies) if latencies else float("inf")
+    print(f"  {name:<28} {elapsed:>6.2f} s  {len(latencies):>5} /api/me calls  "
+          f"p50 {median:>7.1f} ms  max {worst:>8.1f} ms")
+    return worst
+
+
+async def bench(reports: int) -> tuple[float, float]:
+    from auth import create_users
+    from main import app, _render_report_json
+    from report_cache import report_cache
+
+    create_users([("principal", "school123", "principal", "Principal", None)])
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        response = await client.post("/api/login", json={"username": "principal", "password": "school123"})
+        cookie = response.cookies["session"]
+
+        async def measure(name: str, work) -> float:
+            done = asyncio.Event()
+            poller = asyncio.create_task(poll_me(client, cookie, done))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            await work()
+            elapsed = time.perf_counter() - start
+            done.set()
+            return summary(name, await poller, elapsed)
+
+        async def idle():
+            await asyncio.sleep(1)
+
+        async def on_loop():
+            for _ in range(reports):
+                _render_report_json(YEAR, MONTH, None)
+                await asyncio.sleep(0)
+
+        async def via_route():
+            for _ in range(reports):
+                report_cache.clear()
+                response = await client.get("/api/principal/report", params={"year": YEAR, "month": MONTH},
+                                            cookies={"session": cookie})
+                response.raise_for_status()
+
+        await measure("idle", idle)
+        blocked = await measure("report on the event loop", on_loop)
+        awaited = await measure("report via run_db", via_route)
+
+        try:
+            await run_db(build_monthly_matrix, YEAR, MONTH, None, timeout=0.001)
+            print("  timeout: not triggered")
+        except QueryTimeoutError as e:
+            print(f"  timeout: {e}")
+    return blocked, awaited
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /api/me latency during report rendering")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--class-size", type=int, default=40)
+    parser.add_argument("--reports", type=int, default=3)
+    parser.add_argument("--max-me-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(os.path.join(tmp, "bench.db"), args.students, args.class_size)
+        print(f"{args.students} students, {args.reports} whole-school reports per run:")
+        blocked, awaited = asyncio.run(bench(args.reports))
+        database.close_pools()
+
+    if awaited > args.max_me_ms:
+        print(f"FAIL: /api/me took {awaited:.1f} ms while reports ran (limit {args.max_me_ms:.0f} ms)")
+        sys.exit(1)
+    print(f"OK: worst /api/me {awaited:.1f} ms during reports (was {blocked:.1f} ms on the event loop)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Micro-benchmark for the database helpers
+# Compares one-connection-per-call (the old helpers) against the pooled helpers
+#
+# Usage: python -m benchmarks.bench_database [--iterations 2000]
+
+import argparse
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+
+import database
+
+# Unique attendance dates across both runs
+_dates = itertools.count()
+
+
+def legacy_query(query: str, params: tuple = ()) -> list:
+    """Old execute_query: fresh connection per call."""
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.row_factory = sqlite3.Row
+    results = conn.execute(query, params).fetchall()
+    conn.close()
+    return results
+
+
+def legacy_insert(query: str, params: tuple = ()) -> int:
+    """Old execute_insert: fresh connection and commit per call."""
+    conn = sqlite3.connect(database.DB_FILE)
+    cursor = conn.execute(query, params)
+    conn.commit()
+    last_id = cursor.lastrowid
+    conn.close()
+    return last_id
+
+
+def legacy_update(query: str, params: tuple = ()) -> None:
+    """Old execute_update: fresh connection and commit per call."""
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.execute(query, params)
+    conn.commit()
+    conn.close()
+
+
+def setup_database(path: str, students: int = 1000) -> None:
+    """Create the schema in a scratch file with one class of students."""
+    database.close_pools()
+    database.DB_FILE = path
+    database.init_db()
+    class_id = database.execute_insert("INSERT INTO classes (name) VALUES (?)", ("Bench",))
+    with database.get_pool().connection() as conn:
+        conn.executemany(
+            "INSERT INTO students (name_en, roll_no, class_id) VALUES (?, ?, ?)",
+            [(f"Student {i}", f"{i:04d}", class_id) for i in range(students)]
+        )
+        conn.commit()
+
+
+def run_case(name: str, fn, iterations: int) -> float:
+    """Run fn(i) iterations times and return queries per second."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    qps = iterations / elapsed
+    print(f"  {name:<10} {qps:>12,.0f} q/s")
+    return qps
+
+
+def bench(query, insert, update, iterations: int) -> dict[str, float]:
+    return {
+        "select": run_case("select", lambda i: query(
+            "SELECT * FROM students WHERE id = ?", (i % 1000 + 1,)), iterations),
+        "insert": run_case("insert", lambda i: insert(
+            "INSERT INTO attendance (student_id, class_id, date, status) VALUES (?, 1, ?, 'present')",
+            (i % 1000 + 1, f"bench-{next(_dates)}")), iterations),
+        "update": run_case("update", lambda i: update(
+            "UPDATE students SET parent_phone = ? WHERE id = ?", (str(i), i % 1000 + 1)), iterations),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark database helpers")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(os.path.join(tmp, "bench.db"))
+
+        print("Before (connection per call):")
+        before = bench(legacy_query, legacy_insert, legacy_update, args.iterations)
+        print("After (pooled, WAL):")
+        after = bench(database.execute_query, database.execute_insert, database.execute_update, args.iterations)
+
+        print("Speedup:")
+        for key in before:
+            print(f"  {key:<10} {after[key] / before[key]:>11.1f}x")
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# Endpoint benchmark suite
+# Runs the hot endpoints in-process through FastAPI's TestClient against
+# generated datasets at several scales, and records p50/p95/p99 latency,
+# throughput and peak traced memory per endpoint to a JSON baseline.
+# With --compare, results are checked against a saved baseline and the
+# run fails if any endpoint regressed by more than --threshold.
+#
+# Usage: python -m benchmarks.bench_endpoints [--scales small medium] [--requests 50] [--output FILE]
+#        python -m benchmarks.bench_endpoints --compare FILE [--threshold 0.25]
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from fastapi.testclient import TestClient
+
+import database
+import generate_data
+
+# Dataset sizes: (classes, students per class, years of attendance)
+SCALES = {
+    "small": (8, 20, 0.25),
+    "medium": (20, 40, 1.0),
+    "large": (40, 40, 2.0),
+}
+
+PASSWORD = "school123"
+MEMORY_SAMPLES = 3  # requests per endpoint traced for peak memory
+MIN_DELTA_MS = 1.0  # latency changes smaller than this are never regressions
+
+
+class Case:
+    """One benchmarked endpoint: `send` makes the request, `prepare` runs untimed before it."""
+
+    def __init__(self, name: str, send: Callable[[int], object], prepare: Optional[Callable[[int], None]] = None,
+                 requests: Optional[int] = None):
+        self.name = name
+        self.send = send
+        self.prepare = prepare
+        self.requests = requests
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def login(client: TestClient, username: str) -> dict[str, str]:
+    response = client.post("/api/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return {"session": response.cookies["session"]}
+
+
+def build_cases(client: TestClient, requests: int) -> list[Case]:
+    from report_cache import report_cache
+
+    rng = random.Random(1)
+    teacher = login(client, "teacher1")
+    principal = login(client, "principal")
+    my_class = client.get("/api/teacher/my-class", cookies=teacher).json()
+    student_ids = [s['id'] for s in my_class['students']]
+    all_students, cursor = [], None
+    while True:
+        page = client.get("/api/admin/students", cookies=principal,
+                          params={"fields": "id", "limit": 1000, **({"cursor": cursor} if cursor else {})}).json()
+        all_students += [s['id'] for s in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    today = date.today()
+    month = {"year": today.year, "month": today.month}
+
+    def checked(response):
+        response.raise_for_status()
+        return response
+
+    def save_attendance(i: int):
+        records = [{"student_id": sid, "status": rng.choices(["present", "absent", "late"], [90, 7, 3])[0]}
+                   for sid in student_ids]
+        return checked(client.post("/api/teacher/attendance", cookies=teacher,
+                                   json={"date": today.isoformat(), "records": records}))
+
+    def clear_reports(i: int) -> None:
+        report_cache.clear()
+
+    return [
+        # bcrypt dominates logins, so fewer samples
+        Case("login", lambda i: login(client, "teacher1"), requests=max(5, requests // 5)),
+        Case("my_class", lambda i: checked(client.get("/api/teacher/my-class", cookies=teacher))),
+        Case("attendance_save", save_attendance),
+        Case("dashboard", lambda i: checked(client.get("/api/principal/dashboard", cookies=principal))),
+        Case("report_cold", lambda i: checked(client.get("/api/principal/report", params=month, cookies=principal)),
+             prepare=clear_reports),
+        Case("report_cached", lambda i: checked(client.get("/api/principal/report", params=month,
+                                                           cookies=principal))),
+        Case("export_xlsx_cold", lambda i: checked(client.get("/api/principal/report/export", params=month,
+                                                              cookies=principal)),
+             prepare=clear_reports, requests=max(5, requests // 5)),
+        Case("export_csv_month", lambda i: checked(client.get(
+            "/api/principal/export/attendance.csv", cookies=principal,
+            params={"start": f"{today:%Y-%m}-01", "end": today.isoformat()}
+        ))),
+        Case("notifications", lambda i: checked(client.get("/api/notifications", params={"status": "pending"},
+                                                           cookies=principal))),
+        Case("notifications_all", lambda i: checked(client.get("/api/notifications", cookies=principal))),
+        Case("students_page", lambda i: checked(client.get("/api/admin/students", cookies=principal))),
+        Case("student_report", lambda i: checked(client.get(f"/api/principal/student/{rng.choice(all_students)}",
+                                                            cookies=principal))),
+    ]
+
+
+def run_case(case: Case, requests: int, warmup: int) -> dict[str, float]:
+    """Time a case sequentially, then trace a few more requests for peak memory."""
+    count = case.requests or requests
+    for i in range(warmup):
+        if case.prepare:
+            case.prepare(i)
+        case.send(i)
+
+    latencies = []
+    for i in range(count):
+        if case.prepare:
+            case.prepare(i)
+        start = time.perf_counter()
+        case.send(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # Traced separately: tracemalloc slows everything down
+    peak = 0
+    for i in range(MEMORY_SAMPLES):
+        if case.prepare:
+            case.prepare(i)
+        tracemalloc.start()
+        case.send(i)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "requests": count,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "throughput_rps": round(count / (sum(latencies) / 1000), 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_scale(name: str, tmp: str, requests: int, warmup: int) -> dict[str, dict]:
+    classes, students, years = SCALES[name]
+    args = generate_data.build_parser().parse_args([
+        "--db", os.path.join(tmp, f"{name}.db"), "--force", "--classes", str(classes),
+        "--students", str(students), "--years", str(years),
+    ])
+    print(f"{name}: {classes} classes x {students} students, {years:g} years")
+    generate_data.generate(args)
+
+    # Imported once the dataset exists, so main's init_db runs against it
+    from auth import invalidate_user
+    from main import app
+    from report_cache import report_cache
+    report_cache.clear()
+    invalidate_user()
+
+    results = {}
+    with TestClient(app) as client:
+        for case in build_cases(client, requests):
+            result = results[case.name] = run_case(case, requests, warmup)
+            print(f"  {case.name:<18} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                  f"p99 {result['p99_ms']:>8.2f} ms  {result['throughput_rps']:>8.1f} req/s  "
+                  f"peak {result['peak_kb']:>9.1f} KB")
+    database.close_pools()
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Describe every metric that got worse than the baseline by more than `threshold`."""
+    regressions = []
+    for scale, cases in current["results"].items():
+        for case, metrics in cases.items():
+            old = baseline.get("results", {}).get(scale, {}).get(case)
+            if not old:
+                continue
+            for key in ("p50_ms", "p95_ms", "peak_kb"):
+                limit = old[key] * (1 + threshold)
+                if key.endswith("_ms"):
+                    limit = max(limit, old[key] + MIN_DELTA_MS)
+                if metrics[key] > limit:
+                    regressions.append(f"{scale}/{case} {key}: {old[key]} -> {metrics[key]}")
+            if metrics["throughput_rps"] < old["throughput_rps"] * (1 - threshold) \
+                    and metrics["p50_ms"] > old["p50_ms"] + MIN_DELTA_MS:
+                regressions.append(f"{scale}/{case} throughput_rps: {old['throughput_rps']} -> "
+                                   f"{metrics['throughput_rps']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hot endpoints against generated datasets")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {scale: run_scale(scale, tmp, args.requests, args.warmup) for scale in args.scales}
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            print(f"FAIL: {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"OK: no regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Export memory benchmark
+# Exports one month and then many months for a whole school, plus the raw
+# CSV/NDJSON streams, and checks that peak RSS growth stays flat, i.e. the
+# streaming pipelines never hold the whole export in memory.
+#
+# Usage: python -m benchmarks.bench_export [--students 2000] [--months 10] [--max-growth-mb 64]
+
+import argparse
+import calendar
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import database
+from database import transaction
+from exports import (
+    write_monthly_report, write_range_report, iter_attendance_rows, csv_chunks, ndjson_chunks, gzip_chunks
+)
+
+START_YEAR, START_MONTH = 2025, 4
+
+
+def setup_database(path: str, students: int, months: int, class_size: int = 40) -> list[tuple[int, int]]:
+    """Create a school with weekday attendance for `months` months."""
+    database.close_pools()
+    database.DB_FILE = path
+    database.init_db()
+    rng = random.Random(1)
+    month_list = []
+    year, month = START_YEAR, START_MONTH
+    for _ in range(months):
+        month_list.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    school_days = [f"{y}-{m:02d}-{d:02d}" for y, m in month_list
+                   for d in range(1, calendar.monthrange(y, m)[1] + 1) if calendar.weekday(y, m, d) < 5]
+
+    with transaction() as conn:
+        class_ids = [
+            conn.execute("INSERT INTO classes (name) VALUES (?)", (f"Class {i}",)).lastrowid
+            for i in range((students + class_size - 1) // class_size)
+        ]
+        conn.executemany(
+            "INSERT INTO students (name_en, roll_no, class_id) VALUES (?, ?, ?)",
+            [(f"Student {i}", f"{i % class_size:03d}", class_ids[i // class_size]) for i in range(students)]
+        )
+        conn.executemany(
+            "INSERT INTO attendance (student_id, class_id, date, status) VALUES (?, ?, ?, ?)",
+            ((sid, class_ids[(sid - 1) // class_size], day,
+              rng.choices(["present", "absent", "late"], [90, 7, 3])[0])
+             for sid in range(1, students + 1) for day in school_days)
+        )
+    return month_list
+
+
+def write_raw(fmt: str, compress: bool) -> str:
+    """Drain a raw CSV/NDJSON export into a temp file, as a client would."""
+    chunks = (csv_chunks if fmt == "csv" else ndjson_chunks)(iter_attendance_rows())
+    if compress:
+        chunks = gzip_chunks(chunks)
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
+
+
+def _measure(fn, args, results) -> None:
+    """Child process: run fn and report (seconds, file size, RSS growth in KB)."""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    path = fn(*args)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    os.unlink(path)
+    results.put((elapsed, size, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before))
+
+
+def measure(name: str, fn, *args) -> float:
+    """Run an export in a fresh process and print its cost; returns RSS growth in MB."""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(fn, args, results))
+    process.start()
+    elapsed, size, growth_kb = results.get()
+    process.join()
+    growth_mb = growth_kb / 1024
+    print(f"  {name:<32} {elapsed:>7.2f} s  {size / 1e6:>7.1f} MB file  {growth_mb:>7.1f} MB peak RSS growth")
+    return growth_mb
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark streaming exports")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--months", type=int, default=10)
+    parser.add_argument("--max-growth-mb", type=float, default=64.0)
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method("fork")
+    with tempfile.TemporaryDirectory() as tmp:
+        months = setup_database(os.path.join(tmp, "bench.db"), args.students, args.months)
+        database.close_pools()
+        print(f"{args.students} students, {len(months)} months:")
+
+        growth = [
+            measure("one month", write_monthly_report, *months[0]),
+            measure("all months, sheet per month", write_range_report, months, None, "month"),
+            measure("all months, sheet per class", write_range_report, months, None, "class"),
+            measure("raw CSV", write_raw, "csv", False),
+            measure("raw CSV, gzip", write_raw, "csv", True),
+            measure("raw NDJSON, gzip", write_raw, "ndjson", True),
+        ]
+
+    worst = max(growth)
+    if worst > args.max_growth_mb:
+        print(f"FAIL: peak RSS growth {worst:.1f} MB exceeds {args.max_growth_mb:.1f} MB")
+        sys.exit(1)
+    print(f"OK: peak RSS growth within {args.max_growth_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
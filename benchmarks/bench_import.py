@@ -0,0 +1,84 @@
+# Roster import benchmark
+# Generates a roster of 50,000 students as CSV and XLSX and times a dry run
+# and a real import of each into a fresh database.
+#
+# Usage: python -m benchmarks.bench_import [--students 50000] [--class-size 40]
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+import database
+from database import execute_query, transaction
+from roster_import import ROSTER_COLUMNS, import_roster
+
+
+def roster_rows(students: int, class_size: int) -> list[list]:
+    return [[f"Student {i}", None, f"{i % class_size + 1:03d}", i // class_size + 1, f"0300{i:07d}"]
+            for i in range(students)]
+
+
+def write_csv(path: str, rows: list[list]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(ROSTER_COLUMNS)
+        writer.writerows(rows)
+
+
+def write_xlsx(path: str, rows: list[list]) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Roster")
+    ws.append(ROSTER_COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def reset_database(path: str, classes: int) -> None:
+    database.close_pools()
+    if os.path.exists(path):
+        os.unlink(path)
+    database.DB_FILE = path
+    database.init_db()
+    with transaction() as conn:
+        conn.executemany("INSERT INTO classes (name) VALUES (?)", [(f"Class {i}",) for i in range(classes)])
+
+
+def timed_import(path: str, fmt: str, dry_run: bool) -> tuple[float, dict]:
+    with open(path, "rb") as f:
+        start = time.perf_counter()
+        result = import_roster(f, fmt, dry_run)
+        return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bulk roster import")
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--class-size", type=int, default=40)
+    args = parser.parse_args()
+
+    classes = (args.students + args.class_size - 1) // args.class_size
+    rows = roster_rows(args.students, args.class_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        print(f"{args.students} students in {classes} classes:")
+        for fmt, writer in (("csv", write_csv), ("xlsx", write_xlsx)):
+            path = os.path.join(tmp, f"roster.{fmt}")
+            writer(path, rows)
+            reset_database(db_path, classes)
+            for dry_run in (True, False):
+                elapsed, result = timed_import(path, fmt, dry_run)
+                label = f"{fmt}, {'dry run' if dry_run else 'import'}"
+                print(f"  {label:<16} {elapsed:>6.2f} s  {result['rows'] / elapsed:>9.0f} rows/s  "
+                      f"inserted {result['inserted']}, errors {result['error_count']}")
+            stored = execute_query("SELECT COUNT(*) FROM students")[0][0]
+            assert stored == args.students, f"expected {args.students} students, found {stored}"
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Concurrent login benchmark
+# Fires concurrent POST /api/login requests at the app in-process and reports
+# logins per second, plus /api/me latency while the logins are in flight.
+#
+# Usage: python -m benchmarks.bench_login [--users 8] [--concurrency 1 8 32]
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+import database
+
+
+async def run_round(client: httpx.AsyncClient, usernames: list[str], concurrency: int, me_cookie: str) -> None:
+    """Run `concurrency` logins at once while polling /api/me."""
+    done = asyncio.Event()
+    me_latencies: list[float] = []
+
+    async def poll_me():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/api/me", cookies={"session": me_cookie})
+            me_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.005)
+
+    async def login(i: int):
+        response = await client.post("/api/login", json={
+            "username": usernames[i % len(usernames)],
+            "password": "school123",
+        })
+        response.raise_for_status()
+
+    poller = asyncio.create_task(poll_me())
+    start = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await poller
+
+    worst_me = max(me_latencies) * 1000 if me_latencies else 0.0
+    print(f"  concurrency {concurrency:>4}: {concurrency / elapsed:>8.1f} logins/s, "
+          f"max /api/me {worst_me:>7.1f} ms")
+
+
+async def bench(users: int, levels: list[int]) -> None:
+    from auth import create_users
+    from main import app
+
+    usernames = [f"bench{i}" for i in range(users)]
+    create_users([(u, "school123", "teacher", u, None) for u in usernames])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/api/login", json={"username": usernames[0], "password": "school123"})
+        me_cookie = response.cookies["session"]
+        for concurrency in levels:
+            await run_round(client, usernames, concurrency, me_cookie)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent logins")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        asyncio.run(bench(args.users, args.concurrency))
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
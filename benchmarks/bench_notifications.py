@@ -0,0 +1,76 @@
+# Notification dispatch benchmark
+# Queues N absence notifications in a scratch database and drains them
+# through the dispatcher and the file gateway, with a simulated provider
+# round trip, at several concurrency and rate-limit settings. Reports
+# messages per second.
+#
+# Usage: python -m benchmarks.bench_notifications [--messages 2000] [--latency 0.02]
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import database
+from database import transaction
+from notifier import Dispatcher, FileGateway, queue_notifications
+
+# (concurrency, messages per second; 0 = unlimited)
+SETTINGS = [(1, 0), (8, 0), (32, 0), (8, 50), (32, 200)]
+
+
+def reset_database(path: str, messages: int) -> None:
+    database.close_pools()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+    database.DB_FILE = path
+    database.init_db()
+    with transaction() as conn:
+        conn.execute("INSERT INTO classes (name) VALUES ('Class 1')")
+        conn.executemany(
+            "INSERT INTO students (name_en, roll_no, class_id, parent_phone) VALUES (?, ?, 1, ?)",
+            [(f"Student {i}", f"{i:05d}", f"0300{i:07d}") for i in range(messages)]
+        )
+        conn.execute("""
+            INSERT INTO notifications (student_id, class_id, date)
+            SELECT id, class_id, '2025-01-15' FROM students
+        """)
+
+
+async def drain(dispatcher: Dispatcher) -> int:
+    sent = 0
+    while True:
+        claimed = await dispatcher.dispatch_once()
+        if not claimed:
+            return sent
+        sent += claimed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark notification dispatch throughput")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated gateway round trip in seconds")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        print(f"{args.messages} messages, {args.latency * 1000:.0f} ms gateway latency, batches of {args.batch_size}")
+        for concurrency, rate in SETTINGS:
+            reset_database(db, args.messages)
+            queue_notifications(day="2025-01-15")
+            gateway = FileGateway(os.path.join(tmp, "outbox.jsonl"), latency=args.latency, rate=rate, burst=max(1, rate))
+            dispatcher = Dispatcher(gateway, batch_size=args.batch_size, concurrency=concurrency)
+
+            start = time.perf_counter()
+            sent = asyncio.run(drain(dispatcher))
+            elapsed = time.perf_counter() - start
+            limit = f"{rate}/s" if rate else "unlimited"
+            print(f"  concurrency {concurrency:>3}, rate {limit:>9}: {sent / elapsed:>8.1f} msg/s ({elapsed:.2f} s)")
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
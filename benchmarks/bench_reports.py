@@ -0,0 +1,109 @@
+# Monthly report benchmark
+# Builds a school of 5,000 students with one month of attendance and times the
+# old per-row report code against the shared report engine.
+#
+# Usage: python -m benchmarks.bench_reports [--students 5000] [--class-size 40]
+
+import argparse
+import calendar
+import os
+import random
+import tempfile
+import time
+
+import database
+from database import execute_query, transaction
+from reports import build_monthly_matrix, render_json, render_excel_rows
+
+YEAR, MONTH = 2025, 3
+
+
+def setup_database(path: str, students: int, class_size: int) -> list[int]:
+    """Create classes, students and a month of weekday attendance."""
+    database.close_pools()
+    database.DB_FILE = path
+    database.init_db()
+    rng = random.Random(1)
+    days = calendar.monthrange(YEAR, MONTH)[1]
+    school_days = [f"{YEAR}-{MONTH:02d}-{d:02d}" for d in range(1, days + 1)
+                   if calendar.weekday(YEAR, MONTH, d) < 5]
+
+    with transaction() as conn:
+        class_ids = [
+            conn.execute("INSERT INTO classes (name) VALUES (?)", (f"Class {i}",)).lastrowid
+            for i in range((students + class_size - 1) // class_size)
+        ]
+        conn.executemany(
+            "INSERT INTO students (name_en, roll_no, class_id) VALUES (?, ?, ?)",
+            [(f"Student {i}", f"{i % class_size:03d}", class_ids[i // class_size]) for i in range(students)]
+        )
+        conn.executemany(
+            "INSERT INTO attendance (student_id, class_id, date, status) VALUES (?, ?, ?, ?)",
+            ((sid, class_ids[(sid - 1) // class_size], day,
+              rng.choices(["present", "absent", "late"], [90, 7, 3])[0])
+             for sid in range(1, students + 1) for day in school_days)
+        )
+    return class_ids
+
+
+def legacy_report(year: int, month: int, class_id=None) -> list[dict]:
+    """The report logic main.py used before the engine (all rows, dict per student)."""
+    days_in_month = calendar.monthrange(year, month)[1]
+    start_date = f"{year}-{month:02d}-01"
+    end_date = f"{year}-{month:02d}-{days_in_month:02d}"
+    if class_id:
+        student_rows = execute_query(
+            "SELECT id, name_en, name_ur, roll_no FROM students WHERE class_id = ? ORDER BY roll_no", (class_id,))
+    else:
+        student_rows = execute_query("SELECT id, name_en, name_ur, roll_no FROM students ORDER BY class_id, roll_no")
+    attendance_rows = execute_query(
+        "SELECT student_id, date, status FROM attendance WHERE date BETWEEN ? AND ?", (start_date, end_date))
+
+    attendance_map: dict[int, dict[str, str]] = {}
+    for row in attendance_rows:
+        attendance_map.setdefault(row['student_id'], {})[str(int(row['date'].split('-')[2]))] = row['status']
+
+    students = []
+    for student in student_rows:
+        student_attendance = attendance_map.get(student['id'], {})
+        present = sum(1 for s in student_attendance.values() if s == 'present')
+        absent = sum(1 for s in student_attendance.values() if s == 'absent')
+        days = {str(d): student_attendance.get(str(d), '-') for d in range(1, days_in_month + 1)}
+        students.append({"student_id": student['id'], "days": days, "total_present": present,
+                         "total_absent": absent})
+    return students
+
+
+def timed(name: str, fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {name:<40} {best * 1000:>9.1f} ms")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark monthly reports")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--class-size", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class_ids = setup_database(os.path.join(tmp, "bench.db"), args.students, args.class_size)
+        one_class = class_ids[len(class_ids) // 2]
+        print(f"{args.students} students, {YEAR}-{MONTH:02d}:")
+
+        timed("legacy, one class", lambda: legacy_report(YEAR, MONTH, one_class))
+        timed("engine matrix, one class", lambda: build_monthly_matrix(YEAR, MONTH, one_class))
+        timed("engine JSON, one class", lambda: render_json(build_monthly_matrix(YEAR, MONTH, one_class)))
+        timed("legacy, whole school", lambda: legacy_report(YEAR, MONTH))
+        timed("engine matrix, whole school", lambda: build_monthly_matrix(YEAR, MONTH))
+        timed("engine Excel rows, whole school",
+              lambda: sum(1 for _ in render_excel_rows(build_monthly_matrix(YEAR, MONTH))))
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
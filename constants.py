@@ -1,5 +1,7 @@
 # Application Constants for School Attendance System
 
+import os
+
 # User roles
 ROLE_ADMIN = "admin"
 ROLE_PRINCIPAL = "principal"
@@ -15,14 +17,94 @@ STATUS_LATE = "late"
 ATTENDANCE_STATUSES = [STATUS_PRESENT, STATUS_ABSENT, STATUS_LATE]
 
 # Notification status
-NOTIFICATION_PENDING = "pending"
+NOTIFICATION_PENDING = "pending"  # waiting for the principal to send it
+NOTIFICATION_QUEUED = "queued"  # waiting for the dispatch worker
+NOTIFICATION_SENDING = "sending"
 NOTIFICATION_SENT = "sent"
+NOTIFICATION_FAILED = "failed"
+NOTIFICATION_CANCELLED = "cancelled"  # the student was re-marked present before it was sent
+
+NOTIFICATION_STATUSES = [
+    NOTIFICATION_PENDING, NOTIFICATION_QUEUED, NOTIFICATION_SENDING, NOTIFICATION_SENT, NOTIFICATION_FAILED,
+    NOTIFICATION_CANCELLED
+]
+
+# Development mode: reload static files when they change on disk
+DEV_MODE = os.environ.get("DEV_MODE") == "1"
 
 # Database
 DB_FILE = "school.db"
+DB_POOL_SIZE = 8  # write connections kept warm
+DB_READ_POOL_SIZE = 4  # read-only connections for report queries
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KB = 16384  # page cache per connection
+DB_MMAP_SIZE = 128 * 1024 * 1024
+DB_EXECUTOR_WORKERS = 8  # threads running database work for async routes
+DB_MAX_PENDING = 64  # running + queued database calls before callers have to wait
+DB_QUEUE_TIMEOUT = 5.0  # seconds to wait for a free slot before answering 503
+DB_QUERY_TIMEOUT = float(os.environ.get("DB_QUERY_TIMEOUT", "30"))  # seconds before a query is interrupted
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))  # log queries slower than this with their plan
+SLOW_QUERY_EXPLAIN_INTERVAL = 60  # seconds before a slow statement's plan is captured again
+DB_PARTITIONS_CHECK_INTERVAL = 1.0  # seconds between checks for year files split off by another process
+
+# List endpoints
+PAGE_SIZE_DEFAULT = 100  # rows per page when the client sends no limit
+PAGE_SIZE_MAX = 1000
+
+# Roster import
+ROSTER_IMPORT_MAX_ROWS = 100_000  # largest CSV/XLSX roster accepted in one upload
+ROSTER_IMPORT_MAX_ERRORS = 100  # row errors listed in the response (all are counted)
+
+# Passwords
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))  # raising it re-hashes on next login
+PASSWORD_HASH_WORKERS = 4
+
+# Reports
+MAX_EXPORT_MONTHS = 24  # longest range a single Excel export may cover
+REPORT_CACHE_SIZE = 64  # rendered reports kept in memory
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR")  # spill evicted reports here if set
+REPORT_CACHE_MAX_BYTES = 16 * 1024 * 1024  # larger reports are never cached
+
+# Archive
+ACADEMIC_YEAR_START_MONTH = int(os.environ.get("ACADEMIC_YEAR_START_MONTH", "4"))  # April to March
+
+# Analytics
+ANALYTICS_CHRONIC_RATE = 0.10  # absent on more than this share of marked days
+ANALYTICS_STREAK_ALERT = 3  # consecutive absences, up to the last school day, that flag a student
+ANALYTICS_TREND_DAYS = 20  # school days in each window of the trend comparison
+ANALYTICS_RISE = 0.10  # absence rate rise between the two windows that flags a student
+ANALYTICS_MAX_DAYS = 2 * 366  # longest range one request may cover
+ANALYTICS_CACHE_SIZE = 4  # attendance matrices kept in memory per process
+
+# Notification dispatch
+NOTIFY_GATEWAY = os.environ.get("NOTIFY_GATEWAY", "file")  # "file" (local outbox) or "http"
+NOTIFY_OUTBOX_FILE = os.environ.get("NOTIFY_OUTBOX_FILE", "outbox.jsonl")
+NOTIFY_HTTP_URL = os.environ.get("NOTIFY_HTTP_URL")  # SMS gateway endpoint for the http gateway
+NOTIFY_HTTP_TOKEN = os.environ.get("NOTIFY_HTTP_TOKEN")
+NOTIFY_AUTO_SEND = os.environ.get("NOTIFY_AUTO_SEND") == "1"  # queue absences as soon as they're saved
+NOTIFY_RATE = float(os.environ.get("NOTIFY_RATE", "10"))  # messages per second per gateway, per process
+NOTIFY_BURST = 10
+NOTIFY_CONCURRENCY = 8  # messages in flight at once
+NOTIFY_BATCH_SIZE = 100  # notifications claimed per database round trip
+NOTIFY_MAX_ATTEMPTS = 5
+NOTIFY_RETRY_BASE = 30.0  # seconds before the first retry, doubling each attempt
+NOTIFY_RETRY_MAX = 3600.0
+NOTIFY_LEASE = 300.0  # seconds a claimed batch may stay 'sending' before another worker retries it
+NOTIFY_POLL_INTERVAL = 5.0  # seconds between checks for due retries when idle
+
+# Metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # if set, /metrics requires "Authorization: Bearer <token>"
 
 # Session
 SESSION_COOKIE_NAME = "session"
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")  # "sqlite" or "memory"
+SESSION_TTL = 8 * 60 * 60  # seconds of inactivity before a session expires
+SESSION_TOUCH_INTERVAL = 5 * 60  # minimum seconds between expiry extensions
+SESSION_SWEEP_INTERVAL = 10 * 60
+USER_CACHE_TTL = 60  # seconds a resolved user stays cached
+USER_CACHE_SIZE = 1024
+SESSION_CACHE_TTL = 10  # seconds a resolved session stays cached; logouts reach other workers within this
+SESSION_CACHE_SIZE = 4096
 
 # Messages
 MSG_INVALID_CREDENTIALS = "Invalid username or password"
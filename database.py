@@ -1,22 +1,494 @@
 # Database module for School Attendance System
 # Handles SQLite connection and CRUD operations
 
+import asyncio
+import functools
+import logging
+import os
+import queue
+import re
 import sqlite3
-from typing import Any
-from constants import DB_FILE
+import threading
+import time
+import urllib.parse
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Callable, Iterator, NamedTuple, Optional, TypeVar
+from constants import (
+    DB_FILE, DB_POOL_SIZE, DB_READ_POOL_SIZE,
+    DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+    DB_EXECUTOR_WORKERS, DB_MAX_PENDING, DB_QUEUE_TIMEOUT, DB_QUERY_TIMEOUT,
+    SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN_INTERVAL, DB_PARTITIONS_CHECK_INTERVAL
+)
+from metrics import QueryTimer, normalize_sql
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_CHECK_STEPS = 1000  # SQLite VM instructions between deadline checks
+
+
+class DatabaseBusyError(Exception):
+    """Too many database calls are already running or queued."""
+
+
+class QueryTimeoutError(Exception):
+    """A database call ran past its deadline and was interrupted."""
+
+
+# Deadline of the database call running on the current thread, if any
+_deadline = threading.local()
+
+
+def _past_deadline() -> int:
+    """SQLite progress handler: a non-zero return interrupts the statement."""
+    deadline = getattr(_deadline, "at", None)
+    return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+
+def _archive_code(codes: Optional[bytes], day: int) -> int:
+    """SQL archive_code(codes, day): the 2-bit status code for a day (1-31) of a packed month."""
+    index = day - 1
+    if codes is None or not 0 <= index < len(codes) * 4:
+        return 0
+    return (codes[index >> 2] >> (2 * (index & 3))) & 3
+
+
+class Partition(NamedTuple):
+    """An academic year split off into its own read-only file (see partitions.py)."""
+    year: int
+    schema: str  # name it's attached under, e.g. y2024
+    path: str
+    start_date: str
+    end_date: str
+
+
+# Partitions attached to every connection this process opens. Another
+# process (partitions.py split) may add one at any time, so at most every
+# DB_PARTITIONS_CHECK_INTERVAL seconds the main file's PRAGMA data_version
+# is read, and the partitions table after it says something was committed;
+# pooled connections re-attach when the list differs.
+_partitions: Optional[list[Partition]] = None
+_partitions_file: Optional[str] = None
+_partitions_version: Optional[int] = None
+_partitions_rows: Optional[list[tuple]] = None
+_partitions_checked = 0.0  # time.monotonic() of the last check
+_partitions_watch: Optional[sqlite3.Connection] = None
+_partitions_lock = threading.Lock()
+
+
+def _read_partitions(conn: sqlite3.Connection) -> list[tuple]:
+    try:
+        return conn.execute("SELECT year, path, start_date, end_date FROM partitions ORDER BY year").fetchall()
+    except sqlite3.OperationalError:
+        return []  # not created yet
+
+
+def _load_partitions(rows: list[tuple]) -> list[Partition]:
+    found = []
+    for year, path, start_date, end_date in rows:
+        path = os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), path)
+        if os.path.exists(path):
+            found.append(Partition(year, f"y{year}", path, start_date, end_date))
+        else:
+            logger.error("Partition file %s for %d is missing; its dates will read as empty", path, year)
+    return found
+
+
+def partitions() -> list[Partition]:
+    """The partitions to attach, oldest first; checked for changes at most every DB_PARTITIONS_CHECK_INTERVAL."""
+    global _partitions, _partitions_file, _partitions_version, _partitions_rows, _partitions_checked
+    global _partitions_watch
+    current = _partitions
+    if (current is not None and _partitions_file == DB_FILE
+            and time.monotonic() - _partitions_checked < DB_PARTITIONS_CHECK_INTERVAL):
+        return current
+    with _partitions_lock:
+        if _partitions_watch is None or _partitions_file != DB_FILE:
+            if _partitions_watch is not None:
+                _partitions_watch.close()
+            _partitions_watch = sqlite3.connect(DB_FILE, check_same_thread=False)
+            _partitions, _partitions_file, _partitions_version, _partitions_rows = None, DB_FILE, None, None
+        elif _partitions is not None and time.monotonic() - _partitions_checked < DB_PARTITIONS_CHECK_INTERVAL:
+            return _partitions  # another thread just checked
+        # Changes whenever another connection commits; reading it costs no I/O
+        version = _partitions_watch.execute("PRAGMA data_version").fetchone()[0]
+        if _partitions is None or version != _partitions_version:
+            rows = _read_partitions(_partitions_watch)
+            if _partitions is None or rows != _partitions_rows:
+                _partitions, _partitions_rows = _load_partitions(rows), rows
+            _partitions_version = version
+        _partitions_checked = time.monotonic()
+        return _partitions
+
+
+def expire_partitions() -> None:
+    """Have the next partitions() call check for changes, e.g. right after a split in this process."""
+    global _partitions_checked
+    _partitions_checked = 0.0
+
+
+def partition_tables(table: str, start_date: str, end_date: str) -> list[str]:
+    """The copies of a partitioned table (attendance_archive, notifications) that can hold
+    rows dated between two dates, schema-qualified and oldest first.
+
+    Split-off years live in their attached files; the main file holds every other date.
+    """
+    attached = [p for p in partitions() if p.start_date <= end_date and start_date <= p.end_date]
+    tables = [f"{p.schema}.{table}" for p in attached]
+    # The main file is only skipped when attached years cover the whole range
+    covered_to = start_date
+    for partition in attached:
+        if partition.start_date > covered_to:
+            break
+        covered_to = max(covered_to, (date.fromisoformat(partition.end_date) + timedelta(days=1)).isoformat())
+    if covered_to <= end_date:
+        tables.append(f"main.{table}")
+    return tables
+
+
+def partition_source(table: str, start_date: str, end_date: str) -> str:
+    """A FROM-clause source for a partitioned table over a date range.
+
+    One table when the range falls in one file, otherwise a UNION ALL
+    subquery; WHERE terms on it are pushed into each file's indexes.
+    """
+    tables = partition_tables(table, start_date, end_date)
+    if len(tables) == 1:
+        return tables[0]
+    return "(" + " UNION ALL ".join(f"SELECT * FROM {name}" for name in tables) + ")"
+
+
+def prepare_connection(conn: sqlite3.Connection) -> None:
+    """Add the archive SQL functions, attach the partitions read-only and create the TEMP views.
+
+    archived_attendance unpacks attendance_archive (every file's) to one
+    row per student and day, and attendance_all adds live attendance; they
+    serve rollup rebuilds and checks, student reports and exports. Views
+    across attached files have to be TEMP, so every connection makes its own.
+    """
+    conn.create_function("archive_code", 2, _archive_code, deterministic=True)
+    attach_partitions(conn, partitions())
+
+
+def attached_partitions(conn: sqlite3.Connection) -> list[str]:
+    """Schema names of the partitions attached to a connection."""
+    return [row[1] for row in conn.execute("PRAGMA database_list") if row[1] not in ("main", "temp")]
+
+
+def attach_partitions(conn: sqlite3.Connection, attached: list[Partition]) -> None:
+    """Attach exactly ``attached`` (detaching any others) and (re)create the TEMP views over them."""
+    conn.execute("DROP VIEW IF EXISTS temp.attendance_all")
+    conn.execute("DROP VIEW IF EXISTS temp.archived_attendance")
+    present = attached_partitions(conn)
+    for schema in set(present) - {p.schema for p in attached}:
+        conn.execute("DETACH DATABASE " + schema)
+    for partition in attached:
+        if partition.schema not in present:
+            conn.execute("ATTACH DATABASE ? AS " + partition.schema,
+                         (f"file:{urllib.parse.quote(partition.path)}?mode=ro",))
+    archives = " UNION ALL ".join(
+        f"SELECT class_id, month, student_id, codes FROM {schema}.attendance_archive"
+        for schema in ["main"] + [p.schema for p in attached]
+    )
+    conn.execute(f"""
+        CREATE TEMP VIEW archived_attendance AS
+        WITH RECURSIVE days(day) AS (SELECT 1 UNION ALL SELECT day + 1 FROM days WHERE day < 31)
+        SELECT student_id, class_id, month, date,
+               CASE code WHEN 1 THEN 'present' WHEN 2 THEN 'absent' ELSE 'late' END AS status
+        FROM (
+            SELECT a.student_id, a.class_id, a.month, a.month || '-' || printf('%02d', days.day) AS date,
+                   archive_code(a.codes, days.day) AS code
+            FROM ({archives}) a CROSS JOIN days  -- archive rows outermost, so filters on them apply first
+        )
+        WHERE code > 0
+    """)
+    conn.execute("""
+        CREATE TEMP VIEW attendance_all AS
+        SELECT student_id, class_id, date, status FROM main.attendance
+        UNION ALL
+        SELECT student_id, class_id, date, status FROM archived_attendance
+    """)
 
 
 def get_db_connection() -> sqlite3.Connection:
     """Get database connection with row factory."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, uri=True)
     conn.row_factory = sqlite3.Row
+    prepare_connection(conn)
     return conn
 
 
+def _configure_connection(conn: sqlite3.Connection, readonly: bool = False) -> sqlite3.Connection:
+    """Apply row factory and per-connection pragmas."""
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.set_progress_handler(_past_deadline, DEADLINE_CHECK_STEPS)
+    if not readonly:
+        # journal_mode is persistent in the file, but setting it is cheap
+        conn.execute("PRAGMA main.journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    prepare_connection(conn)
+    return conn
+
+
+def _open_connection(db_file: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_file, uri=True, check_same_thread=False)
+    return _configure_connection(conn, readonly)
+
+
+class ConnectionPool:
+    """Bounded pool of warm SQLite connections.
+
+    Connections are created lazily up to ``size`` and handed out one at a
+    time, so callers on different threads never share a connection. Each
+    is brought up to date with partitions() as it's handed out, so a year
+    split off by another process is attached without a restart.
+    """
+
+    def __init__(self, db_file: str, size: int, readonly: bool = False):
+        self.db_file = db_file
+        self.size = size
+        self.readonly = readonly
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._attached: dict[sqlite3.Connection, list[str]] = {}  # partition schemas per connection
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = _open_connection(self.db_file, self.readonly)
+        self._attached[conn] = attached_partitions(conn)
+        return conn
+
+    def _sync_partitions(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        current = partitions()
+        if self._attached.get(conn) != [p.schema for p in current]:
+            attach_partitions(conn, current)
+            self._attached[conn] = attached_partitions(conn)
+        return conn
+
+    def acquire(self, timeout: float = DB_QUEUE_TIMEOUT) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while under the limit.
+
+        Raises DatabaseBusyError if none comes free within ``timeout`` seconds.
+        """
+        conn = self._checkout(timeout)
+        try:
+            return self._sync_partitions(conn)
+        except Exception:
+            self.release(conn)
+            raise
+
+    def _checkout(self, timeout: float) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise DatabaseBusyError("Database is busy, try again shortly") from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool, discarding any open transaction."""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed:
+                self._idle.put_nowait(conn)
+                return
+            self._attached.pop(conn, None)
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close idle connections now and checked-out ones when they're released.
+
+        A closed pool opens no new connections; get_pool() replaces it.
+        """
+        with self._lock:
+            self._closed = True
+            self._created = self.size
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                self._attached.pop(conn, None)
+                conn.close()
+
+
+_pools: dict[bool, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(readonly: bool = False) -> ConnectionPool:
+    """Get the write pool, or the read-only pool used for report queries."""
+    pool = _pools.get(readonly)
+    if pool is None or pool.db_file != DB_FILE:
+        with _pools_lock:
+            pool = _pools.get(readonly)
+            if pool is None or pool.db_file != DB_FILE:
+                size = DB_READ_POOL_SIZE if readonly else DB_POOL_SIZE
+                pool = _pools[readonly] = ConnectionPool(DB_FILE, size, readonly)
+    return pool
+
+
+def close_pools() -> None:
+    """Close all pooled connections (e.g. before replacing the database file).
+
+    The partition list is reloaded for the next connections.
+    """
+    global _partitions, _partitions_watch
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+    with _partitions_lock:
+        _partitions = None
+        if _partitions_watch is not None:
+            _partitions_watch.close()
+            _partitions_watch = None
+
+
+# Bump SCHEMA_VERSION and add a step to MIGRATIONS for changes that
+# CREATE ... IF NOT EXISTS can't make to existing files
+SCHEMA_VERSION = 3
+
+# pending: waiting for the principal; queued/sending: with the dispatch
+# worker (next_attempt_at is the retry time or the claim's lease expiry);
+# cancelled: the student was re-marked present before it was sent.
+# One notification per student per day.
+NOTIFICATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL REFERENCES students(id),
+        class_id INTEGER NOT NULL REFERENCES classes(id),
+        date TEXT NOT NULL,
+        message TEXT,
+        status TEXT DEFAULT 'pending'
+            CHECK(status IN ('pending', 'queued', 'sending', 'sent', 'failed', 'cancelled')),
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        sent_at TEXT,
+        UNIQUE(student_id, date)
+    )
+"""
+
+
+# Attendance of closed academic years, one row per student and month with
+# the day statuses packed four to a byte
+ATTENDANCE_ARCHIVE_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        class_id INTEGER NOT NULL REFERENCES classes(id),
+        month TEXT NOT NULL,
+        student_id INTEGER NOT NULL REFERENCES students(id),
+        codes BLOB NOT NULL,
+        PRIMARY KEY (class_id, month, student_id)
+    ) WITHOUT ROWID
+"""
+
+
+def _rebuild_table(conn: sqlite3.Connection, name: str, create_sql: str) -> None:
+    """Recreate a table from a new definition, copying the columns both share.
+
+    SQLite can't alter CHECK constraints in place. Indexes on the old
+    table are dropped with it and recreated by init_db.
+    """
+    old_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({name})")]
+    conn.execute(create_sql.format(name=f"{name}_new"))
+    new_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({name}_new)")}
+    columns = ", ".join(c for c in old_columns if c in new_columns)
+    conn.execute(f"INSERT INTO {name}_new ({columns}) SELECT {columns} FROM {name}")
+    conn.execute(f"DROP TABLE {name}")
+    conn.execute(f"ALTER TABLE {name}_new RENAME TO {name}")
+
+
+def _rebuild_notifications(conn: sqlite3.Connection) -> None:
+    """Rebuild notifications with the current definition, keeping one row per student and day.
+
+    Of duplicates, the one furthest along (sent first) survives, then the oldest.
+    """
+    conn.execute("""
+        DELETE FROM notifications WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY student_id, date
+                    ORDER BY CASE status WHEN 'sent' THEN 0 WHEN 'sending' THEN 1 WHEN 'queued' THEN 2
+                                         WHEN 'failed' THEN 3 WHEN 'pending' THEN 4 ELSE 5 END, id
+                ) AS n
+                FROM notifications
+            ) WHERE n > 1
+        )
+    """)
+    _rebuild_table(conn, "notifications", NOTIFICATIONS_TABLE)
+
+
+def _populate_student_stats(conn: sqlite3.Connection) -> None:
+    from rollups import populate_student_stats  # rollups imports this module
+
+    populate_student_stats(conn)
+
+
+# Each step brings a file to the current definition, so older files may run a rebuild twice
+MIGRATIONS: dict[int, Callable[[sqlite3.Connection], None]] = {
+    1: _rebuild_notifications,  # dispatch columns and statuses
+    2: _rebuild_notifications,  # UNIQUE(student_id, date), 'cancelled'
+    3: _populate_student_stats,
+}
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Run each migration newer than the file's user_version, one transaction each."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            MIGRATIONS[target](conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info("Migrated %s to schema version %d", DB_FILE, target)
+
+
 def init_db() -> None:
-    """Initialize database schema."""
+    """Initialize database schema, migrating older files to SCHEMA_VERSION."""
     conn = get_db_connection()
+    conn.execute("PRAGMA main.journal_mode = WAL")
     cursor = conn.cursor()
+    fresh = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] == 0
 
     # Users table
     cursor.execute("""
@@ -69,56 +541,417 @@ def init_db() -> None:
     """)
 
     # Notifications table
+    cursor.execute(NOTIFICATIONS_TABLE.format(name="notifications"))
+
+    # Sessions table (shared by all worker processes)
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL REFERENCES students(id),
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+    # Daily per-class attendance summary, kept in step with attendance writes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_class_summary (
             class_id INTEGER NOT NULL REFERENCES classes(id),
             date TEXT NOT NULL,
-            message TEXT,
-            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'sent')),
+            total_students INTEGER NOT NULL DEFAULT 0,
+            present_count INTEGER NOT NULL DEFAULT 0,
+            absent_count INTEGER NOT NULL DEFAULT 0,
+            late_count INTEGER NOT NULL DEFAULT 0,
+            submitted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (class_id, date)
+        ) WITHOUT ROWID
+    """)
+
+    # Per-student attendance counts per month (YYYY-MM) and lifetime ('*'), kept in step with attendance writes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS student_attendance_stats (
+            student_id INTEGER NOT NULL REFERENCES students(id),
+            month TEXT NOT NULL,
+            present_count INTEGER NOT NULL DEFAULT 0,
+            absent_count INTEGER NOT NULL DEFAULT 0,
+            late_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, month)
+        ) WITHOUT ROWID
+    """)
+
+    # Per-month report version counters, bumped by every write that changes a report
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_versions (
+            month TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, class_id)
+        ) WITHOUT ROWID
+    """)
+
+    # Attendance of closed academic years (see archive.py)
+    cursor.execute(ATTENDANCE_ARCHIVE_TABLE.format(name="attendance_archive"))
+
+    # Academic years moved to attendance_archive, by the calendar year they start in
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive_years (
+            year INTEGER PRIMARY KEY,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            records INTEGER NOT NULL,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Academic years split off into their own files (see partitions.py), by
+    # the calendar year they start in; path is relative to this file
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS partitions (
+            year INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
+    # These views are TEMP now (see prepare_connection)
+    cursor.execute("DROP VIEW IF EXISTS main.attendance_all")
+    cursor.execute("DROP VIEW IF EXISTS main.archived_attendance")
+
+    if fresh:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    else:
+        _migrate(conn)
+
     # Create indexes
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_id)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attendance_class_date ON attendance(class_id, date, student_id, status)"
+    )
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_class ON students(class_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_status ON notifications(status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_role_name ON users(role, name_en)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_classes_name ON classes(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_classes_teacher ON classes(teacher_id)")
+    # Newest-first notification pages, with and without a status filter
+    cursor.execute("DROP INDEX IF EXISTS idx_notifications_status")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_created ON notifications(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_status_created ON notifications(status, created_at)")
+    # Only the dispatch worker's backlog, so it stays tiny
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notifications_dispatch ON notifications(next_attempt_at)
+        WHERE status IN ('queued', 'sending')
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_summary_date ON daily_class_summary(date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_student ON attendance_archive(student_id, month)")
 
     conn.commit()
     conn.close()
 
 
-def execute_query(query: str, params: tuple = ()) -> list[sqlite3.Row]:
-    """Execute a SELECT query and return results."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    results = cursor.fetchall()
-    conn.close()
-    return results
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run several statements atomically on one pooled write connection.
+
+    The write lock is taken up front (BEGIN IMMEDIATE), so concurrent
+    writers wait on busy_timeout instead of failing halfway through.
+    Any exception rolls the whole transaction back.
+    """
+    with get_pool().connection() as conn:
+        timed = TimedConnection(conn)
+        timed.execute("BEGIN IMMEDIATE")
+        yield timed
+        with QueryTimer("COMMIT"):
+            conn.commit()
+
+
+class TimedConnection:
+    """A connection whose execute() and executemany() calls are timed like execute_query's.
+
+    transaction() hands these out so write paths show up in the statement
+    metrics. For a SELECT only the first step is timed; rows fetched from
+    the cursor afterwards are not counted.
+    """
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def execute(self, query: str, params: Any = ()) -> sqlite3.Cursor:
+        with QueryTimer(query) as timer:
+            cursor = self._conn.execute(query, params)
+            timer.rows = max(cursor.rowcount, 0)
+        return cursor
+
+    def executemany(self, query: str, params: Any) -> sqlite3.Cursor:
+        with QueryTimer(query) as timer:
+            cursor = self._conn.executemany(query, params)
+            timer.rows = max(cursor.rowcount, 0)
+        return cursor
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+
+def execute_query(query: str, params: tuple = (), readonly: bool = False) -> list[sqlite3.Row]:
+    """Execute a SELECT query and return results.
+
+    Pass ``readonly=True`` for report queries so they run on the
+    read-only pool and never compete with writers for a connection.
+    """
+    with QueryTimer(query) as timer, get_pool(readonly).connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+        timer.rows = len(rows)
+    _check_slow(timer, params)
+    return rows
+
+
+def iter_query(query: str, params: tuple = (), readonly: bool = True,
+               batch_size: int = 1000, conn: Optional[sqlite3.Connection] = None) -> Iterator[sqlite3.Row]:
+    """Stream a SELECT query's rows from the cursor in batches.
+
+    Without ``conn`` a pooled connection is held until the generator is
+    exhausted or closed, so consume it promptly.
+    """
+    with nullcontext(conn) if conn is not None else get_pool(readonly).connection() as conn:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+@contextmanager
+def stream_connection() -> Iterator[sqlite3.Connection]:
+    """A short-lived read-only connection outside the pools, for long streams.
+
+    A download held open by a slow client would otherwise keep a pooled
+    read connection away from the report queries for its whole length.
+    """
+    conn = _open_connection(DB_FILE, readonly=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
 
 
 def execute_insert(query: str, params: tuple = ()) -> int:
     """Execute an INSERT query and return the last row ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    conn.commit()
-    last_id = cursor.lastrowid
-    conn.close()
-    return last_id
+    with QueryTimer(query) as timer, get_pool().connection() as conn:
+        cursor = conn.execute(query, params)
+        conn.commit()
+        timer.rows = cursor.rowcount
+    _check_slow(timer, params)
+    return cursor.lastrowid
 
 
 def execute_update(query: str, params: tuple = ()) -> None:
     """Execute an UPDATE or DELETE query."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    conn.commit()
-    conn.close()
+    with QueryTimer(query) as timer, get_pool().connection() as conn:
+        timer.rows = conn.execute(query, params).rowcount
+        conn.commit()
+    _check_slow(timer, params)
+
+
+# ==================== SLOW QUERY LOG ====================
+
+slow_query_logger = logging.getLogger("school.slow_query")
+
+_SCAN = re.compile(r"SCAN (?:\w+\.)?(\w+)(?: USING (?:COVERING )?INDEX (\w+))?$")  # e.g. SCAN main.attendance
+
+# normalized statement -> (time of last EXPLAIN, plan lines)
+_plans: dict[str, tuple[float, list[str]]] = {}
+
+
+def explain_query_plan(conn: sqlite3.Connection, query: str, params: tuple = ()) -> list[str]:
+    """SQLite's EXPLAIN QUERY PLAN for a statement, one line per plan step."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def plan_warnings(plan: list[str]) -> list[str]:
+    """Pick out full table scans, full index scans and temporary sorts."""
+    warnings = []
+    for step in plan:
+        match = _SCAN.match(step)
+        if match and match.group(1) != "CONSTANT":
+            if match.group(2):
+                warnings.append(f"full index scan of {match.group(1)} ({match.group(2)})")
+            else:
+                warnings.append(f"full table scan of {match.group(1)}")
+        elif step.startswith("USE TEMP B-TREE"):
+            warnings.append(f"temporary b-tree: {step[len('USE TEMP B-TREE '):].lower()}")
+    return warnings
+
+
+def params_shape(params: Any) -> str:
+    """Describe parameters by type only, e.g. (int, str[10]); values are never logged."""
+    def describe(value: Any) -> str:
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {describe(v)}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(describe(v) for v in params) + ")"
+
+
+def _check_slow(timer: QueryTimer, params: Any) -> None:
+    """Log a call slower than SLOW_QUERY_MS with its query plan.
+
+    The plan is re-explained at most once per SLOW_QUERY_EXPLAIN_INTERVAL
+    per statement, so a hot slow query doesn't double its own cost.
+    """
+    if timer.elapsed * 1000 < SLOW_QUERY_MS:
+        return
+    statement = normalize_sql(timer.query)
+    now = time.monotonic()
+    cached = _plans.get(statement)
+    if cached is None or now - cached[0] > SLOW_QUERY_EXPLAIN_INTERVAL:
+        try:
+            with get_pool(readonly=True).connection() as conn:
+                plan = explain_query_plan(conn, timer.query, params)
+        except (sqlite3.Error, DatabaseBusyError) as e:
+            plan = [f"(EXPLAIN failed: {e})"]
+        cached = _plans[statement] = (now, plan)
+    plan = cached[1]
+    warnings = plan_warnings(plan)
+    slow_query_logger.warning(
+        "slow query %.1f ms, %d rows, params %s: %s\n  plan: %s%s",
+        timer.elapsed * 1000, timer.rows, params_shape(params), statement, " | ".join(plan),
+        "".join(f"\n  WARNING: {w}" for w in warnings)
+    )
+
+
+# ==================== ASYNC ACCESS ====================
+#
+# Async routes must not touch SQLite on the event loop: one slow report
+# would stall every other request on the worker. These helpers run the
+# blocking calls on a dedicated, bounded thread pool instead. At most
+# DB_MAX_PENDING calls may be running or queued; further callers wait up
+# to DB_QUEUE_TIMEOUT for a slot and then get DatabaseBusyError. Each call
+# gets a deadline, enforced by the connection's progress handler, after
+# which the running statement is interrupted with QueryTimeoutError.
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _run_with_deadline(fn: Callable[[], T], timeout: Optional[float]) -> T:
+    _deadline.at = time.monotonic() + timeout if timeout else None
+    try:
+        return fn()
+    except sqlite3.OperationalError as e:
+        if str(e) == "interrupted" and _past_deadline():
+            raise QueryTimeoutError(f"Database call exceeded {timeout:g}s") from e
+        raise
+    finally:
+        _deadline.at = None
+
+
+async def run_db(fn: Callable[..., T], *args: Any, timeout: Optional[float] = DB_QUERY_TIMEOUT, **kwargs: Any) -> T:
+    """Run a blocking database function on the database executor and await it.
+
+    Use this for anything that needs several statements, e.g. a
+    function wrapping ``with transaction() as conn:``. The slot is held
+    until the call really finishes, even if the awaiting request is
+    cancelled, so the executor queue stays bounded.
+    """
+    slots = await _acquire_slot()
+    call = functools.partial(fn, *args, **kwargs)
+    future = asyncio.get_running_loop().run_in_executor(_db_executor, _run_with_deadline, call, timeout)
+    future.add_done_callback(lambda _: slots.release())
+    return await asyncio.shield(future)
+
+
+async def _acquire_slot() -> asyncio.Semaphore:
+    """Take one of this loop's DB_MAX_PENDING slots and return the semaphore to release."""
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(DB_MAX_PENDING)
+    try:
+        await asyncio.wait_for(slots.acquire(), DB_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise DatabaseBusyError("Database is busy, try again shortly") from None
+    return slots
+
+
+class DatabaseStream:
+    """Async iteration over a blocking iterator that reads the database.
+
+    Each item is produced on the database executor under its own
+    deadline. The stream holds one DB_MAX_PENDING slot from creation
+    until ``close()``, which also closes the iterator (and with it any
+    connection it holds) once no item is being produced.
+    """
+
+    def __init__(self, iterator: Iterator[T], slots: asyncio.Semaphore, timeout: Optional[float]):
+        self._iterator = iterator
+        self._slots = slots
+        self._timeout = timeout
+        self._pending: Optional[asyncio.Future] = None
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[T]:
+        loop = asyncio.get_running_loop()
+        done = object()
+        step = functools.partial(next, self._iterator, done)
+        try:
+            while not self._closed:
+                self._pending = loop.run_in_executor(_db_executor, _run_with_deadline, step, self._timeout)
+                item = await asyncio.shield(self._pending)
+                if item is done:
+                    break
+                yield item
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Close the iterator and free the slot; safe to call more than once."""
+        if self._closed and self._slots is None:
+            return
+        self._closed = True
+        if self._pending is not None and not self._pending.done():
+            # Closing a generator another thread is running raises; finish after it
+            self._pending.add_done_callback(lambda _: self.close())
+            return
+        slots, self._slots = self._slots, None
+        try:
+            close = getattr(self._iterator, "close", None)
+            if close is not None:
+                close()
+        finally:
+            slots.release()
+
+
+async def stream_db(iterator: Iterator[T], timeout: Optional[float] = DB_QUERY_TIMEOUT) -> DatabaseStream:
+    """Wrap a blocking iterator for a StreamingResponse, counted against DB_MAX_PENDING.
+
+    The slot is taken here, so a busy database gets DatabaseBusyError
+    (503) before the response starts. Pass ``stream.close`` as the
+    response's background task: it runs even if the client disconnects.
+    """
+    return DatabaseStream(iterator, await _acquire_slot(), timeout)
+
+
+async def query_async(query: str, params: tuple = (), readonly: bool = False,
+                      timeout: Optional[float] = DB_QUERY_TIMEOUT) -> list[sqlite3.Row]:
+    """Async execute_query."""
+    return await run_db(execute_query, query, params, readonly, timeout=timeout)
+
+
+async def insert_async(query: str, params: tuple = ()) -> int:
+    """Async execute_insert."""
+    return await run_db(execute_insert, query, params)
+
+
+async def update_async(query: str, params: tuple = ()) -> None:
+    """Async execute_update."""
+    await run_db(execute_update, query, params)
 
 
 def row_to_dict(row: sqlite3.Row) -> dict[str, Any]:
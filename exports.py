@@ -0,0 +1,192 @@
+# Streaming exports for School Attendance System
+# Writes Excel reports with openpyxl's write-only mode, fed row by row from
+# the database cursor and spooled to a temporary file, and streams raw
+# attendance as CSV or NDJSON
+
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from openpyxl import Workbook
+
+from database import execute_query, iter_query, stream_connection
+from reports import month_bounds, excel_header, excel_row, stream_student_months
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Raw attendance export columns, named after the attendance/students/classes schema
+ATTENDANCE_EXPORT_COLUMNS = [
+    "id", "date", "student_id", "roll_no", "name_en", "name_ur",
+    "class_id", "class_name", "status", "marked_by", "created_at",
+]
+
+EXPORT_CHUNK_ROWS = 1000  # rows per streamed chunk
+
+
+def parse_month(value: str) -> tuple[int, int]:
+    """Parse 'YYYY-MM' into (year, month)."""
+    match = re.fullmatch(r"(\d{4})-(\d{2})", value)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Invalid month: {value}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def month_range(start: tuple[int, int], end: tuple[int, int]) -> list[tuple[int, int]]:
+    """List (year, month) pairs from start to end inclusive."""
+    months = []
+    year, month = start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _sheet_title(title: str, used: set[str]) -> str:
+    """Make a unique worksheet title within Excel's limits."""
+    base = re.sub(r"[\\/*?:\[\]]", "-", title)[:31] or "Sheet"
+    candidate, n = base, 2
+    while candidate in used:
+        suffix = f" ({n})"
+        candidate, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate)
+    return candidate
+
+
+def _spool(wb: Workbook) -> str:
+    """Save a workbook to a temporary file and return its path."""
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb.save(path)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+def write_monthly_report(year: int, month: int, class_id: Optional[int] = None) -> str:
+    """Write a single-month report (the classic export layout) to a temp file."""
+    days = month_bounds(year, month)[0]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Attendance Report")
+    ws.append(excel_header(days))
+    for student, cells, present, absent in stream_student_months(year, month, class_id):
+        ws.append(excel_row(student, cells, present, absent))
+    return _spool(wb)
+
+
+def write_range_report(months: list[tuple[int, int]], class_id: Optional[int] = None,
+                       sheet_per: str = "month") -> str:
+    """Write a multi-month report to a temp file.
+
+    ``sheet_per="month"`` gives one sheet per month with a Class column;
+    ``sheet_per="class"`` gives one sheet per class with a Month column.
+    Rows are streamed from the database, so memory use doesn't grow with
+    the number of students or months.
+    """
+    if class_id:
+        class_rows = execute_query("SELECT id, name FROM classes WHERE id = ?", (class_id,), readonly=True)
+    else:
+        class_rows = execute_query("SELECT id, name FROM classes ORDER BY name", readonly=True)
+    class_names = {row['id']: row['name'] for row in class_rows}
+
+    wb = Workbook(write_only=True)
+    used_titles: set[str] = set()
+    day_headers = [str(d) for d in range(1, 32)]
+    totals_header = ["Total P", "Total A", "%"]
+
+    if sheet_per == "class":
+        for cid, name in class_names.items():
+            ws = wb.create_sheet(_sheet_title(name, used_titles))
+            ws.append(["Month", "Roll No", "Student Name"] + day_headers + totals_header)
+            for year, month in months:
+                label = f"{year}-{month:02d}"
+                padding = [None] * (31 - month_bounds(year, month)[0])
+                for student, cells, present, absent in stream_student_months(year, month, cid):
+                    row = excel_row(student, cells, present, absent)
+                    ws.append([label] + row[:-3] + padding + row[-3:])
+    else:
+        for year, month in months:
+            days = month_bounds(year, month)[0]
+            ws = wb.create_sheet(_sheet_title(f"{year}-{month:02d}", used_titles))
+            ws.append(["Class", "Roll No", "Student Name"] + day_headers[:days] + totals_header)
+            for student, cells, present, absent in stream_student_months(year, month, class_id):
+                if student['class_id'] in class_names:
+                    ws.append([class_names[student['class_id']]] + excel_row(student, cells, present, absent))
+
+    if not used_titles:
+        wb.create_sheet("Attendance Report")
+    return _spool(wb)
+
+
+def iter_attendance_rows(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                         class_id: Optional[int] = None) -> Iterator[tuple]:
+    """Stream raw attendance rows in date order, in ATTENDANCE_EXPORT_COLUMNS order.
+
+    Archived years come first (they predate every live record) and have
+    no id, marked_by or created_at. Both are read on one short-lived
+    connection of their own rather than a pooled one.
+    """
+    start_date, end_date = start_date or "0000-01-01", end_date or "9999-12-31"
+    class_filter = "AND a.class_id = ?" if class_id else ""
+    params = (start_date, end_date) + ((class_id,) if class_id else ())
+    sources = (
+        # The month filter lets the archive skip unpacking months outside the range
+        ("archived_attendance", "NULL", "NULL, NULL", "AND a.month BETWEEN ? AND ?", (start_date[:7], end_date[:7])),
+        ("attendance", "a.id", "a.marked_by, a.created_at", "", ()),
+    )
+    with stream_connection() as conn:
+        for source, id_column, audit_columns, month_filter, month_params in sources:
+            for row in iter_query(f"""
+                SELECT {id_column}, a.date, a.student_id, s.roll_no, s.name_en, s.name_ur,
+                       a.class_id, c.name, a.status, {audit_columns}
+                FROM {source} a
+                LEFT JOIN students s ON s.id = a.student_id
+                LEFT JOIN classes c ON c.id = a.class_id
+                WHERE a.date BETWEEN ? AND ? {class_filter} {month_filter}
+                ORDER BY a.date
+            """, params + month_params, batch_size=EXPORT_CHUNK_ROWS, conn=conn):
+                yield tuple(row)
+
+
+def csv_chunks(rows: Iterable[tuple]) -> Iterator[bytes]:
+    """Encode rows as CSV with a header line, a chunk at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ATTENDANCE_EXPORT_COLUMNS)
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(rows: Iterable[tuple]) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON objects, a chunk at a time."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(ATTENDANCE_EXPORT_COLUMNS, row)), ensure_ascii=False))
+        if len(lines) == EXPORT_CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
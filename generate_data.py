@@ -0,0 +1,246 @@
+# Synthetic data generator for School Attendance System
+# Builds load-test and benchmark datasets of any size: users, classes,
+# students, weekday attendance over several years and absence
+# notifications, bulk-loaded in batched transactions. The same seed and
+# --end date always produce the same data.
+#
+# Usage: python generate_data.py --db load.db --schools 2 --classes 40 --students 40 --years 3
+#
+# Every user's password is --password (default school123). Usernames:
+# admin, principal (principal2, ... for further schools), teacher1..N
+# (one per class, in class order).
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Iterator
+
+import database
+from auth import hash_passwords
+from constants import (
+    BCRYPT_ROUNDS, ROLE_ADMIN, ROLE_PRINCIPAL, ROLE_TEACHER,
+    STATUS_PRESENT, STATUS_ABSENT, STATUS_LATE, NOTIFICATION_PENDING, NOTIFICATION_SENT
+)
+from rollups import rebuild_daily_summary, rebuild_student_stats
+
+MARKED_AT = "08:30:00"  # created_at time of day for generated attendance
+
+
+def school_days(end: date, years: float) -> list[str]:
+    """Weekdays in the `years` years up to and including `end`, oldest first."""
+    start = end - timedelta(days=round(years * 365))
+    days = []
+    day = start + timedelta(days=1)
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+class Generator:
+    """Writes one synthetic dataset into an empty database."""
+
+    def __init__(self, conn: sqlite3.Connection, args: argparse.Namespace):
+        self.conn = conn
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.statuses = (STATUS_PRESENT, STATUS_ABSENT, STATUS_LATE)
+        self.cum_weights = (
+            1 - args.absent_rate - args.late_rate,
+            1 - args.late_rate,
+            1.0,
+        )
+
+    def create_users(self, classes: int) -> tuple[list[int], list[int]]:
+        """Create admin, principals and one teacher per class; returns (principal_ids, teacher_ids)."""
+        users = [("admin", ROLE_ADMIN, "Admin User", "منتظم")]
+        users += [
+            ("principal" if s == 0 else f"principal{s + 1}", ROLE_PRINCIPAL, f"Principal {s + 1}", "پرنسپل")
+            for s in range(self.args.schools)
+        ]
+        users += [(f"teacher{i}", ROLE_TEACHER, f"Teacher {i}", f"استاد {i}") for i in range(1, classes + 1)]
+        hashes = hash_passwords([self.args.password] * len(users), self.args.bcrypt_rounds)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO users (username, password, role, name_en, name_ur) VALUES (?, ?, ?, ?, ?)",
+                [(username, hashed, role, name_en, name_ur)
+                 for (username, role, name_en, name_ur), hashed in zip(users, hashes)]
+            )
+        ids = {row[0]: row[1] for row in self.conn.execute("SELECT username, id FROM users")}
+        principal_ids = [ids[u[0]] for u in users if u[1] == ROLE_PRINCIPAL]
+        teacher_ids = [ids[u[0]] for u in users if u[1] == ROLE_TEACHER]
+        return principal_ids, teacher_ids
+
+    def create_classes(self, teacher_ids: list[int]) -> list[int]:
+        rows = []
+        for s in range(self.args.schools):
+            prefix = f"S{s + 1} " if self.args.schools > 1 else ""
+            for c in range(self.args.classes):
+                grade, section = divmod(c, 4)
+                rows.append((f"{prefix}{grade + 1}-{'ABCD'[section]}", f"{prefix}جماعت {grade + 1}-{section + 1}"))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO classes (name, name_ur, teacher_id) VALUES (?, ?, ?)",
+                [(name, name_ur, teacher_id) for (name, name_ur), teacher_id in zip(rows, teacher_ids)]
+            )
+        return [row[0] for row in self.conn.execute("SELECT id FROM classes ORDER BY id")]
+
+    def create_students(self, class_ids: list[int]) -> dict[int, list[int]]:
+        """Create students; returns class_id -> student ids in roll order."""
+        width = max(2, len(str(self.args.students)))
+        phone = 1000000
+        rows = []
+        for class_id in class_ids:
+            for roll in range(1, self.args.students + 1):
+                rows.append((f"Student {class_id}-{roll:0{width}d}", f"طالب علم {class_id}-{roll:0{width}d}",
+                             f"{roll:0{width}d}", class_id, f"0300-{phone:07d}"))
+                phone += 1
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO students (name_en, name_ur, roll_no, class_id, parent_phone) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        roster: dict[int, list[int]] = {class_id: [] for class_id in class_ids}
+        for student_id, class_id in self.conn.execute("SELECT id, class_id FROM students ORDER BY class_id, roll_no"):
+            roster[class_id].append(student_id)
+        return roster
+
+    def attendance_rows(self, days: list[str], roster: dict[int, list[int]],
+                        teachers: dict[int, int]) -> Iterator[tuple]:
+        """Yield (student_id, class_id, date, status, marked_by, created_at), day by day."""
+        choices = self.rng.choices
+        for day in days:
+            created_at = f"{day} {MARKED_AT}"
+            for class_id, students in roster.items():
+                marked_by = teachers[class_id]
+                statuses = choices(self.statuses, cum_weights=self.cum_weights, k=len(students))
+                for student_id, status in zip(students, statuses):
+                    yield student_id, class_id, day, status, marked_by, created_at
+
+    def load_attendance(self, days: list[str], roster: dict[int, list[int]],
+                        teachers: dict[int, int]) -> tuple[int, int]:
+        """Insert attendance and a notification per absence, one transaction per batch."""
+        today = days[-1] if days else ""
+        attendance = notifications = 0
+        batch: list[tuple] = []
+
+        def flush() -> None:
+            nonlocal notifications
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO attendance (student_id, class_id, date, status, marked_by, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                absences = [
+                    (sid, cid, day, NOTIFICATION_PENDING if day == today else NOTIFICATION_SENT, created_at)
+                    for sid, cid, day, status, _, created_at in batch if status == STATUS_ABSENT
+                ]
+                self.conn.executemany(
+                    "INSERT INTO notifications (student_id, class_id, date, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                    absences
+                )
+            notifications += len(absences)
+            batch.clear()
+
+        for row in self.attendance_rows(days, roster, teachers):
+            batch.append(row)
+            if len(batch) >= self.args.batch_size:
+                attendance += len(batch)
+                flush()
+                print(f"\r  attendance: {attendance:,} rows", end="", flush=True)
+        if batch:
+            attendance += len(batch)
+            flush()
+        print(f"\r  attendance: {attendance:,} rows")
+        return attendance, notifications
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate a synthetic attendance dataset")
+    parser.add_argument("--db", default=database.DB_FILE, help="database file (must be empty unless --force)")
+    parser.add_argument("--force", action="store_true", help="delete the database file first")
+    parser.add_argument("--schools", type=int, default=1)
+    parser.add_argument("--classes", type=int, default=8, help="classes per school")
+    parser.add_argument("--students", type=int, default=20, help="students per class")
+    parser.add_argument("--years", type=float, default=1.0, help="years of weekday attendance")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(),
+                        help="last attendance date (default today); fix it for reproducible output")
+    parser.add_argument("--absent-rate", type=float, default=0.07)
+    parser.add_argument("--late-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--password", default="school123")
+    parser.add_argument("--bcrypt-rounds", type=int, default=BCRYPT_ROUNDS)
+    parser.add_argument("--batch-size", type=int, default=100_000, help="attendance rows per transaction")
+    return parser
+
+
+def generate(args: argparse.Namespace) -> None:
+    """Generate a dataset into args.db, which then becomes database.DB_FILE."""
+    if not 0 <= args.absent_rate + args.late_rate <= 1:
+        raise ValueError("--absent-rate plus --late-rate must be between 0 and 1")
+
+    if args.force:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.unlink(args.db + suffix)
+    database.close_pools()
+    database.DB_FILE = args.db
+    database.init_db()
+
+    conn = database.get_db_connection()
+    if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]:
+        conn.close()
+        raise ValueError(f"{args.db} already has data; use --force to replace it")
+    # A fresh file can simply be regenerated if the load is interrupted
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(f"PRAGMA cache_size = -{256 * 1024}")
+
+    start = time.perf_counter()
+    gen = Generator(conn, args)
+    total_classes = args.schools * args.classes
+    principal_ids, teacher_ids = gen.create_users(total_classes)
+    print(f"  users: {len(teacher_ids) + len(principal_ids) + 1} ({len(teacher_ids)} teachers)")
+    class_ids = gen.create_classes(teacher_ids)
+    roster = gen.create_students(class_ids)
+    print(f"  classes: {len(class_ids)}, students: {sum(map(len, roster.values())):,}")
+
+    # Secondary indexes are much cheaper to build once than to maintain row by row
+    indexes = conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name IN ('attendance', 'notifications') AND sql IS NOT NULL
+    """).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+    days = school_days(args.end, args.years)
+    teachers = dict(zip(class_ids, teacher_ids))
+    attendance, notifications = gen.load_attendance(days, roster, teachers)
+    for _, sql in indexes:
+        conn.execute(sql)
+    print(f"  school days: {len(days)}, notifications: {notifications:,}")
+    conn.close()
+
+    rows = rebuild_daily_summary()
+    stats = rebuild_student_stats()
+    database.close_pools()
+    print(f"  daily_class_summary: {rows:,} rows")
+    print(f"  student_attendance_stats: {stats:,} rows")
+    print(f"Generated {args.db} in {time.perf_counter() - start:.1f} s")
+
+
+def main() -> None:
+    parser = build_parser()
+    try:
+        generate(parser.parse_args())
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
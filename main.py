@@ -1,32 +1,67 @@
 # Main FastAPI application for School Attendance System
 
+import base64
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import date, timedelta
 from typing import Optional
-from fastapi import FastAPI, Request, Response, HTTPException, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, Query, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 
 from constants import (
     ROLE_ADMIN, ROLE_PRINCIPAL, ROLE_TEACHER,
-    STATUS_PRESENT, STATUS_ABSENT, STATUS_LATE,
-    NOTIFICATION_PENDING, NOTIFICATION_SENT,
-    SESSION_COOKIE_NAME, MSG_INVALID_CREDENTIALS
+    STATUS_PRESENT, STATUS_ABSENT, ATTENDANCE_STATUSES,
+    NOTIFICATION_PENDING, NOTIFICATION_QUEUED, NOTIFICATION_CANCELLED, NOTIFICATION_STATUSES, NOTIFY_AUTO_SEND,
+    SESSION_COOKIE_NAME, MSG_INVALID_CREDENTIALS, DEV_MODE, MAX_EXPORT_MONTHS, REPORT_CACHE_MAX_BYTES,
+    METRICS_TOKEN, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, ANALYTICS_MAX_DAYS
+)
+from database import (
+    init_db, transaction, run_db, query_async, insert_async, update_async, rows_to_list, row_to_dict,
+    partition_source, stream_db, DatabaseBusyError, QueryTimeoutError
+)
+from rollups import refresh_class_day, refresh_class_totals, refresh_student_months, student_summary
+from reports import build_monthly_matrix, build_history_matrix, render_json, code_symbols, pack_codes
+from archive import academic_year, archived_until, year_bounds
+from analytics import chronic_absence_report
+from roster_import import RosterFileError, import_roster
+from notifier import queue_notifications, start_dispatcher, stop_dispatcher, wake_dispatcher
+from pagination import Listing, PageError
+from assets import AssetStore
+from metrics import MetricsMiddleware, PROMETHEUS_MEDIA_TYPE, registry
+from report_cache import CachedReport, report_cache, report_stamp, bump_report_version, etag_matches, accepts_encoding
+from exports import (
+    XLSX_MEDIA_TYPE, CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE, parse_month, month_range,
+    write_monthly_report, write_range_report, iter_attendance_rows, csv_chunks, ndjson_chunks, gzip_chunks
+)
+from auth import (
+    authenticate_user_async, hash_password_async, get_user_from_session, create_session, delete_session, get_user_by_id,
+    delete_user, start_session_sweeper, stop_session_sweeper
 )
-from database import init_db, execute_query, execute_insert, execute_update, rows_to_list, row_to_dict
-from auth import authenticate_user, get_user_from_session, create_session, delete_session, get_user_by_id
 from models import (
     LoginRequest, UserResponse, TeacherCreate, StudentCreate, ClassCreate,
     AssignTeacherRequest, AttendanceSaveRequest, DashboardStats, DashboardResponse,
-    ClassSummary, MonthlyReportResponse, MonthlyReportStudent, NotificationResponse
+    ClassSummary, NotificationResponse
 )
 
 # Initialize database on startup
 init_db()
 
-app = FastAPI(title="School Attendance System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers for the lifetime of the app."""
+    start_session_sweeper()
+    start_dispatcher()
+    yield
+    await stop_dispatcher()
+    stop_session_sweeper()
+
+
+app = FastAPI(title="School Attendance System", lifespan=lifespan)
 
 # Add CORS middleware to allow browser access
 app.add_middleware(
@@ -36,9 +71,47 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(DatabaseBusyError)
+async def database_busy_handler(request: Request, exc: DatabaseBusyError):
+    """Shed load when the database executor's queue is full."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(PageError)
+async def page_error_handler(request: Request, exc: PageError):
+    """Bad cursor, limit or fields on a list endpoint."""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(QueryTimeoutError)
+async def query_timeout_handler(request: Request, exc: QueryTimeoutError):
+    """A query ran past DB_QUERY_TIMEOUT and was interrupted."""
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+# Static pages and assets, preloaded and precompressed
+assets = AssetStore("static", dev_mode=DEV_MODE)
+assets.load()
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus metrics for this worker process."""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(content=registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@app.get("/static/{filename}")
+async def static_file(request: Request, filename: str):
+    """Serve a static asset from memory (fingerprinted URLs are cached forever)."""
+    response = assets.static_response(request, filename)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return response
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Simple session dependency
 def get_current_user(request: Request) -> Optional[dict]:
@@ -65,7 +138,7 @@ def require_role(allowed_roles: list[str]):
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Redirect to login or dashboard based on auth status."""
-    user = get_current_user(request)
+    user = await run_db(get_current_user, request)
     if user:
         if user['role'] == ROLE_ADMIN:
             return HTMLResponse(content="", headers={"Location": "/admin"})
@@ -77,21 +150,20 @@ async def root(request: Request):
 
 
 @app.get("/login", response_class=HTMLResponse)
-async def login_page():
+async def login_page(request: Request):
     """Serve login page."""
-    with open("static/login.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return assets.page_response(request, "login.html")
 
 
 @app.post("/api/login")
 async def login(request: Request, login_data: LoginRequest):
     """Login endpoint."""
-    user = authenticate_user(login_data.username, login_data.password)
+    user = await authenticate_user_async(login_data.username, login_data.password)
     if not user:
         raise HTTPException(status_code=401, detail=MSG_INVALID_CREDENTIALS)
 
     # Create session
-    session_id = create_session(user['id'])
+    session_id = await run_db(create_session, user['id'])
 
     response = JSONResponse(content=UserResponse(
         id=user['id'],
@@ -115,7 +187,7 @@ async def logout(request: Request):
     """Logout endpoint."""
     session_id = request.cookies.get(SESSION_COOKIE_NAME)
     if session_id:
-        delete_session(session_id)
+        await run_db(delete_session, session_id)
 
     response = JSONResponse(content={"message": "Logged out"})
     response.delete_cookie(SESSION_COOKIE_NAME)
@@ -139,39 +211,43 @@ async def get_me(user: Optional[dict] = Depends(get_current_user)):
 # ==================== ADMIN ROUTES ====================
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_page(user: dict = Depends(require_role([ROLE_ADMIN]))):
+async def admin_page(request: Request, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Serve admin page."""
-    with open("static/admin.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return assets.page_response(request, "admin.html")
+
+
+TEACHER_LIST = Listing(
+    columns={
+        "id": "u.id", "username": "u.username", "name_en": "u.name_en", "name_ur": "u.name_ur",
+        "class_id": "c.id", "class_name": "c.name",
+    },
+    source="users u LEFT JOIN classes c ON u.id = c.teacher_id",
+    # A teacher appears once per class they teach
+    order=["u.name_en", "u.id", "COALESCE(c.id, 0)"],
+)
 
 
 @app.get("/api/admin/teachers")
-async def get_teachers(user: dict = Depends(require_role([ROLE_ADMIN]))):
-    """Get all teachers."""
-    rows = execute_query("""
-        SELECT u.id, u.username, u.name_en, u.name_ur, c.id as class_id, c.name as class_name
-        FROM users u
-        LEFT JOIN classes c ON u.id = c.teacher_id
-        WHERE u.role = 'teacher'
-        ORDER BY u.name_en
-    """)
-    return rows_to_list(rows)
+async def get_teachers(cursor: Optional[str] = None, limit: Optional[int] = None, fields: Optional[str] = None,
+                       user: dict = Depends(require_role([ROLE_ADMIN]))):
+    """Get teachers, a page at a time."""
+    names = TEACHER_LIST.fields(fields)
+    sql, params, limit = TEACHER_LIST.query(names, cursor, limit, ["u.role = 'teacher'"])
+    return TEACHER_LIST.page(await query_async(sql, params), names, limit)
 
 
 @app.post("/api/admin/teachers")
 async def create_teacher(teacher: TeacherCreate, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Create a new teacher."""
-    from auth import create_user, hash_password
-
-    hashed = hash_password(teacher.password)
-    user_id = execute_insert(
+    hashed = await hash_password_async(teacher.password)
+    user_id = await insert_async(
         "INSERT INTO users (username, password, role, name_en, name_ur) VALUES (?, ?, ?, ?, ?)",
         (teacher.username, hashed, ROLE_TEACHER, teacher.name_en, teacher.name_ur)
     )
 
     # Assign to class if specified
     if teacher.class_id:
-        execute_update("UPDATE classes SET teacher_id = ? WHERE id = ?", (user_id, teacher.class_id))
+        await update_async("UPDATE classes SET teacher_id = ? WHERE id = ?", (user_id, teacher.class_id))
 
     return {"id": user_id, "message": "Teacher created"}
 
@@ -179,56 +255,105 @@ async def create_teacher(teacher: TeacherCreate, user: dict = Depends(require_ro
 @app.delete("/api/admin/teachers/{teacher_id}")
 async def delete_teacher(teacher_id: int, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Delete a teacher."""
-    execute_update("DELETE FROM users WHERE id = ? AND role = 'teacher'", (teacher_id,))
+    await run_db(delete_user, teacher_id, ROLE_TEACHER)
     return {"message": "Teacher deleted"}
 
 
+STUDENT_LIST = Listing(
+    columns={
+        "id": "id", "name_en": "name_en", "name_ur": "name_ur", "roll_no": "roll_no",
+        "class_id": "class_id", "parent_phone": "parent_phone",
+    },
+    source="students",
+    order=["class_id", "roll_no", "id"],
+)
+
+
 @app.get("/api/admin/students")
-async def get_students(class_id: Optional[int] = None, user: dict = Depends(require_role([ROLE_ADMIN, ROLE_PRINCIPAL]))):
-    """Get students, optionally filtered by class."""
-    if class_id:
-        rows = execute_query(
-            "SELECT * FROM students WHERE class_id = ? ORDER BY roll_no",
-            (class_id,)
-        )
-    else:
-        rows = execute_query("SELECT * FROM students ORDER BY class_id, roll_no")
-    return rows_to_list(rows)
+async def get_students(class_id: Optional[int] = None, cursor: Optional[str] = None, limit: Optional[int] = None,
+                       fields: Optional[str] = None,
+                       user: dict = Depends(require_role([ROLE_ADMIN, ROLE_PRINCIPAL]))):
+    """Get students in class and roll order, a page at a time, optionally filtered by class."""
+    names = STUDENT_LIST.fields(fields)
+    where, params = (["class_id = ?"], [class_id]) if class_id else ([], [])
+    sql, params, limit = STUDENT_LIST.query(names, cursor, limit, where, params)
+    return STUDENT_LIST.page(await query_async(sql, params), names, limit)
+
+
+def _insert_student(student: StudentCreate) -> int:
+    with transaction() as conn:
+        student_id = conn.execute(
+            "INSERT INTO students (name_en, name_ur, roll_no, class_id, parent_phone) VALUES (?, ?, ?, ?, ?)",
+            (student.name_en, student.name_ur, student.roll_no, student.class_id, student.parent_phone)
+        ).lastrowid
+        refresh_class_totals(conn, student.class_id)
+        bump_report_version(conn, student.class_id)
+    return student_id
 
 
 @app.post("/api/admin/students")
 async def create_student(student: StudentCreate, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Create a new student."""
-    student_id = execute_insert(
-        "INSERT INTO students (name_en, name_ur, roll_no, class_id, parent_phone) VALUES (?, ?, ?, ?, ?)",
-        (student.name_en, student.name_ur, student.roll_no, student.class_id, student.parent_phone)
-    )
+    student_id = await run_db(_insert_student, student)
     return {"id": student_id, "message": "Student created"}
 
 
+@app.post("/api/admin/students/import")
+async def import_students(file: UploadFile, dry_run: bool = False,
+                          user: dict = Depends(require_role([ROLE_ADMIN]))):
+    """Import a CSV or XLSX roster in one transaction; nothing is saved if any row fails."""
+    fmt = os.path.splitext(file.filename or "")[1].lstrip(".").lower()
+    try:
+        result = await run_db(import_roster, file.file, fmt, dry_run)
+    except RosterFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result["error_count"] and not dry_run:
+        return JSONResponse(status_code=422, content={
+            "detail": f"{result['error_count']} rows have errors; nothing was imported",
+            **result
+        })
+    return result
+
+
+def _delete_student(student_id: int) -> None:
+    with transaction() as conn:
+        rows = conn.execute("SELECT class_id FROM students WHERE id = ?", (student_id,)).fetchall()
+        conn.execute("DELETE FROM students WHERE id = ?", (student_id,))
+        if rows:
+            refresh_class_totals(conn, rows[0]['class_id'])
+            bump_report_version(conn, rows[0]['class_id'])
+
+
 @app.delete("/api/admin/students/{student_id}")
 async def delete_student(student_id: int, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Delete a student."""
-    execute_update("DELETE FROM students WHERE id = ?", (student_id,))
+    await run_db(_delete_student, student_id)
     return {"message": "Student deleted"}
 
 
+CLASS_LIST = Listing(
+    columns={
+        "id": "c.id", "name": "c.name", "name_ur": "c.name_ur", "teacher_id": "c.teacher_id",
+        "teacher_name": "u.name_en",
+    },
+    source="classes c LEFT JOIN users u ON c.teacher_id = u.id",
+    order=["c.name", "c.id"],
+)
+
+
 @app.get("/api/admin/classes")
-async def get_classes(user: dict = Depends(require_role([ROLE_ADMIN, ROLE_PRINCIPAL]))):
-    """Get all classes."""
-    rows = execute_query("""
-        SELECT c.*, u.name_en as teacher_name
-        FROM classes c
-        LEFT JOIN users u ON c.teacher_id = u.id
-        ORDER BY c.name
-    """)
-    return rows_to_list(rows)
+async def get_classes(cursor: Optional[str] = None, limit: Optional[int] = None, fields: Optional[str] = None,
+                      user: dict = Depends(require_role([ROLE_ADMIN, ROLE_PRINCIPAL]))):
+    """Get classes by name, a page at a time."""
+    names = CLASS_LIST.fields(fields)
+    sql, params, limit = CLASS_LIST.query(names, cursor, limit)
+    return CLASS_LIST.page(await query_async(sql, params), names, limit)
 
 
 @app.post("/api/admin/classes")
 async def create_class(class_data: ClassCreate, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Create a new class."""
-    class_id = execute_insert(
+    class_id = await insert_async(
         "INSERT INTO classes (name, name_ur) VALUES (?, ?)",
         (class_data.name, class_data.name_ur)
     )
@@ -239,26 +364,25 @@ async def create_class(class_data: ClassCreate, user: dict = Depends(require_rol
 async def assign_teacher(class_id: int, data: AssignTeacherRequest, user: dict = Depends(require_role([ROLE_ADMIN]))):
     """Assign a teacher to a class."""
     if data.teacher_id:
-        execute_update("UPDATE classes SET teacher_id = ? WHERE id = ?", (data.teacher_id, class_id))
+        await update_async("UPDATE classes SET teacher_id = ? WHERE id = ?", (data.teacher_id, class_id))
     else:
-        execute_update("UPDATE classes SET teacher_id = NULL WHERE id = ?", (class_id,))
+        await update_async("UPDATE classes SET teacher_id = NULL WHERE id = ?", (class_id,))
     return {"message": "Teacher assigned"}
 
 
 # ==================== TEACHER ROUTES ====================
 
 @app.get("/teacher", response_class=HTMLResponse)
-async def teacher_page(user: dict = Depends(require_role([ROLE_TEACHER]))):
+async def teacher_page(request: Request, user: dict = Depends(require_role([ROLE_TEACHER]))):
     """Serve teacher page."""
-    with open("static/teacher.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return assets.page_response(request, "teacher.html")
 
 
 @app.get("/api/teacher/my-class")
 async def get_my_class(user: dict = Depends(require_role([ROLE_TEACHER]))):
     """Get teacher's assigned class with students."""
     # Get class for this teacher
-    class_rows = execute_query(
+    class_rows = await query_async(
         "SELECT * FROM classes WHERE teacher_id = ?",
         (user['id'],)
     )
@@ -268,7 +392,7 @@ async def get_my_class(user: dict = Depends(require_role([ROLE_TEACHER]))):
     class_data = row_to_dict(class_rows[0])
 
     # Get students for this class
-    student_rows = execute_query(
+    student_rows = await query_async(
         "SELECT * FROM students WHERE class_id = ? ORDER BY roll_no",
         (class_data['id'],)
     )
@@ -276,7 +400,7 @@ async def get_my_class(user: dict = Depends(require_role([ROLE_TEACHER]))):
 
     # Get today's attendance
     today = date.today().isoformat()
-    attendance_rows = execute_query(
+    attendance_rows = await query_async(
         "SELECT student_id, status FROM attendance WHERE class_id = ? AND date = ?",
         (class_data['id'], today)
     )
@@ -292,13 +416,13 @@ async def get_my_class(user: dict = Depends(require_role([ROLE_TEACHER]))):
 @app.get("/api/teacher/attendance/{attendance_date}")
 async def get_attendance(attendance_date: str, user: dict = Depends(require_role([ROLE_TEACHER]))):
     """Get attendance for a specific date."""
-    class_rows = execute_query("SELECT id FROM classes WHERE teacher_id = ?", (user['id'],))
+    class_rows = await query_async("SELECT id FROM classes WHERE teacher_id = ?", (user['id'],))
     if not class_rows:
         return {"records": []}
 
     class_id = class_rows[0]['id']
 
-    rows = execute_query("""
+    rows = await query_async("""
         SELECT s.id, s.name_en, s.name_ur, s.roll_no, COALESCE(a.status, 'present') as status
         FROM students s
         LEFT JOIN attendance a ON s.id = a.student_id AND a.date = ?
@@ -309,55 +433,122 @@ async def get_attendance(attendance_date: str, user: dict = Depends(require_role
     return {"date": attendance_date, "students": rows_to_list(rows)}
 
 
+def _is_iso_date(value: str) -> bool:
+    """True for a real calendar date written as YYYY-MM-DD."""
+    try:
+        return date.fromisoformat(value).isoformat() == value
+    except ValueError:
+        return False
+
+
+def _save_attendance(class_id: int, day: str, statuses: dict[int, str],
+                     marked_by: int) -> tuple[set[int], int, int]:
+    """Upsert a day's attendance and its absence notifications in one transaction.
+
+    Students re-marked present or late lose any notification that hasn't
+    been sent yet. Returns the ids of students that already had a record,
+    the number of notifications created (or revived) and the number cancelled.
+    """
+    with transaction() as conn:
+        archived = archived_until(conn)
+        if archived and day <= archived:
+            raise HTTPException(status_code=409, detail=f"Attendance up to {archived} is archived")
+
+        class_students = {row['id'] for row in conn.execute(
+            "SELECT id FROM students WHERE class_id = ?", (class_id,)
+        )}
+        unknown = sorted(sid for sid in statuses if sid not in class_students)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Students not in class: {', '.join(map(str, unknown))}"
+            )
+
+        existing = {row['student_id'] for row in conn.execute("""
+            SELECT a.student_id FROM attendance a
+            JOIN students s ON s.id = a.student_id
+            WHERE s.class_id = ? AND a.date = ?
+        """, (class_id, day))}
+
+        conn.executemany("""
+            INSERT INTO attendance (student_id, class_id, date, status, marked_by)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(student_id, date) DO UPDATE
+            SET status = excluded.status, marked_by = excluded.marked_by
+        """, [(sid, class_id, day, status, marked_by) for sid, status in statuses.items()])
+
+        # One notification per absent student and day; a cancelled one comes back
+        queued = (NOTIFICATION_QUEUED, time.time()) if NOTIFY_AUTO_SEND else (NOTIFICATION_PENDING, None)
+        notified = conn.executemany("""
+            INSERT INTO notifications (student_id, class_id, date, status, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(student_id, date) DO UPDATE
+            SET status = excluded.status, next_attempt_at = excluded.next_attempt_at, attempts = 0, last_error = NULL
+            WHERE notifications.status = 'cancelled'
+        """, [
+            (sid, class_id, day, *queued)
+            for sid, status in statuses.items() if status == STATUS_ABSENT
+        ]).rowcount
+
+        # Anyone no longer absent keeps only notifications already sent (or in flight)
+        cancelled = conn.executemany("""
+            UPDATE notifications SET status = ?, next_attempt_at = NULL
+            WHERE student_id = ? AND date = ? AND status IN ('pending', 'queued', 'failed')
+        """, [
+            (NOTIFICATION_CANCELLED, sid, day)
+            for sid, status in statuses.items() if status != STATUS_ABSENT
+        ]).rowcount
+
+        refresh_class_day(conn, class_id, day)
+        refresh_student_months(conn, list(statuses), day[:7])
+        bump_report_version(conn, class_id, day[:7])
+    return existing, max(notified, 0), max(cancelled, 0)
+
+
 @app.post("/api/teacher/attendance")
 async def save_attendance(data: AttendanceSaveRequest, user: dict = Depends(require_role([ROLE_TEACHER]))):
-    """Save attendance for a date."""
-    class_rows = execute_query("SELECT id FROM classes WHERE teacher_id = ?", (user['id'],))
+    """Save attendance for a date in a single transaction."""
+    class_rows = await query_async("SELECT id FROM classes WHERE teacher_id = ?", (user['id'],))
     if not class_rows:
         raise HTTPException(status_code=400, detail="No class assigned")
 
     class_id = class_rows[0]['id']
 
-    for record in data.records:
-        # Check if attendance already exists
-        existing = execute_query(
-            "SELECT id FROM attendance WHERE student_id = ? AND date = ?",
-            (record.student_id, data.date)
-        )
-
-        if existing:
-            # Update existing
-            execute_update(
-                "UPDATE attendance SET status = ?, marked_by = ? WHERE student_id = ? AND date = ?",
-                (record.status, user['id'], record.student_id, data.date)
-            )
-        else:
-            # Insert new
-            execute_insert(
-                "INSERT INTO attendance (student_id, class_id, date, status, marked_by) VALUES (?, ?, ?, ?, ?)",
-                (record.student_id, class_id, data.date, record.status, user['id'])
-            )
+    if not _is_iso_date(data.date):
+        raise HTTPException(status_code=400, detail="Invalid date")
 
-        # Create notification for absent students
-        if record.status == STATUS_ABSENT:
-            # Check if notification already exists
-            existing_notif = execute_query(
-                "SELECT id FROM notifications WHERE student_id = ? AND date = ?",
-                (record.student_id, data.date)
-            )
-            if not existing_notif:
-                execute_insert(
-                    "INSERT INTO notifications (student_id, class_id, date, status) VALUES (?, ?, ?, ?)",
-                    (record.student_id, class_id, data.date, NOTIFICATION_PENDING)
-                )
+    # Last record wins if a student is listed twice
+    statuses = {record.student_id: record.status for record in data.records}
+    invalid_statuses = sorted({s for s in statuses.values() if s not in ATTENDANCE_STATUSES})
+    if invalid_statuses:
+        raise HTTPException(status_code=400, detail=f"Invalid status: {', '.join(invalid_statuses)}")
 
-    return {"message": "Attendance saved"}
+    existing, notified, cancelled = await run_db(_save_attendance, class_id, data.date, statuses, user['id'])
+    if notified and NOTIFY_AUTO_SEND:
+        wake_dispatcher()
+
+    updated = len(existing & statuses.keys())
+    return {
+        "message": "Attendance saved",
+        "inserted": len(statuses) - updated,
+        "updated": updated,
+        "notified": notified,
+        "cancelled": cancelled
+    }
 
 
 @app.get("/api/teacher/history")
-async def get_teacher_history(days: int = 30, user: dict = Depends(require_role([ROLE_TEACHER]))):
-    """Get attendance history for teacher's class."""
-    class_rows = execute_query("SELECT id FROM classes WHERE teacher_id = ?", (user['id'],))
+async def get_teacher_history(days: int = 30, packed: bool = False, v: int = 2,
+                              user: dict = Depends(require_role([ROLE_TEACHER]))):
+    """Get attendance history for teacher's class as a student x date matrix.
+
+    Each student's ``history`` has one character per entry in ``dates``:
+    P present, A absent, L late, - not marked. With ``packed=true`` the
+    matrix is instead ``cells``: base64 of 2-bit codes (0 -, 1 P, 2 A,
+    3 L), four to a byte starting at the low bits, student by student.
+    ``v=1`` returns the old one-row-per-student-and-date format.
+    """
+    class_rows = await query_async("SELECT id FROM classes WHERE teacher_id = ?", (user['id'],))
     if not class_rows:
         return {"students": []}
 
@@ -366,26 +557,34 @@ async def get_teacher_history(days: int = 30, user: dict = Depends(require_role(
     start_date = (date.today() - timedelta(days=days)).isoformat()
     end_date = date.today().isoformat()
 
-    # Get attendance for the date range
-    rows = execute_query("""
-        SELECT s.id, s.name_en, s.name_ur, s.roll_no,
-               a.date, a.status
-        FROM students s
-        LEFT JOIN attendance a ON s.id = a.student_id AND a.date BETWEEN ? AND ?
-        WHERE s.class_id = ?
-        ORDER BY s.roll_no, a.date
-    """, (start_date, end_date, class_id))
-
-    return {"date_range": f"{start_date} to {end_date}", "records": rows_to_list(rows)}
+    if v == 1:
+        rows = await query_async("""
+            SELECT s.id, s.name_en, s.name_ur, s.roll_no,
+                   a.date, a.status
+            FROM students s
+            LEFT JOIN attendance a ON s.id = a.student_id AND a.date BETWEEN ? AND ?
+            WHERE s.class_id = ?
+            ORDER BY s.roll_no, a.date
+        """, (start_date, end_date, class_id))
+        return {"date_range": f"{start_date} to {end_date}", "records": rows_to_list(rows)}
+
+    matrix = await run_db(build_history_matrix, class_id, start_date, end_date)
+    response = {"date_range": f"{start_date} to {end_date}", "dates": matrix["dates"],
+                "students": matrix["students"]}
+    if packed:
+        response["cells"] = base64.b64encode(pack_codes(b"".join(matrix["cells"]))).decode()
+    else:
+        for student, cells in zip(matrix["students"], matrix["cells"]):
+            student["history"] = code_symbols(cells)
+    return response
 
 
 # ==================== PRINCIPAL ROUTES ====================
 
 @app.get("/principal", response_class=HTMLResponse)
-async def principal_page(user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
+async def principal_page(request: Request, user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
     """Serve principal page."""
-    with open("static/principal.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return assets.page_response(request, "principal.html")
 
 
 @app.get("/api/principal/dashboard")
@@ -393,55 +592,41 @@ async def get_dashboard(user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
     """Get daily dashboard with attendance summary."""
     today = date.today().isoformat()
 
-    # Get total students
-    total_students = execute_query("SELECT COUNT(*) as count FROM students")[0]['count']
-
-    # Get today's attendance stats
-    stats_rows = execute_query("""
-        SELECT
-            COUNT(*) as total,
-            SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present,
-            SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END) as absent,
-            SUM(CASE WHEN status = 'late' THEN 1 ELSE 0 END) as late
-        FROM attendance
-        WHERE date = ?
-    """, (today,))
-
-    stats = stats_rows[0]
-    present = stats['present'] or 0
-    absent = stats['absent'] or 0
-    late = stats['late'] or 0
-
-    percentage = (present / total_students * 100) if total_students > 0 else 0
-
-    # Get class-wise summary
-    class_rows = execute_query("""
+    # One indexed read of today's summary rows; classes that haven't
+    # submitted yet fall back to counting their students
+    class_rows = await query_async("""
         SELECT c.id, c.name, u.name_en as teacher_name,
-               (SELECT COUNT(*) FROM students WHERE class_id = c.id) as total_students,
-               (SELECT COUNT(*) FROM attendance WHERE class_id = c.id AND date = ? AND status = 'present') as present,
-               (SELECT COUNT(*) FROM attendance WHERE class_id = c.id AND date = ? AND status = 'absent') as absent,
-               (SELECT COUNT(*) FROM attendance WHERE class_id = c.id AND date = ? AND status = 'late') as late
+               COALESCE(d.total_students, (SELECT COUNT(*) FROM students WHERE class_id = c.id)) as total_students,
+               COALESCE(d.present_count, 0) as present,
+               COALESCE(d.absent_count, 0) as absent,
+               COALESCE(d.late_count, 0) as late,
+               COALESCE(d.submitted, 0) as submitted
         FROM classes c
         LEFT JOIN users u ON c.teacher_id = u.id
+        LEFT JOIN daily_class_summary d ON d.class_id = c.id AND d.date = ?
         ORDER BY c.name
-    """, (today, today, today))
+    """, (today,))
 
     classes = []
     for row in class_rows:
         total = row['total_students']
-        present_c = row['present'] or 0
-        submitted = total > 0 and (present_c + row['absent'] + row['late']) > 0
         classes.append({
             "class_id": row['id'],
             "class_name": row['name'],
             "teacher_name": row['teacher_name'],
             "total_students": total,
-            "present_count": present_c,
-            "absent_count": row['absent'] or 0,
-            "late_count": row['late'] or 0,
-            "attendance_submitted": submitted
+            "present_count": row['present'],
+            "absent_count": row['absent'],
+            "late_count": row['late'],
+            "attendance_submitted": total > 0 and bool(row['submitted'])
         })
 
+    total_students = sum(c['total_students'] for c in classes)
+    present = sum(c['present_count'] for c in classes)
+    absent = sum(c['absent_count'] for c in classes)
+    late = sum(c['late_count'] for c in classes)
+    percentage = (present / total_students * 100) if total_students > 0 else 0
+
     return DashboardResponse(
         date=today,
         stats=DashboardStats(
@@ -455,247 +640,283 @@ async def get_dashboard(user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
     )
 
 
+def _cached_report_response(request: Request, report: CachedReport, filename: Optional[str] = None) -> Response:
+    """Send a cached report, or 304 if the client already has this version."""
+    headers = {"ETag": report.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), report.etag):
+        return Response(status_code=304, headers=headers)
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return Response(content=report.content, media_type=report.media_type, headers=headers)
+
+
+def _render_report_json(year: int, month: int, class_id: Optional[int]) -> bytes:
+    return render_json(build_monthly_matrix(year, month, class_id)).model_dump_json().encode("utf-8")
+
+
 @app.get("/api/principal/report")
 async def get_monthly_report(
+    request: Request,
     year: int,
     month: int,
     class_id: Optional[int] = None,
     user: dict = Depends(require_role([ROLE_PRINCIPAL]))
 ):
     """Get monthly attendance report data."""
-    import calendar
-
-    days_in_month = calendar.monthrange(year, month)[1]
-    start_date = f"{year}-{month:02d}-01"
-    end_date = f"{year}-{month:02d}-{days_in_month:02d}"
-
-    # Get students (filtered by class if specified)
-    if class_id:
-        student_rows = execute_query(
-            "SELECT id, name_en, name_ur, roll_no FROM students WHERE class_id = ? ORDER BY roll_no",
-            (class_id,)
-        )
-    else:
-        student_rows = execute_query(
-            "SELECT id, name_en, name_ur, roll_no FROM students ORDER BY class_id, roll_no"
-        )
-
-    # Get attendance for the month
-    attendance_rows = execute_query("""
-        SELECT student_id, date, status
-        FROM attendance
-        WHERE date BETWEEN ? AND ?
-    """, (start_date, end_date))
-
-    # Build attendance map
-    attendance_map: dict[int, dict[str, str]] = {}
-    for row in attendance_rows:
-        sid = row['student_id']
-        if sid not in attendance_map:
-            attendance_map[sid] = {}
-        day = int(row['date'].split('-')[2])
-        attendance_map[sid][str(day)] = row['status']
-
-    students = []
-    for student in student_rows:
-        sid = student['id']
-        student_attendance = attendance_map.get(sid, {})
-
-        # Count present/absent
-        present_count = sum(1 for s in student_attendance.values() if s == STATUS_PRESENT)
-        absent_count = sum(1 for s in student_attendance.values() if s == STATUS_ABSENT)
-
-        days_counted = present_count + absent_count
-        percentage = (present_count / days_counted * 100) if days_counted > 0 else 0
-
-        # Build days dict (1-31)
-        days = {}
-        for d in range(1, days_in_month + 1):
-            days[str(d)] = student_attendance.get(str(d), '-')
-
-        students.append(MonthlyReportStudent(
-            student_id=sid,
-            name_en=student['name_en'],
-            name_ur=student.get('name_ur'),
-            roll_no=student['roll_no'],
-            days=days,
-            total_present=present_count,
-            total_absent=absent_count,
-            percentage=round(percentage, 1)
-        ))
-
-    return MonthlyReportResponse(
-        year=year,
-        month=month,
-        class_id=class_id,
-        students=students
-    )
+    key = (year, month, class_id, "json")
+    stamp = await run_db(report_stamp, year, month, class_id)
+    report = report_cache.get(key, stamp)
+    if report is None:
+        content = await run_db(_render_report_json, year, month, class_id)
+        report = report_cache.put(key, stamp, content)
+    return _cached_report_response(request, report)
 
 
 @app.get("/api/principal/report/export")
 async def export_excel(
+    request: Request,
     year: int,
     month: int,
     class_id: Optional[int] = None,
     user: dict = Depends(require_role([ROLE_PRINCIPAL]))
 ):
     """Export monthly report as Excel."""
-    from openpyxl import Workbook
-
-    import calendar
-    days_in_month = calendar.monthrange(year, month)[1]
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Attendance Report"
-
-    # Header row
-    headers = ["Roll No", "Student Name"]
-    for d in range(1, days_in_month + 1):
-        headers.append(str(d))
-    headers.extend(["Total P", "Total A", "%"])
-    ws.append(headers)
-
-    # Get students
-    if class_id:
-        student_rows = execute_query(
-            "SELECT id, name_en, roll_no FROM students WHERE class_id = ? ORDER BY roll_no",
-            (class_id,)
-        )
-    else:
-        student_rows = execute_query(
-            "SELECT id, name_en, roll_no FROM students ORDER BY class_id, roll_no"
-        )
-
-    # Get attendance
-    start_date = f"{year}-{month:02d}-01"
-    end_date = f"{year}-{month:02d}-{days_in_month:02d}"
-    attendance_rows = execute_query("""
-        SELECT student_id, date, status
-        FROM attendance
-        WHERE date BETWEEN ? AND ?
-    """, (start_date, end_date))
-
-    attendance_map: dict[int, dict[str, str]] = {}
-    for row in attendance_rows:
-        sid = row['student_id']
-        if sid not in attendance_map:
-            attendance_map[sid] = {}
-        day = int(row['date'].split('-')[2])
-        attendance_map[sid][str(day)] = row['status']
-
-    # Data rows
-    for student in student_rows:
-        sid = student['id']
-        student_attendance = attendance_map.get(sid, {})
-
-        row_data = [student['roll_no'], student['name_en']]
-        for d in range(1, days_in_month + 1):
-            status = student_attendance.get(str(d), '-')
-            # Shorten status
-            if status == 'present':
-                row_data.append('P')
-            elif status == 'absent':
-                row_data.append('A')
-            elif status == 'late':
-                row_data.append('L')
-            else:
-                row_data.append('-')
-
-        present_count = sum(1 for s in student_attendance.values() if s == STATUS_PRESENT)
-        absent_count = sum(1 for s in student_attendance.values() if s == STATUS_ABSENT)
-        days_counted = present_count + absent_count
-        percentage = (present_count / days_counted * 100) if days_counted > 0 else 0
-
-        row_data.extend([present_count, absent_count, f"{percentage:.1f}%"])
-        ws.append(row_data)
-
-    # Save to response
-    import io
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    from fastapi.responses import StreamingResponse
     filename = f"attendance_{year}_{month:02d}.xlsx"
-    return StreamingResponse(
-        buffer.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    key = (year, month, class_id, "xlsx")
+    stamp = await run_db(report_stamp, year, month, class_id)
+    report = report_cache.get(key, stamp)
+    if report is None:
+        path = await run_db(write_monthly_report, year, month, class_id)
+        if os.path.getsize(path) > REPORT_CACHE_MAX_BYTES:
+            # Too big to cache; stream it from the spool file
+            return FileResponse(
+                path,
+                media_type=XLSX_MEDIA_TYPE,
+                filename=filename,
+                background=BackgroundTask(os.unlink, path)
+            )
+        try:
+            with open(path, "rb") as f:
+                report = report_cache.put(key, stamp, f.read())
+        finally:
+            os.unlink(path)
+    return _cached_report_response(request, report, filename)
+
+
+@app.get("/api/principal/report/export/range")
+async def export_excel_range(
+    start: str,
+    end: str,
+    class_id: Optional[int] = None,
+    sheet_per: str = "month",
+    user: dict = Depends(require_role([ROLE_PRINCIPAL]))
+):
+    """Export several months (e.g. an academic year) as one Excel workbook."""
+    try:
+        months = month_range(parse_month(start), parse_month(end))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not months or len(months) > MAX_EXPORT_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range must cover 1 to {MAX_EXPORT_MONTHS} months")
+    if sheet_per not in ("month", "class"):
+        raise HTTPException(status_code=400, detail="sheet_per must be 'month' or 'class'")
+
+    # Bounded by MAX_EXPORT_MONTHS rather than the per-query timeout
+    path = await run_db(write_range_report, months, class_id, sheet_per, timeout=None)
+    filename = f"attendance_{start}_to_{end}.xlsx"
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=filename,
+        background=BackgroundTask(os.unlink, path)
     )
 
 
+async def _attendance_export(request: Request, fmt: str, start: Optional[str], end: Optional[str],
+                             class_id: Optional[int]) -> StreamingResponse:
+    """Stream raw attendance as CSV or NDJSON, gzipped if the client accepts it.
+
+    The chunks are produced on the database executor and the download
+    holds a DB_MAX_PENDING slot until it ends, however slow the client.
+    """
+    for value in (start, end):
+        if value:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+    rows = iter_attendance_rows(start, end, class_id)
+    if fmt == "csv":
+        chunks, media_type = csv_chunks(rows), CSV_MEDIA_TYPE
+    else:
+        chunks, media_type = ndjson_chunks(rows), NDJSON_MEDIA_TYPE
+
+    headers = {
+        "Content-Disposition": f"attachment; filename=attendance.{fmt}",
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    stream = await stream_db(chunks)
+    return StreamingResponse(stream, media_type=media_type, headers=headers, background=BackgroundTask(stream.close))
+
+
+@app.get("/api/principal/export/attendance.csv")
+async def export_attendance_csv(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    class_id: Optional[int] = None,
+    user: dict = Depends(require_role([ROLE_PRINCIPAL]))
+):
+    """Stream raw attendance rows as CSV."""
+    return await _attendance_export(request, "csv", start, end, class_id)
+
+
+@app.get("/api/principal/export/attendance.ndjson")
+async def export_attendance_ndjson(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    class_id: Optional[int] = None,
+    user: dict = Depends(require_role([ROLE_PRINCIPAL]))
+):
+    """Stream raw attendance rows as newline-delimited JSON."""
+    return await _attendance_export(request, "ndjson", start, end, class_id)
+
+
+STUDENT_RECORDS = Listing(
+    columns={"date": "date", "status": "status"},
+    source="attendance_all",  # live and archived years
+    order=["date"],  # unique per student
+    descending=True,
+)
+
+
 @app.get("/api/principal/student/{student_id}")
-async def get_student_report(student_id: int, user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
-    """Get individual student attendance report."""
-    # Get student info
-    student_rows = execute_query("SELECT * FROM students WHERE id = ?", (student_id,))
+async def get_student_report(student_id: int, start: Optional[str] = Query(None, alias="from"),
+                             end: Optional[str] = Query(None, alias="to"), cursor: Optional[str] = None,
+                             limit: Optional[int] = None,
+                             user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
+    """Get a student's attendance summary and records, newest first, a page at a time.
+
+    ``from``/``to`` (YYYY-MM-DD, inclusive) limit both; the summary comes
+    from student_attendance_stats, so it costs the same for any range.
+    """
+    for value in (start, end):
+        if value is not None and not _is_iso_date(value):
+            raise HTTPException(status_code=400, detail="Invalid date")
+
+    student_rows = await query_async("SELECT * FROM students WHERE id = ?", (student_id,))
     if not student_rows:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    student = row_to_dict(student_rows[0])
-
-    # Get attendance records
-    attendance_rows = execute_query("""
-        SELECT date, status
-        FROM attendance
-        WHERE student_id = ?
-        ORDER BY date DESC
-    """, (student_id,))
-
-    present = sum(1 for r in attendance_rows if r['status'] == STATUS_PRESENT)
-    absent = sum(1 for r in attendance_rows if r['status'] == STATUS_ABSENT)
-    late = sum(1 for r in attendance_rows if r['status'] == STATUS_LATE)
-    total = len(attendance_rows)
-    percentage = (present / total * 100) if total > 0 else 0
+    where, params = ["student_id = ?"], [student_id]
+    if start:
+        where.append("date >= ?")
+        params.append(start)
+    if end:
+        where.append("date <= ?")
+        params.append(end)
+    fields = STUDENT_RECORDS.fields(None)
+    sql, params, limit = STUDENT_RECORDS.query(fields, cursor, limit, where, params)
+    page = STUDENT_RECORDS.page(await query_async(sql, params, readonly=True), fields, limit)
 
     return {
-        "student": student,
-        "records": rows_to_list(attendance_rows),
-        "summary": {
-            "total": total,
-            "present": present,
-            "absent": absent,
-            "late": late,
-            "percentage": round(percentage, 1)
-        }
+        "student": row_to_dict(student_rows[0]),
+        "records": page["items"],
+        "next_cursor": page["next_cursor"],
+        "summary": await run_db(student_summary, student_id, start, end)
     }
 
 
+@app.get("/api/principal/analytics")
+async def get_analytics(start: Optional[str] = Query(None, alias="from"), end: Optional[str] = Query(None, alias="to"),
+                        class_id: Optional[int] = None, limit: Optional[int] = None,
+                        user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
+    """Chronic absence analytics: absence rates, streaks, trends and class percentiles.
+
+    ``from``/``to`` (YYYY-MM-DD, inclusive) default to the current academic
+    year so far; ``limit`` caps the flagged students listed, worst first.
+    """
+    for value in (start, end):
+        if value is not None and not _is_iso_date(value):
+            raise HTTPException(status_code=400, detail="Invalid date")
+    end = end or date.today().isoformat()
+    start = start or year_bounds(academic_year(end))[0]
+    days = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+    if not 1 <= days <= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must cover 1 to {ANALYTICS_MAX_DAYS} days")
+    limit = PAGE_SIZE_DEFAULT if limit is None else limit
+    if not 1 <= limit <= PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PAGE_SIZE_MAX}")
+    return await run_db(chronic_absence_report, date.fromisoformat(start), date.fromisoformat(end), class_id, limit)
+
+
 # ==================== NOTIFICATION ROUTES ====================
 
-@app.get("/api/notifications")
-async def get_notifications(status: Optional[str] = None, user: dict = Depends(require_role([ROLE_PRINCIPAL, ROLE_TEACHER]))):
-    """Get notifications."""
-    if status:
-        rows = execute_query("""
-            SELECT n.*, s.name_en as student_name, c.name as class_name
-            FROM notifications n
-            JOIN students s ON n.student_id = s.id
-            JOIN classes c ON n.class_id = c.id
-            WHERE n.status = ?
-            ORDER BY n.created_at DESC
-        """, (status,))
-    else:
-        rows = execute_query("""
-            SELECT n.*, s.name_en as student_name, c.name as class_name
-            FROM notifications n
-            JOIN students s ON n.student_id = s.id
-            JOIN classes c ON n.class_id = c.id
-            ORDER BY n.created_at DESC
-        """)
+NOTIFICATION_SOURCE = "{notifications} n JOIN students s ON n.student_id = s.id JOIN classes c ON n.class_id = c.id"
+
+NOTIFICATION_LIST = Listing(
+    columns={
+        "id": "n.id", "student_id": "n.student_id", "class_id": "n.class_id", "date": "n.date",
+        "message": "n.message", "status": "n.status", "created_at": "n.created_at",
+        "attempts": "n.attempts", "last_error": "n.last_error", "sent_at": "n.sent_at",
+        "student_name": "s.name_en", "class_name": "c.name",
+    },
+    source=NOTIFICATION_SOURCE.format(notifications="notifications"),
+    order=["n.created_at", "n.id"],
+    descending=True,
+)
 
-    return rows_to_list(rows)
+
+@app.get("/api/notifications")
+async def get_notifications(status: Optional[str] = None, year: Optional[int] = None,
+                            cursor: Optional[str] = None, limit: Optional[int] = None,
+                            fields: Optional[str] = None,
+                            user: dict = Depends(require_role([ROLE_PRINCIPAL, ROLE_TEACHER]))):
+    """Get notifications, newest first, a page at a time.
+
+    ``year`` (e.g. 2024 for 2024-25) lists one academic year, including
+    years split off into their own files; otherwise only the main file.
+    """
+    if status and status not in NOTIFICATION_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    names = NOTIFICATION_LIST.fields(fields)
+    where, params = (["n.status = ?"], [status]) if status else ([], [])
+    source = None
+    if year is not None:
+        if not 1 <= year <= 9998:
+            raise HTTPException(status_code=400, detail="Invalid year")
+        start, end = year_bounds(year)
+        where.append("n.date BETWEEN ? AND ?")
+        params += [start, end]
+        source = NOTIFICATION_SOURCE.format(notifications=partition_source("notifications", start, end))
+    sql, params, limit = NOTIFICATION_LIST.query(names, cursor, limit, where, params, source)
+    return NOTIFICATION_LIST.page(await query_async(sql, params), names, limit)
+
+
+@app.post("/api/notifications/send-pending")
+async def send_pending_notifications(day: str = Query(alias="date"),
+                                     user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
+    """Queue every pending (or failed) notification for a date for sending."""
+    if not _is_iso_date(day):
+        raise HTTPException(status_code=400, detail="Invalid date")
+    queued = await run_db(queue_notifications, day=day)
+    if queued:
+        wake_dispatcher()
+    return {"message": f"{queued} notifications queued", "queued": queued}
 
 
 @app.post("/api/notifications/{notification_id}/send")
-async def mark_notification_sent(notification_id: int, user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
-    """Mark notification as sent."""
-    execute_update(
-        "UPDATE notifications SET status = ? WHERE id = ?",
-        (NOTIFICATION_SENT, notification_id)
-    )
-    return {"message": "Notification marked as sent"}
+async def send_notification(notification_id: int, user: dict = Depends(require_role([ROLE_PRINCIPAL]))):
+    """Queue one pending (or failed) notification for sending."""
+    if not await run_db(queue_notifications, notification_id):
+        raise HTTPException(status_code=404, detail="No pending notification with that id")
+    wake_dispatcher()
+    return {"message": "Notification queued"}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+# Metrics for School Attendance System
+# Lightweight in-process counters and histograms, rendered in the
+# Prometheus text format at /metrics. Requests are labelled by route
+# template and database calls by normalized SQL minus the SELECT list, so
+# label sets stay small.
+# Metrics are per process; with several workers each keeps its own.
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Optional
+
+# Seconds; tuned for requests and queries between 1 ms and 10 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, with sum and count."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in sorted(snapshot, key=lambda s: s[0]):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total:.6f}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+))
+HTTP_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+))
+DB_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Database call latency by normalized statement.", ("statement",)
+))
+DB_ROWS = registry.register(Counter(
+    "db_query_rows_total", "Rows returned (SELECT) or changed (INSERT/UPDATE/DELETE).", ("statement",)
+))
+DB_ERRORS = registry.register(Counter(
+    "db_query_errors_total", "Database calls that raised.", ("statement",)
+))
+NOTIFICATIONS_DISPATCHED = registry.register(Counter(
+    "notifications_dispatched_total", "Notification send attempts by gateway and outcome.", ("gateway", "result")
+))
+NOTIFICATION_SEND_DURATION = registry.register(Histogram(
+    "notification_send_duration_seconds", "Gateway send latency.", ("gateway",)
+))
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN \(\?(?:, ?\?)*\)", re.IGNORECASE)
+
+
+# The leading SELECT list; list endpoints build one per fields= combination
+_PROJECTION = re.compile(r"^SELECT (?:DISTINCT )?.+? FROM ", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query: str) -> str:
+    """Collapse a statement to a stable form: literals become ?, IN lists (...)."""
+    text = " ".join(query.split())
+    text = _LITERALS.sub("?", text)
+    return _IN_LISTS.sub("IN (...)", text)
+
+
+@lru_cache(maxsize=2048)
+def statement_label(query: str) -> str:
+    """The metrics label for a statement: normalize_sql without the leading SELECT list.
+
+    Clients choose the projection of list endpoints (fields=), so it
+    must not be part of the label or they would control its cardinality.
+    """
+    return _PROJECTION.sub("SELECT ... FROM ", normalize_sql(query), count=1)
+
+
+class QueryTimer:
+    """Times one database call: ``with QueryTimer(sql) as timer: ...; timer.rows = n``.
+
+    ``timer.elapsed`` holds the duration in seconds once the block exits.
+    """
+
+    __slots__ = ("query", "rows", "start", "elapsed")
+
+    def __init__(self, query: str):
+        self.query = query
+        self.rows = 0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "QueryTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = self.elapsed = time.perf_counter() - self.start
+        labels = (statement_label(self.query),)
+        DB_DURATION.observe(labels, elapsed)
+        if exc_type is not None:
+            DB_ERRORS.inc(labels)
+        elif self.rows:
+            DB_ROWS.inc(labels, self.rows)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts and latency per route template.
+
+    The route is read after the app has handled the request, from the
+    ``route`` FastAPI puts in the scope; unmatched paths (404s) share one
+    label so stray URLs can't grow the label set.
+    """
+
+    def __init__(self, app: Callable, skip_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status: Optional[int] = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_DURATION.observe((method, route), elapsed)
+            HTTP_REQUESTS.inc((method, route, str(status or 500)))
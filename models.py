@@ -117,6 +117,7 @@ class DashboardResponse(BaseModel):
 class MonthlyReportStudent(BaseModel):
     student_id: int
     name_en: str
+    name_ur: Optional[str] = None
     roll_no: str
     days: dict[str, str]  # day -> status
     total_present: int
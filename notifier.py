@@ -0,0 +1,343 @@
+# Notification dispatch for School Attendance System
+# A background worker, started with the app, claims queued notifications
+# in batches, sends them through a pluggable gateway with a concurrency
+# limit and a token-bucket rate limit, and records the outcome. Transient
+# failures are retried with exponential backoff until NOTIFY_MAX_ATTEMPTS,
+# then the notification is marked failed.
+#
+# Claims are leases: a batch is moved to 'sending' with next_attempt_at set
+# NOTIFY_LEASE seconds ahead, so rows left behind by a crashed worker are
+# picked up again. Every worker process runs its own dispatcher; claiming
+# in a write transaction keeps them from sending the same row twice.
+
+import abc
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Optional
+
+from constants import (
+    NOTIFICATION_PENDING, NOTIFICATION_QUEUED, NOTIFICATION_SENDING, NOTIFICATION_SENT, NOTIFICATION_FAILED,
+    NOTIFY_GATEWAY, NOTIFY_OUTBOX_FILE, NOTIFY_HTTP_URL, NOTIFY_HTTP_TOKEN,
+    NOTIFY_RATE, NOTIFY_BURST, NOTIFY_CONCURRENCY, NOTIFY_BATCH_SIZE, NOTIFY_MAX_ATTEMPTS,
+    NOTIFY_RETRY_BASE, NOTIFY_RETRY_MAX, NOTIFY_LEASE, NOTIFY_POLL_INTERVAL
+)
+from database import run_db, transaction
+from metrics import NOTIFICATIONS_DISPATCHED, NOTIFICATION_SEND_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """A send failed; ``retryable`` says whether trying again may help."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, bursting to ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ==================== GATEWAYS ====================
+
+class Gateway(abc.ABC):
+    """Sends one text message. Subclasses implement send(); rate limits are per gateway."""
+
+    name = "gateway"
+
+    def __init__(self, rate: float = NOTIFY_RATE, burst: int = NOTIFY_BURST):
+        self.limiter = TokenBucket(rate, burst) if rate > 0 else None
+
+    @abc.abstractmethod
+    async def send(self, phone: str, text: str) -> None:
+        """Send ``text`` to ``phone``; raise GatewayError if it didn't go out."""
+
+    async def close(self) -> None:
+        pass
+
+
+class FileGateway(Gateway):
+    """Appends each message as a JSON line to a local outbox file.
+
+    For development and testing: ``latency`` simulates a provider's round
+    trip and ``failure_rate`` makes that share of sends fail transiently.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str = NOTIFY_OUTBOX_FILE, latency: float = 0.0, failure_rate: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    async def send(self, phone: str, text: str) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise GatewayError("Simulated gateway failure")
+        line = json.dumps({"to": phone, "text": text, "at": time.time()}, ensure_ascii=False) + "\n"
+        await asyncio.to_thread(self._append, line)
+
+
+class HttpGateway(Gateway):
+    """POSTs {"to", "text"} as JSON to an SMS provider (or a local stub).
+
+    429 and 5xx responses and connection errors are retried; other 4xx
+    responses fail the notification straight away.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 10.0, **kwargs):
+        import httpx
+
+        super().__init__(**kwargs)
+        self.url = url
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._client = httpx.AsyncClient(headers=headers, timeout=timeout)
+        self._transport_errors = (httpx.TransportError,)
+
+    async def send(self, phone: str, text: str) -> None:
+        try:
+            response = await self._client.post(self.url, json={"to": phone, "text": text})
+        except self._transport_errors as e:
+            raise GatewayError(f"{type(e).__name__}: {e}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise GatewayError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise GatewayError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def build_gateway() -> Gateway:
+    """The gateway configured by NOTIFY_GATEWAY."""
+    if NOTIFY_GATEWAY == "http":
+        if not NOTIFY_HTTP_URL:
+            raise ValueError("NOTIFY_GATEWAY=http needs NOTIFY_HTTP_URL")
+        return HttpGateway(NOTIFY_HTTP_URL, NOTIFY_HTTP_TOKEN)
+    if NOTIFY_GATEWAY == "file":
+        return FileGateway(NOTIFY_OUTBOX_FILE)
+    raise ValueError(f"Unknown NOTIFY_GATEWAY: {NOTIFY_GATEWAY}")
+
+
+def render_message(row: dict[str, Any]) -> str:
+    """The text sent to a parent; a stored message takes precedence."""
+    if row['message']:
+        return row['message']
+    name_ur = row['name_ur'] or row['name_en']
+    return (f"Dear parent, {row['name_en']} was absent from school on {row['date']}.\n"
+            f"محترم والدین، {name_ur} {row['date']} کو اسکول سے غیر حاضر تھا۔")
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter after the given number of attempts."""
+    delay = min(NOTIFY_RETRY_MAX, NOTIFY_RETRY_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+# ==================== DATABASE ====================
+
+def queue_notifications(notification_id: Optional[int] = None, day: Optional[str] = None) -> int:
+    """Hand pending (or failed) notifications to the dispatcher; returns how many."""
+    conditions, params = ["status IN (?, ?)"], [NOTIFICATION_PENDING, NOTIFICATION_FAILED]
+    if notification_id is not None:
+        conditions.append("id = ?")
+        params.append(notification_id)
+    if day is not None:
+        conditions.append("date = ?")
+        params.append(day)
+    with transaction() as conn:
+        return conn.execute(f"""
+            UPDATE notifications
+            SET status = ?, attempts = 0, next_attempt_at = ?, last_error = NULL
+            WHERE {' AND '.join(conditions)}
+        """, (NOTIFICATION_QUEUED, time.time(), *params)).rowcount
+
+
+def claim_batch(limit: int, lease: float = NOTIFY_LEASE) -> list[dict[str, Any]]:
+    """Move up to ``limit`` due notifications to 'sending' and return them with the parent's details."""
+    now = time.time()
+    with transaction() as conn:
+        # The planner prefers the (status, created_at) index and then sorts the whole backlog
+        rows = conn.execute("""
+            SELECT n.id, n.date, n.message, n.attempts, s.name_en, s.name_ur, s.parent_phone
+            FROM notifications n INDEXED BY idx_notifications_dispatch
+            JOIN students s ON s.id = n.student_id
+            WHERE n.status IN ('queued', 'sending') AND n.next_attempt_at <= ?
+            ORDER BY n.next_attempt_at
+            LIMIT ?
+        """, (now, limit)).fetchall()
+        conn.executemany(
+            "UPDATE notifications SET status = ?, attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+            [(NOTIFICATION_SENDING, now + lease, row['id']) for row in rows]
+        )
+    return [{**dict(row), "attempts": row['attempts'] + 1} for row in rows]
+
+
+def record_results(results: list[tuple[dict[str, Any], Optional[GatewayError]]],
+                   max_attempts: int = NOTIFY_MAX_ATTEMPTS) -> dict[str, int]:
+    """Store each send's outcome; returns counts of sent, retry and failed."""
+    sent, retry, failed = [], [], []
+    now = time.time()
+    for row, error in results:
+        if error is None:
+            sent.append((NOTIFICATION_SENT, row['id']))
+        elif error.retryable and row['attempts'] < max_attempts:
+            retry.append((NOTIFICATION_QUEUED, now + retry_delay(row['attempts']), str(error), row['id']))
+        else:
+            failed.append((NOTIFICATION_FAILED, str(error), row['id']))
+
+    with transaction() as conn:
+        # Only rows still under this worker's lease; an expired lease may have been reclaimed
+        conn.executemany("""
+            UPDATE notifications SET status = ?, sent_at = CURRENT_TIMESTAMP, next_attempt_at = NULL, last_error = NULL
+            WHERE id = ? AND status = 'sending'
+        """, sent)
+        conn.executemany("""
+            UPDATE notifications SET status = ?, next_attempt_at = ?, last_error = ?
+            WHERE id = ? AND status = 'sending'
+        """, retry)
+        conn.executemany("""
+            UPDATE notifications SET status = ?, next_attempt_at = NULL, last_error = ?
+            WHERE id = ? AND status = 'sending'
+        """, failed)
+    return {"sent": len(sent), "retry": len(retry), "failed": len(failed)}
+
+
+# ==================== DISPATCHER ====================
+
+class Dispatcher:
+    """Background task draining the notification queue through one gateway."""
+
+    def __init__(self, gateway: Gateway, batch_size: int = NOTIFY_BATCH_SIZE,
+                 concurrency: int = NOTIFY_CONCURRENCY, max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+                 poll_interval: float = NOTIFY_POLL_INTERVAL):
+        self.gateway = gateway
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="notification-dispatcher")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Let the current batch finish (up to ``timeout``), then close the gateway."""
+        self._stopping = True
+        self._wake.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Notification dispatcher didn't stop in %.0f s; claimed rows will be retried "
+                               "when their lease expires", timeout)
+            self._task = None
+        await self.gateway.close()
+
+    def wake(self) -> None:
+        """Check the queue now instead of at the next poll."""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            # Cleared before the batch, so a wake() while it runs leads to another pass
+            self._wake.clear()
+            try:
+                claimed = await self.dispatch_once()
+            except Exception:
+                logger.exception("Notification dispatch failed")
+                claimed = 0
+            if not claimed and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _send(self, row: dict[str, Any], slots: asyncio.Semaphore) -> Optional[GatewayError]:
+        if not row['parent_phone']:
+            return GatewayError("No parent phone number", retryable=False)
+        async with slots:
+            if self.gateway.limiter is not None:
+                await self.gateway.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                await self.gateway.send(row['parent_phone'], render_message(row))
+            except GatewayError as e:
+                return e
+            except Exception as e:
+                logger.exception("Gateway %s raised", self.gateway.name)
+                return GatewayError(f"{type(e).__name__}: {e}")
+            finally:
+                NOTIFICATION_SEND_DURATION.observe((self.gateway.name,), time.perf_counter() - start)
+        return None
+
+    async def dispatch_once(self) -> int:
+        """Claim, send and record one batch; returns the number claimed."""
+        rows = await run_db(claim_batch, self.batch_size)
+        if not rows:
+            return 0
+        slots = asyncio.Semaphore(self.concurrency)
+        errors = await asyncio.gather(*(self._send(row, slots) for row in rows))
+        counts = await run_db(record_results, list(zip(rows, errors)), self.max_attempts)
+        for result, count in counts.items():
+            if count:
+                NOTIFICATIONS_DISPATCHED.inc((self.gateway.name, result), count)
+        if counts["failed"]:
+            logger.warning("%d notifications failed permanently", counts["failed"])
+        return len(rows)
+
+
+_dispatcher: Optional[Dispatcher] = None
+
+
+def start_dispatcher(gateway: Optional[Gateway] = None) -> None:
+    """Start the dispatch worker on the running event loop (from the app lifespan)."""
+    global _dispatcher
+    if _dispatcher is not None:
+        return
+    _dispatcher = Dispatcher(gateway or build_gateway())
+    _dispatcher.start()
+
+
+async def stop_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.stop()
+        _dispatcher = None
+
+
+def wake_dispatcher() -> None:
+    """Tell the worker new notifications are queued; a no-op if it isn't running."""
+    if _dispatcher is not None:
+        _dispatcher.wake()
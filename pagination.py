@@ -0,0 +1,105 @@
+# Keyset pagination for School Attendance System list endpoints
+# Pages are read with "WHERE (sort key) > (last key seen) ORDER BY sort key
+# LIMIT n", so every page costs the same index range scan however deep
+# the client has paged. The cursor is the last row's sort key, encoded
+# as opaque URL-safe base64 JSON.
+
+import base64
+import binascii
+import json
+from typing import Any, Optional, Sequence
+
+from constants import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+
+class PageError(ValueError):
+    """Bad cursor, limit or field list in a list request."""
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise PageError("Invalid cursor") from e
+    if (not isinstance(key, list) or len(key) != size
+            or not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in key)):
+        raise PageError("Invalid cursor")
+    return key
+
+
+class Listing:
+    """A paginated list: selectable fields, the FROM clause and the sort key.
+
+    ``columns`` maps each field a client may ask for to its SQL
+    expression. ``order`` is the sort key, a list of SQL expressions
+    that must end in a unique column; the whole key is sorted ascending,
+    or descending with ``descending=True``.
+    """
+
+    def __init__(self, columns: dict[str, str], source: str, order: list[str], descending: bool = False):
+        self.columns = columns
+        self.source = source
+        self.order = order
+        self.descending = descending
+
+    def fields(self, fields: Optional[str]) -> list[str]:
+        """Parse a ``fields=a,b`` projection; None or empty means every field."""
+        if not fields:
+            return list(self.columns)
+        names = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(names - set(self.columns))
+        if unknown:
+            raise PageError(f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(self.columns)}")
+        # Canonical order, so each projection is one statement (and one metrics label)
+        return [name for name in self.columns if name in names]
+
+    def query(self, fields: list[str], cursor: Optional[str], limit: Optional[int],
+              where: Sequence[str] = (), params: Sequence[Any] = (),
+              source: Optional[str] = None) -> tuple[str, tuple, int]:
+        """Build the page query; returns (sql, params, limit).
+
+        One row beyond ``limit`` is fetched to tell whether another page
+        follows. The sort key is selected as _k0, _k1, ... for the cursor.
+        ``source`` replaces the FROM clause, e.g. with the same tables in
+        an attached partition.
+        """
+        limit = PAGE_SIZE_DEFAULT if limit is None else limit
+        if not 1 <= limit <= PAGE_SIZE_MAX:
+            raise PageError(f"limit must be between 1 and {PAGE_SIZE_MAX}")
+
+        conditions = list(where)
+        params = list(params)
+        if cursor:
+            key = decode_cursor(cursor, len(self.order))
+            conditions.append(f"({', '.join(self.order)}) {'<' if self.descending else '>'} "
+                              f"({', '.join('?' * len(key))})")
+            params.extend(key)
+
+        direction = " DESC" if self.descending else ""
+        select = [f"{self.columns[name]} AS {name}" for name in fields]
+        select += [f"{expr} AS _k{i}" for i, expr in enumerate(self.order)]
+        sql = (
+            f"SELECT {', '.join(select)} FROM {source or self.source}"
+            + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+            + f" ORDER BY {', '.join(expr + direction for expr in self.order)} LIMIT ?"
+        )
+        params.append(limit + 1)
+        return sql, tuple(params), limit
+
+    def page(self, rows: list, fields: list[str], limit: int) -> dict[str, Any]:
+        """Shape rows from query() into {"items": [...], "next_cursor": ...}."""
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([last[f"_k{i}"] for i in range(len(self.order))])
+        return {
+            "items": [{name: row[name] for name in fields} for row in rows],
+            "next_cursor": next_cursor,
+        }
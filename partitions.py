@@ -0,0 +1,177 @@
+# Per-academic-year database files for School Attendance System
+# A closed academic year is compacted into attendance_archive (see
+# archive.py) and then moved, with that year's notifications, out of the
+# main database into a file of its own, e.g. school-2024-25.db next to
+# school.db. Those files never change again: every connection ATTACHes
+# them read-only, and database.partition_tables routes reads by date, so
+# the main file only grows with the current years and backups of the
+# year files are taken once. Running apps pick up a new file without a
+# restart (see database.partitions).
+#
+# Usage: python partitions.py list | split [--year 2024] | rollover [--vacuum]
+
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import date
+from typing import Any, Optional
+
+import database
+from archive import academic_year, compact_year, year_bounds, year_label
+from database import ATTENDANCE_ARCHIVE_TABLE, NOTIFICATIONS_TABLE, execute_query, get_db_connection, init_db
+
+# Moved to a year's file, each with the column holding its date
+PARTITIONED_TABLES = {"attendance_archive": "month", "notifications": "date"}
+
+
+def partition_path(year: int) -> str:
+    """The file a year is split into, next to the main database."""
+    stem, ext = os.path.splitext(os.path.abspath(database.DB_FILE))
+    return f"{stem}-{year_label(year)}{ext or '.db'}"
+
+
+def _create_file(path: str) -> None:
+    """Create an empty partition file with the partitioned tables and their indexes."""
+    conn = sqlite3.connect(path)
+    # Rollback journal: opening a WAL file read-only needs its -shm file
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute(ATTENDANCE_ARCHIVE_TABLE.format(name="attendance_archive"))
+    conn.execute(NOTIFICATIONS_TABLE.format(name="notifications"))
+    conn.execute("CREATE INDEX idx_archive_student ON attendance_archive(student_id, month)")
+    conn.execute("CREATE INDEX idx_notifications_created ON notifications(created_at)")
+    conn.execute("CREATE INDEX idx_notifications_status_created ON notifications(status, created_at)")
+    conn.commit()
+    conn.close()
+
+
+def split_year(year: int, today: Optional[date] = None) -> dict[str, Any]:
+    """Move one closed academic year into its own file; returns what was moved.
+
+    Live attendance of the year is archived first. The file is written
+    and closed before the main database changes, and the rows are only
+    deleted from the main file if they still match the copy, so an
+    interrupted split leaves nothing missing and can simply be rerun.
+    """
+    start, end = year_bounds(year)
+    today = today or date.today()
+    if end >= today.isoformat():
+        raise ValueError(f"Academic year {year_label(year)} has not ended yet")
+    if execute_query("SELECT 1 FROM partitions WHERE year = ?", (year,)):
+        raise ValueError(f"Academic year {year_label(year)} is already split")
+    conn = get_db_connection()
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    conn.close()
+    if len(database.partitions()) >= limit:
+        raise ValueError(f"SQLite attaches at most {limit} files; merge or drop old years first")
+    in_flight = execute_query("""
+        SELECT COUNT(*) FROM notifications WHERE date BETWEEN ? AND ? AND status IN ('queued', 'sending')
+    """, (start, end))[0][0]
+    if in_flight:
+        raise ValueError(f"{in_flight} notifications of {year_label(year)} are still being sent; try again later")
+
+    if execute_query("SELECT 1 FROM attendance WHERE date BETWEEN ? AND ? LIMIT 1", (start, end)):
+        compact_year(year, today=today)
+
+    bounds = {"month": (start[:7], end[:7]), "date": (start, end)}
+    path = partition_path(year)
+    if os.path.exists(path):
+        os.unlink(path)  # left by an interrupted split; it was never registered
+    _create_file(path)
+
+    conn = get_db_connection()
+    try:
+        conn.execute("ATTACH DATABASE ? AS part", (path,))
+        for table, column in PARTITIONED_TABLES.items():
+            conn.execute(f"INSERT INTO part.{table} SELECT * FROM main.{table} WHERE {column} BETWEEN ? AND ?",
+                         bounds[column])
+        conn.commit()
+
+        moved = {}
+        conn.execute("BEGIN IMMEDIATE")
+        for table, column in PARTITIONED_TABLES.items():
+            changed = conn.execute(f"""
+                SELECT (SELECT COUNT(*) FROM (
+                            SELECT * FROM main.{table} WHERE {column} BETWEEN ?1 AND ?2
+                            EXCEPT SELECT * FROM part.{table}))
+                     + (SELECT COUNT(*) FROM (
+                            SELECT * FROM part.{table}
+                            EXCEPT SELECT * FROM main.{table} WHERE {column} BETWEEN ?1 AND ?2))
+            """, bounds[column]).fetchone()[0]
+            if changed:
+                raise ValueError(f"{table} changed during the split; run it again")
+            moved[table] = conn.execute(f"DELETE FROM main.{table} WHERE {column} BETWEEN ? AND ?",
+                                        bounds[column]).rowcount
+        conn.execute("INSERT INTO partitions (year, path, start_date, end_date) VALUES (?, ?, ?, ?)",
+                     (year, os.path.basename(path), start, end))
+        conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+    # Pooled connections attach the file as they're next handed out: here at
+    # once, in the app's workers after their next partitions check
+    database.expire_partitions()
+    return {"year": year_label(year), "path": path, **moved}
+
+
+def splittable_years(today: Optional[date] = None) -> list[int]:
+    """Closed academic years still in the main file (live or archived), oldest first."""
+    today = today or date.today()
+    oldest = execute_query("""
+        SELECT MIN(day) FROM (
+            SELECT MIN(date) AS day FROM attendance
+            UNION ALL SELECT MIN(month) || '-01' FROM attendance_archive
+            UNION ALL SELECT MIN(date) FROM notifications
+        )
+    """)[0][0]
+    if oldest is None:
+        return []
+    split = {row[0] for row in execute_query("SELECT year FROM partitions")}
+    return [year for year in range(academic_year(oldest), academic_year(today.isoformat()))
+            if year not in split]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Split academic years into their own database files")
+    parser.add_argument("command", choices=["list", "split", "rollover"],
+                        help="split: every closed year (or --year); rollover: only the year that just ended")
+    parser.add_argument("--year", type=int, help="academic year to split, by its first calendar year")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the main file afterwards to shrink it")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "list":
+        for row in execute_query("SELECT * FROM partitions ORDER BY year"):
+            path = os.path.join(os.path.dirname(os.path.abspath(database.DB_FILE)), row['path'])
+            size = f"{os.path.getsize(path) / 1024:,.0f} KB" if os.path.exists(path) else "MISSING"
+            print(f"{year_label(row['year'])}: {row['path']} ({size}), split {row['created_at']}")
+        print(f"Closed years in {database.DB_FILE}: {', '.join(map(year_label, splittable_years())) or 'none'}")
+        return
+
+    if args.year is not None:
+        years = [args.year]
+    elif args.command == "rollover":
+        years = [academic_year(date.today().isoformat()) - 1]
+    else:
+        years = splittable_years()
+    for year in years:
+        try:
+            result = split_year(year)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"{result['year']}: {result['attendance_archive']} archive rows and "
+              f"{result['notifications']} notifications -> {result['path']}")
+    if not years:
+        print("No closed academic years to split")
+    if args.vacuum and years:
+        conn = get_db_connection()
+        conn.execute("VACUUM")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
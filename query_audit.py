@@ -0,0 +1,168 @@
+# Query audit for School Attendance System
+# Finds the SQL statements in the application source (string literals in
+# every module that queries the database, by default) plus the page
+# queries of main.py's list endpoints, runs EXPLAIN QUERY PLAN for each
+# of them against a large database and reports the ones that scan big
+# tables, i.e. are missing an index.
+#
+# Usage: python query_audit.py [--db FILE] [--min-rows 10000] [--no-listings] [files ...]
+#
+# Without --db a dataset is generated with generate_data into a temp dir.
+
+import argparse
+import ast
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from typing import Iterator
+
+import database
+from database import explain_query_plan, plan_warnings
+from metrics import normalize_sql
+
+# Application modules that run SQL
+APP_MODULES = [
+    "main.py", "auth.py", "reports.py", "rollups.py", "analytics.py", "exports.py", "archive.py",
+    "partitions.py", "notifier.py", "report_cache.py", "roster_import.py",
+]
+
+SQL_START = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\s")
+TABLE_REFS = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+NOT_ALIASES = {"where", "join", "left", "inner", "cross", "on", "order", "group", "set", "values",
+               "select", "limit", "using", "natural", "outer", "default"}
+
+
+def find_statements(path: str) -> Iterator[tuple[int, str]]:
+    """Yield (line, sql) for every SQL string literal in a Python file.
+
+    f-strings are reported with their substitutions shown as {...} and
+    can't be explained.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    fstring_parts = {id(v) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for v in node.values}
+    for node in ast.walk(tree):
+        if id(node) in fstring_parts:
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_START.match(node.value):
+            yield node.lineno, node.value
+        elif isinstance(node, ast.JoinedStr):
+            text = "".join(v.value if isinstance(v, ast.Constant) else "{...}" for v in node.values)
+            if SQL_START.match(text):
+                yield node.lineno, text
+
+
+# Filters a list endpoint always applies, by Listing name
+LISTING_FILTERS = {"STUDENT_RECORDS": ["student_id = ?"]}
+
+
+def listing_statements() -> Iterator[tuple[str, str]]:
+    """Yield (name, sql) for the first and a later page of each list endpoint in main.py.
+
+    Their SQL is assembled by pagination.Listing, so the source has only
+    fragments of it; every field is selected, with only the filters in
+    LISTING_FILTERS.
+    """
+    import main
+    from pagination import Listing, encode_cursor
+
+    for name, listing in vars(main).items():
+        if isinstance(listing, Listing):
+            fields = listing.fields(None)
+            where = LISTING_FILTERS.get(name, [])
+            for cursor in (None, encode_cursor([0] * len(listing.order))):
+                yield name, listing.query(fields, cursor, None, where, [None] * len(where))[0]
+
+
+def table_aliases(sql: str) -> dict[str, str]:
+    """Map each alias (and table name) used in a statement to its table."""
+    aliases = {}
+    for table, alias in TABLE_REFS.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def table_sizes(conn: sqlite3.Connection) -> dict[str, int]:
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def audit(conn: sqlite3.Connection, files: list[str], min_rows: int, listings: bool = True) -> int:
+    """Print each statement's plan and problems; returns the number missing an index."""
+    sizes = table_sizes(conn)
+    missing = dynamic = total = 0
+    seen: set[str] = set()
+
+    statements = [(f"{os.path.basename(path)}:{line}", sql) for path in files for line, sql in find_statements(path)]
+    if listings:
+        statements += [(f"main.{name}", sql) for name, sql in listing_statements()]
+    for where, sql in statements:
+        statement = normalize_sql(sql)
+        if statement in seen:
+            continue
+        seen.add(statement)
+        total += 1
+        print(f"{where}  {statement[:110]}")
+        if "{...}" in sql:
+            dynamic += 1
+            print("    (dynamic SQL, not explained)")
+            continue
+        try:
+            plan = explain_query_plan(conn, sql, (None,) * sql.count("?"))
+        except sqlite3.Error as e:
+            print(f"    EXPLAIN failed: {e}")
+            continue
+        print(f"    {' | '.join(plan) or '(no table access)'}")
+
+        aliases = table_aliases(sql)
+        for warning in plan_warnings(plan):
+            name = warning.split(" of ")[-1].split(" ")[0] if " of " in warning else None
+            rows = sizes.get(aliases.get(name, name), 0) if name else 0
+            if warning.startswith("full table scan") and rows >= min_rows:
+                missing += 1
+                print(f"    MISSING INDEX: {warning} ({rows:,} rows)")
+            else:
+                print(f"    note: {warning}" + (f" ({rows:,} rows)" if name else ""))
+
+    print(f"\n{total} statements, {missing} missing an index, {dynamic} dynamic (skipped)")
+    return missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN the application's SQL against a large database")
+    parser.add_argument("files", nargs="*", default=APP_MODULES)
+    parser.add_argument("--no-listings", action="store_true", help="skip the list endpoints' page queries")
+    parser.add_argument("--db", help="database to explain against (default: generate one)")
+    parser.add_argument("--min-rows", type=int, default=10000,
+                        help="full scans of tables at least this big count as missing an index")
+    parser.add_argument("--classes", type=int, default=40, help="classes in the generated database")
+    parser.add_argument("--students", type=int, default=40, help="students per class in the generated database")
+    parser.add_argument("--years", type=float, default=1.0, help="years of attendance in the generated database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = args.db
+        if db is None:
+            import generate_data
+            db = os.path.join(tmp, "audit.db")
+            generate_data.generate(generate_data.build_parser().parse_args([
+                "--db", db, "--classes", str(args.classes), "--students", str(args.students),
+                "--years", str(args.years), "--bcrypt-rounds", "4",
+            ]))
+        else:
+            database.DB_FILE = db
+            database.init_db()  # bring older files up to the current schema
+        conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+        database.prepare_connection(conn)
+        missing = audit(conn, args.files, args.min_rows, not args.no_listings)
+        conn.close()
+        database.close_pools()
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# Report cache for School Attendance System
+# Caches rendered monthly reports keyed by (year, month, class_id, format).
+# Entries are validated against per-month version counters in the
+# report_versions table, which writers bump in the same transaction as
+# their changes, so every worker process sees invalidations immediately.
+
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Optional
+
+from constants import REPORT_CACHE_SIZE, REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES
+from database import execute_query
+from exports import XLSX_MEDIA_TYPE
+
+ALL_MONTHS = "*"  # report_versions.month for changes that affect every month of a class
+
+REPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "xlsx": XLSX_MEDIA_TYPE,
+}
+
+
+def bump_report_version(conn: sqlite3.Connection, class_id: int, month: str = ALL_MONTHS) -> None:
+    """Invalidate cached reports for a class and month ('YYYY-MM', or every month).
+
+    Call inside the transaction that makes the change.
+    """
+    conn.execute("""
+        INSERT INTO report_versions (month, class_id, version) VALUES (?, ?, 1)
+        ON CONFLICT(month, class_id) DO UPDATE SET version = version + 1
+    """, (month, class_id))
+
+
+def report_stamp(year: int, month: int, class_id: Optional[int] = None) -> int:
+    """Current version stamp for a month's report; changes whenever its data does."""
+    rows = execute_query("""
+        SELECT COALESCE(SUM(version), 0) FROM report_versions
+        WHERE month IN (?, ?) AND (? IS NULL OR class_id = ?)
+    """, (f"{year}-{month:02d}", ALL_MONTHS, class_id, class_id), readonly=True)
+    return rows[0][0]
+
+
+class CachedReport:
+    """A rendered report with its content hash."""
+
+    def __init__(self, content: bytes, fmt: str):
+        self.content = content
+        self.media_type = REPORT_MEDIA_TYPES[fmt]
+        self.etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+class ReportCache:
+    """LRU cache of rendered reports, optionally spilling evictions to disk."""
+
+    def __init__(self, max_entries: int = REPORT_CACHE_SIZE, spill_dir: Optional[str] = REPORT_CACHE_DIR):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self._entries: OrderedDict[tuple, tuple[int, CachedReport]] = OrderedDict()
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key: tuple, stamp: object = "*") -> str:
+        name = hashlib.sha256(repr(key).encode()).hexdigest()[:24]
+        return os.path.join(self.spill_dir, f"{name}-{stamp}.bin")
+
+    def get(self, key: tuple, stamp: int) -> Optional[CachedReport]:
+        """Get a report rendered at this stamp, if cached.
+
+        Keys are (year, month, class_id, format).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == stamp:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+
+        if self.spill_dir:
+            path = self._spill_path(key, stamp)
+            try:
+                with open(path, "rb") as f:
+                    report = CachedReport(f.read(), key[-1])
+            except OSError:
+                return None
+            self._store(key, stamp, report)
+            return report
+        return None
+
+    def put(self, key: tuple, stamp: int, content: bytes) -> CachedReport:
+        """Cache a rendered report and return it."""
+        report = CachedReport(content, key[-1])
+        if len(content) <= REPORT_CACHE_MAX_BYTES:
+            self._store(key, stamp, report)
+        return report
+
+    def _store(self, key: tuple, stamp: int, report: CachedReport) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = (stamp, report)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+        if self.spill_dir:
+            for old_key, (old_stamp, old_report) in evicted:
+                path = self._spill_path(old_key, old_stamp)
+                if not os.path.exists(path):
+                    for stale in glob.glob(self._spill_path(old_key)):
+                        with suppress(FileNotFoundError):
+                            os.unlink(stale)
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(old_report.content)
+                    os.replace(tmp, path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """Check whether an Accept-Encoding header allows a content coding.
+
+    The coding is acceptable with a q-value above zero, or through ``*``
+    when it isn't listed itself; ``gzip;q=0`` refuses gzip.
+    """
+    wildcard = None
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == encoding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return bool(wildcard)
+
+
+report_cache = ReportCache()
@@ -0,0 +1,240 @@
+# Monthly report engine for School Attendance System
+# Builds the student x day attendance matrix once and renders it for the
+# JSON report and the Excel export
+
+import calendar
+from itertools import chain, groupby
+from typing import Any, Iterator, Optional
+
+from constants import STATUS_PRESENT, STATUS_ABSENT, STATUS_LATE
+from database import execute_query, iter_query, partition_source
+from models import MonthlyReportResponse, MonthlyReportStudent
+
+# Compact status codes used in matrix cells; 0 means no record
+STATUS_CODES = {STATUS_PRESENT: 1, STATUS_ABSENT: 2, STATUS_LATE: 3}
+CODE_STATUSES = (None, STATUS_PRESENT, STATUS_ABSENT, STATUS_LATE)
+CODE_SYMBOLS = "-PAL"
+
+
+def month_bounds(year: int, month: int) -> tuple[int, str, str]:
+    """Return (days_in_month, first_date, last_date) for a month."""
+    days_in_month = calendar.monthrange(year, month)[1]
+    return days_in_month, f"{year}-{month:02d}-01", f"{year}-{month:02d}-{days_in_month:02d}"
+
+
+class MonthlyMatrix:
+    """Student x day attendance for one month.
+
+    ``cells[i]`` is a bytearray with one status code per day for
+    ``students[i]``; ``totals[i]`` is that student's (present, absent).
+    """
+
+    def __init__(self, year: int, month: int, class_id: Optional[int], days: int,
+                 students: list[dict[str, Any]], cells: list[bytearray],
+                 totals: list[tuple[int, int]]):
+        self.year = year
+        self.month = month
+        self.class_id = class_id
+        self.days = days
+        self.students = students
+        self.cells = cells
+        self.totals = totals
+
+
+def build_monthly_matrix(year: int, month: int, class_id: Optional[int] = None) -> MonthlyMatrix:
+    """Load one month of attendance, filtered by class in SQL."""
+    days, start_date, end_date = month_bounds(year, month)
+
+    if class_id:
+        student_rows = execute_query(
+            "SELECT id, name_en, name_ur, roll_no FROM students WHERE class_id = ? ORDER BY roll_no",
+            (class_id,), readonly=True
+        )
+        class_filter, params = "class_id = ? AND ", (class_id, start_date, end_date)
+    else:
+        student_rows = execute_query(
+            "SELECT id, name_en, name_ur, roll_no FROM students ORDER BY class_id, roll_no", readonly=True
+        )
+        # Walk the covering index class by class rather than the date index
+        class_filter, params = "class_id IN (SELECT id FROM classes) AND ", (start_date, end_date)
+
+    students = [dict(row) for row in student_rows]
+    index = {student['id']: i for i, student in enumerate(students)}
+    cells = [bytearray(days) for _ in students]
+
+    # Closed academic years: one packed row per student (see archive.py)
+    archive_filter = "class_id = ?" if class_id else "class_id IN (SELECT id FROM classes)"
+    for student_id, codes in execute_query(f"""
+        SELECT student_id, codes FROM {partition_source('attendance_archive', start_date, end_date)}
+        WHERE {archive_filter} AND month = ?
+    """, ((class_id,) if class_id else ()) + (start_date[:7],), readonly=True):
+        i = index.get(student_id)
+        if i is not None:
+            _overlay(cells[i], unpack_codes(codes, days))
+
+    # Index-only scans of idx_attendance_class_date
+    for student_id, day, code in execute_query(f"""
+        SELECT student_id, CAST(substr(date, 9, 2) AS INTEGER),
+               CASE status WHEN 'present' THEN 1 WHEN 'absent' THEN 2 ELSE 3 END
+        FROM attendance
+        WHERE {class_filter}date BETWEEN ? AND ?
+    """, params, readonly=True):
+        i = index.get(student_id)
+        if i is not None:
+            cells[i][day - 1] = code
+
+    totals = [(row.count(1), row.count(2)) for row in cells]
+
+    return MonthlyMatrix(year, month, class_id, days, students, cells, totals)
+
+
+def _percentage(present: int, absent: int) -> float:
+    days_counted = present + absent
+    return (present / days_counted * 100) if days_counted > 0 else 0
+
+
+def render_json(matrix: MonthlyMatrix) -> MonthlyReportResponse:
+    """Render the matrix as the /api/principal/report response."""
+    day_keys = [str(d) for d in range(1, matrix.days + 1)]
+    students = []
+    for student, cells, (present, absent) in zip(matrix.students, matrix.cells, matrix.totals):
+        students.append(MonthlyReportStudent(
+            student_id=student['id'],
+            name_en=student['name_en'],
+            name_ur=student['name_ur'],
+            roll_no=student['roll_no'],
+            days={key: CODE_STATUSES[code] or '-' for key, code in zip(day_keys, cells)},
+            total_present=present,
+            total_absent=absent,
+            percentage=round(_percentage(present, absent), 1)
+        ))
+    return MonthlyReportResponse(
+        year=matrix.year,
+        month=matrix.month,
+        class_id=matrix.class_id,
+        students=students
+    )
+
+
+def excel_header(days: int) -> list[str]:
+    """Header row of the Excel report for a month with ``days`` days."""
+    return ["Roll No", "Student Name"] + [str(d) for d in range(1, days + 1)] + ["Total P", "Total A", "%"]
+
+
+def excel_row(student: dict[str, Any], cells: bytearray, present: int, absent: int) -> list:
+    """One student's Excel row: roll no, name, a symbol per day and totals."""
+    return ([student['roll_no'], student['name_en']]
+            + [CODE_SYMBOLS[code] for code in cells]
+            + [present, absent, f"{_percentage(present, absent):.1f}%"])
+
+
+def render_excel_rows(matrix: MonthlyMatrix) -> Iterator[list]:
+    """Yield the Excel data rows, one per student."""
+    for student, cells, (present, absent) in zip(matrix.students, matrix.cells, matrix.totals):
+        yield excel_row(student, cells, present, absent)
+
+
+def stream_student_months(year: int, month: int,
+                          class_id: Optional[int] = None) -> Iterator[tuple[dict[str, Any], bytearray, int, int]]:
+    """Yield (student, cells, present, absent) straight from the cursor.
+
+    Unlike build_monthly_matrix only one student is held in memory at a
+    time, so exports of any size run in constant memory.
+    """
+    days, start_date, end_date = month_bounds(year, month)
+    if class_id:
+        class_filter, order, params = "s.class_id = ?", "s.roll_no, s.id", (start_date, end_date, class_id)
+    else:
+        class_filter, order, params = "1", "s.class_id, s.roll_no, s.id", (start_date, end_date)
+
+    # A month is either archived or live, so at most one side of the join has rows
+    rows = iter_query(f"""
+        SELECT s.id, s.class_id, s.name_en, s.roll_no,
+               CAST(substr(a.date, 9, 2) AS INTEGER) AS day,
+               CASE a.status WHEN 'present' THEN 1 WHEN 'absent' THEN 2 WHEN 'late' THEN 3 END AS code,
+               ar.codes
+        FROM students s
+        LEFT JOIN attendance a ON a.student_id = s.id AND a.date BETWEEN ? AND ?
+        LEFT JOIN {partition_source('attendance_archive', start_date, end_date)} ar
+            ON ar.student_id = s.id AND ar.month = ?
+        WHERE {class_filter}
+        ORDER BY {order}
+    """, params[:2] + (start_date[:7],) + params[2:])
+    for _, student_rows in groupby(rows, key=lambda row: row['id']):
+        first = next(student_rows)
+        cells = bytearray(days)
+        for row in chain((first,), student_rows):
+            if row['code']:
+                cells[row['day'] - 1] = row['code']
+            elif row['codes']:
+                _overlay(cells, unpack_codes(row['codes'], days))
+        student = {'id': first['id'], 'class_id': first['class_id'],
+                   'name_en': first['name_en'], 'roll_no': first['roll_no']}
+        yield student, cells, cells.count(1), cells.count(2)
+
+
+# Codes 0-3 as their CODE_SYMBOLS characters, for bytes.translate
+_SYMBOL_TABLE = bytes(range(256)).translate(bytes.maketrans(b"\x00\x01\x02\x03", CODE_SYMBOLS.encode()))
+
+
+def _overlay(cells: bytearray, codes: bytes) -> None:
+    """Copy the recorded (non-zero) codes over cells."""
+    for day, code in enumerate(codes):
+        if code:
+            cells[day] = code
+
+
+def code_symbols(codes: bytes) -> str:
+    """Status codes as a CODE_SYMBOLS string, e.g. "PPAL-"."""
+    return bytes(codes).translate(_SYMBOL_TABLE).decode("ascii")
+
+
+def pack_codes(codes: bytes) -> bytes:
+    """Pack status codes (0-3) four to a byte, first code in the low bits."""
+    padded = bytes(codes) + bytes(-len(codes) % 4)
+    return bytes(a | b << 2 | c << 4 | d << 6
+                 for a, b, c, d in zip(padded[0::4], padded[1::4], padded[2::4], padded[3::4]))
+
+
+def unpack_codes(packed: bytes, count: int) -> bytearray:
+    """Inverse of pack_codes for the first ``count`` codes."""
+    codes = bytearray(len(packed) * 4)
+    for shift in range(4):
+        codes[shift::4] = bytes((byte >> (2 * shift)) & 3 for byte in packed)
+    return codes[:count]
+
+
+def build_history_matrix(class_id: int, start_date: str, end_date: str) -> dict[str, Any]:
+    """One class's student x date attendance between two dates.
+
+    The date axis holds the days with any attendance in the class; each
+    student's ``history`` has one CODE_SYMBOLS character per date.
+    """
+    students = [dict(row) for row in execute_query(
+        "SELECT id, name_en, name_ur, roll_no FROM students WHERE class_id = ? ORDER BY roll_no",
+        (class_id,), readonly=True
+    )]
+    # Index-only scan of idx_attendance_class_date
+    rows = execute_query("""
+        SELECT date, student_id, CASE status WHEN 'present' THEN 1 WHEN 'absent' THEN 2 ELSE 3 END
+        FROM attendance
+        WHERE class_id = ? AND date BETWEEN ? AND ?
+    """, (class_id, start_date, end_date), readonly=True)
+    for month, student_id, packed in execute_query(f"""
+        SELECT month, student_id, codes FROM {partition_source('attendance_archive', start_date, end_date)}
+        WHERE class_id = ? AND month BETWEEN ? AND ?
+    """, (class_id, start_date[:7], end_date[:7]), readonly=True):
+        for n, code in enumerate(unpack_codes(packed, 31), 1):
+            day = f"{month}-{n:02d}"
+            if code and start_date <= day <= end_date:
+                rows.append((day, student_id, code))
+
+    dates = sorted({row[0] for row in rows})
+    column = {day: j for j, day in enumerate(dates)}
+    index = {student['id']: i for i, student in enumerate(students)}
+    cells = [bytearray(len(dates)) for _ in students]
+    for day, student_id, code in rows:
+        i = index.get(student_id)
+        if i is not None:
+            cells[i][column[day]] = code
+    return {"dates": dates, "students": students, "cells": cells}
@@ -0,0 +1,284 @@
+# Precomputed rollup tables for School Attendance System
+# Keeps daily_class_summary and student_attendance_stats in step with
+# attendance and students, and can rebuild or verify them from the raw
+# tables (live attendance plus the archive of closed years).
+#
+# Usage: python rollups.py rebuild | check
+
+import argparse
+import calendar
+import sqlite3
+import sys
+from datetime import date
+from typing import Any, Optional
+
+from database import init_db, transaction, execute_query
+
+
+def refresh_class_day(conn: sqlite3.Connection, class_id: int, day: str) -> None:
+    """Recompute one (class_id, date) summary row inside the caller's transaction."""
+    conn.execute("""
+        INSERT INTO daily_class_summary
+            (class_id, date, total_students, present_count, absent_count, late_count, submitted)
+        SELECT ?, ?,
+               (SELECT COUNT(*) FROM students WHERE class_id = ?),
+               COALESCE(SUM(status = 'present'), 0),
+               COALESCE(SUM(status = 'absent'), 0),
+               COALESCE(SUM(status = 'late'), 0),
+               COUNT(*) > 0
+        FROM attendance
+        WHERE class_id = ? AND date = ?
+        ON CONFLICT(class_id, date) DO UPDATE SET
+            total_students = excluded.total_students,
+            present_count = excluded.present_count,
+            absent_count = excluded.absent_count,
+            late_count = excluded.late_count,
+            submitted = excluded.submitted
+    """, (class_id, day, class_id, class_id, day))
+
+
+def refresh_class_totals(conn: sqlite3.Connection, class_id: int) -> None:
+    """Update today's and later summary rows after a class's roster changes."""
+    conn.execute("""
+        UPDATE daily_class_summary
+        SET total_students = (SELECT COUNT(*) FROM students WHERE class_id = ?)
+        WHERE class_id = ? AND date >= ?
+    """, (class_id, class_id, date.today().isoformat()))
+
+
+def refresh_student_months(conn: sqlite3.Connection, student_ids: list[int], month: str) -> None:
+    """Recompute the students' stats for one month (YYYY-MM) and their lifetime ('*') row.
+
+    Runs inside the caller's transaction; each student costs two seeks on
+    the (student_id, date) index and one on the stats table.
+    """
+    start, end = f"{month}-01", f"{month}-31"
+    conn.executemany("""
+        INSERT INTO student_attendance_stats (student_id, month, present_count, absent_count, late_count)
+        SELECT ?, ?, COALESCE(SUM(status = 'present'), 0), COALESCE(SUM(status = 'absent'), 0),
+               COALESCE(SUM(status = 'late'), 0)
+        FROM attendance
+        WHERE student_id = ? AND date BETWEEN ? AND ?
+        ON CONFLICT(student_id, month) DO UPDATE SET
+            present_count = excluded.present_count,
+            absent_count = excluded.absent_count,
+            late_count = excluded.late_count
+    """, [(sid, month, sid, start, end) for sid in student_ids])
+    conn.executemany("""
+        INSERT INTO student_attendance_stats (student_id, month, present_count, absent_count, late_count)
+        SELECT ?, '*', SUM(present_count), SUM(absent_count), SUM(late_count)
+        FROM student_attendance_stats
+        WHERE student_id = ? AND month != '*'
+        ON CONFLICT(student_id, month) DO UPDATE SET
+            present_count = excluded.present_count,
+            absent_count = excluded.absent_count,
+            late_count = excluded.late_count
+    """, [(sid, sid) for sid in student_ids])
+
+
+def populate_student_stats(conn: sqlite3.Connection) -> int:
+    """Refill student_attendance_stats from attendance_all inside the caller's transaction."""
+    conn.execute("DELETE FROM student_attendance_stats")
+    months = conn.execute("""
+        INSERT INTO student_attendance_stats (student_id, month, present_count, absent_count, late_count)
+        SELECT student_id, substr(date, 1, 7), SUM(status = 'present'), SUM(status = 'absent'),
+               SUM(status = 'late')
+        FROM attendance_all
+        GROUP BY student_id, substr(date, 1, 7)
+    """).rowcount
+    lifetime = conn.execute("""
+        INSERT INTO student_attendance_stats (student_id, month, present_count, absent_count, late_count)
+        SELECT student_id, '*', SUM(present_count), SUM(absent_count), SUM(late_count)
+        FROM student_attendance_stats
+        GROUP BY student_id
+    """).rowcount
+    return months + lifetime
+
+
+def rebuild_student_stats() -> int:
+    """Rebuild student_attendance_stats from attendance_all and return the row count."""
+    with transaction() as conn:
+        return populate_student_stats(conn)
+
+
+def student_summary(student_id: int, start: Optional[str] = None, end: Optional[str] = None) -> dict[str, Any]:
+    """A student's present/absent/late totals between two dates (inclusive), from the rollup.
+
+    Whole months come from student_attendance_stats; only the days of a
+    partly covered first or last month are counted from attendance_all.
+    """
+    if start is None and end is None:
+        rows = execute_query("""
+            SELECT present_count, absent_count, late_count FROM student_attendance_stats
+            WHERE student_id = ? AND month = '*'
+        """, (student_id,), readonly=True)
+        present, absent, late = tuple(rows[0]) if rows else (0, 0, 0)
+    else:
+        start, end = start or "0001-01-01", end or "9999-12-31"
+        # Months wholly inside the range come from the rollup, the rest from the raw table
+        first_full = start[:7] if start.endswith("-01") else _next_month(start[:7])
+        last_full = end[:7] if end == _month_end(end[:7]) else _previous_month(end[:7])
+        counts = [0, 0, 0]
+        if first_full <= last_full:
+            raw_windows = []
+            if start < f"{first_full}-01":
+                raw_windows.append((start, _month_end(start[:7])))
+            if end > _month_end(last_full):
+                raw_windows.append((f"{_next_month(last_full)}-01", end))
+            rows = execute_query("""
+                SELECT COALESCE(SUM(present_count), 0), COALESCE(SUM(absent_count), 0),
+                       COALESCE(SUM(late_count), 0)
+                FROM student_attendance_stats
+                WHERE student_id = ? AND month BETWEEN ? AND ? AND month != '*'
+            """, (student_id, first_full, last_full), readonly=True)
+            counts = list(rows[0])
+        else:
+            # Inside one month, or parts of two
+            raw_windows = [(start, end)]
+        for window_start, window_end in raw_windows:
+            rows = execute_query("""
+                SELECT COALESCE(SUM(status = 'present'), 0), COALESCE(SUM(status = 'absent'), 0),
+                       COALESCE(SUM(status = 'late'), 0)
+                FROM attendance_all
+                WHERE student_id = ? AND date BETWEEN ? AND ?
+            """, (student_id, window_start, window_end), readonly=True)
+            counts = [c + n for c, n in zip(counts, rows[0])]
+        present, absent, late = counts
+
+    total = present + absent + late
+    return {
+        "total": total,
+        "present": present,
+        "absent": absent,
+        "late": late,
+        "percentage": round(present / total * 100, 1) if total else 0
+    }
+
+
+def _next_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def _previous_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year - (mon == 1):04d}-{(mon - 2) % 12 + 1:02d}"
+
+
+def _month_end(month: str) -> str:
+    return f"{month}-{calendar.monthrange(int(month[:4]), int(month[5:7]))[1]:02d}"
+
+
+def rebuild_daily_summary() -> int:
+    """Rebuild daily_class_summary from attendance_all and return the row count.
+
+    Historical enrolment isn't recorded, so every row gets the class's
+    current student count as its total.
+    """
+    with transaction() as conn:
+        conn.execute("DELETE FROM daily_class_summary")
+        cursor = conn.execute("""
+            INSERT INTO daily_class_summary
+                (class_id, date, total_students, present_count, absent_count, late_count, submitted)
+            SELECT a.class_id, a.date,
+                   (SELECT COUNT(*) FROM students WHERE class_id = a.class_id),
+                   SUM(a.status = 'present'),
+                   SUM(a.status = 'absent'),
+                   SUM(a.status = 'late'),
+                   1
+            FROM attendance_all a
+            GROUP BY a.class_id, a.date
+        """)
+        return cursor.rowcount
+
+
+def check_daily_summary() -> list[str]:
+    """Compare daily_class_summary with the raw tables and describe mismatches."""
+    problems = []
+    raw_counts = """
+        SELECT class_id, date, SUM(status = 'present') AS present, SUM(status = 'absent') AS absent,
+               SUM(status = 'late') AS late
+        FROM attendance_all
+        GROUP BY class_id, date
+    """
+    summary_counts = """
+        SELECT class_id, date, present_count, absent_count, late_count
+        FROM daily_class_summary
+        WHERE submitted
+    """
+    for row in execute_query(f"{raw_counts} EXCEPT {summary_counts}", readonly=True):
+        problems.append(
+            f"class {row['class_id']} {row['date']}: summary missing or stale "
+            f"(raw P/A/L {row['present']}/{row['absent']}/{row['late']})"
+        )
+    for row in execute_query(f"{summary_counts} EXCEPT {raw_counts}", readonly=True):
+        problems.append(f"class {row['class_id']} {row['date']}: summary has no matching attendance")
+
+    for row in execute_query("""
+        SELECT d.class_id, d.date, d.total_students,
+               (SELECT COUNT(*) FROM students WHERE class_id = d.class_id) AS actual
+        FROM daily_class_summary d
+        WHERE d.date >= ? AND d.total_students != actual
+    """, (date.today().isoformat(),), readonly=True):
+        problems.append(
+            f"class {row['class_id']} {row['date']}: total_students {row['total_students']}, "
+            f"actual {row['actual']}"
+        )
+    return problems
+
+
+def check_student_stats() -> list[str]:
+    """Compare student_attendance_stats with attendance_all and describe mismatches."""
+    raw_counts = """
+        SELECT * FROM (
+            SELECT student_id, substr(date, 1, 7) AS month, SUM(status = 'present') AS present,
+                   SUM(status = 'absent') AS absent, SUM(status = 'late') AS late
+            FROM attendance_all
+            GROUP BY student_id, substr(date, 1, 7)
+            UNION ALL
+            SELECT student_id, '*', SUM(status = 'present'), SUM(status = 'absent'), SUM(status = 'late')
+            FROM attendance_all
+            GROUP BY student_id
+        )
+    """
+    # Months whose records were all deleted legitimately keep a row of zeros
+    stats_counts = """
+        SELECT student_id, month, present_count, absent_count, late_count
+        FROM student_attendance_stats
+        WHERE present_count + absent_count + late_count > 0
+    """
+    problems = [
+        f"student {row['student_id']} {row['month']}: stats missing or stale "
+        f"(raw P/A/L {row['present']}/{row['absent']}/{row['late']})"
+        for row in execute_query(f"{raw_counts} EXCEPT {stats_counts}", readonly=True)
+    ]
+    problems += [
+        f"student {row['student_id']} {row['month']}: stats have no matching attendance"
+        for row in execute_query(f"{stats_counts} EXCEPT {raw_counts}", readonly=True)
+    ]
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain attendance rollup tables")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "rebuild":
+        print(f"Rebuilt daily_class_summary: {rebuild_daily_summary()} rows")
+        print(f"Rebuilt student_attendance_stats: {rebuild_student_stats()} rows")
+    else:
+        failed = False
+        for table, check in (("daily_class_summary", check_daily_summary),
+                             ("student_attendance_stats", check_student_stats)):
+            problems = check()
+            for problem in problems:
+                print(problem)
+            print(f"{table}: {len(problems)} problem(s)")
+            failed = failed or bool(problems)
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# Bulk student roster import for School Attendance System
+# Stream-parses a CSV or XLSX upload, validates each row against
+# StudentCreate and inserts the whole roster in one transaction
+
+import csv
+import io
+from contextlib import closing
+from typing import Any, BinaryIO, Iterator, Optional
+
+from openpyxl import load_workbook
+from pydantic import ValidationError
+
+from constants import ROSTER_IMPORT_MAX_ROWS, ROSTER_IMPORT_MAX_ERRORS
+from database import transaction
+from models import StudentCreate
+from report_cache import bump_report_version
+from rollups import refresh_class_totals
+
+ROSTER_COLUMNS = ["name_en", "name_ur", "roll_no", "class_id", "parent_phone"]
+REQUIRED_COLUMNS = {"name_en", "roll_no", "class_id"}
+
+
+class RosterFileError(ValueError):
+    """The upload can't be read as a roster at all (bad format or header)."""
+
+
+def _cell(value: Any) -> Optional[str]:
+    """Normalise a spreadsheet cell: blanks become None, whole floats lose '.0'."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[tuple]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise RosterFileError(f"Unreadable CSV: {e}") from e
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[tuple]:
+    try:
+        wb = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise RosterFileError(f"Unreadable XLSX: {e}") from e
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def iter_roster(file: BinaryIO, fmt: str) -> Iterator[tuple[int, dict[str, str]]]:
+    """Yield (line number, row dict) for each non-empty data row.
+
+    The first row is a header naming ROSTER_COLUMNS (any order, case
+    insensitive; unknown columns are ignored).
+    """
+    if fmt not in ("csv", "xlsx"):
+        raise RosterFileError("File must be .csv or .xlsx")
+    rows = _csv_rows(file) if fmt == "csv" else _xlsx_rows(file)
+
+    header = next(rows, None)
+    if header is None:
+        rows.close()
+        raise RosterFileError("File is empty")
+    names = [(_cell(h) or "").lower() for h in header]
+    missing = REQUIRED_COLUMNS - set(names)
+    if missing:
+        rows.close()
+        raise RosterFileError(f"Missing columns: {', '.join(sorted(missing))}")
+    positions = {name: i for i, name in enumerate(names) if name in ROSTER_COLUMNS}
+
+    try:
+        for line, row in enumerate(rows, 2):
+            values = {name: _cell(row[i]) for name, i in positions.items() if i < len(row)}
+            values = {name: value for name, value in values.items() if value is not None}
+            if values:
+                yield line, values
+    finally:
+        rows.close()
+
+
+def import_roster(file: BinaryIO, fmt: str, dry_run: bool = False) -> dict[str, Any]:
+    """Validate a roster file and insert it, all or nothing.
+
+    Rows are checked against StudentCreate, for duplicate
+    (class_id, roll_no) pairs within the file and against existing
+    students, and for unknown classes. If any row fails nothing is
+    inserted; with ``dry_run`` nothing is inserted either way.
+    """
+    errors: list[dict[str, Any]] = []
+    error_count = 0
+    students: list[tuple] = []
+    first_seen: dict[tuple[int, str], int] = {}
+    lines: list[int] = []
+
+    def reject(line: int, values: dict, message: str) -> None:
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < ROSTER_IMPORT_MAX_ERRORS:
+            errors.append({"row": line, "roll_no": values.get("roll_no"),
+                           "class_id": values.get("class_id"), "error": message})
+
+    rows = 0
+    with closing(iter_roster(file, fmt)) as roster:
+        for line, values in roster:
+            rows += 1
+            if rows > ROSTER_IMPORT_MAX_ROWS:
+                raise RosterFileError(f"File has more than {ROSTER_IMPORT_MAX_ROWS} rows")
+            try:
+                student = StudentCreate.model_validate(values)
+            except ValidationError as e:
+                reject(line, values, "; ".join(
+                    f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            key = (student.class_id, student.roll_no)
+            if key in first_seen:
+                reject(line, values, f"Duplicate roll_no in class {student.class_id} (also on row {first_seen[key]})")
+                continue
+            first_seen[key] = line
+            lines.append(line)
+            students.append((student.name_en, student.name_ur, student.roll_no,
+                             student.class_id, student.parent_phone))
+
+    inserted = 0
+    with transaction() as conn:
+        class_ids = {cid for cid, _ in first_seen}
+        placeholders = ",".join("?" * len(class_ids))
+        known_classes = {row[0] for row in conn.execute(
+            f"SELECT id FROM classes WHERE id IN ({placeholders})", tuple(class_ids)
+        )} if class_ids else set()
+        taken = {(row[0], row[1]) for row in conn.execute(
+            f"SELECT class_id, roll_no FROM students WHERE class_id IN ({placeholders})", tuple(class_ids)
+        )} if class_ids else set()
+
+        for line, student in zip(lines, students):
+            values = {"roll_no": student[2], "class_id": str(student[3])}
+            if student[3] not in known_classes:
+                reject(line, values, f"Class {student[3]} does not exist")
+            elif (student[3], student[2]) in taken:
+                reject(line, values, f"Roll no {student[2]} already exists in class {student[3]}")
+
+        if not dry_run and error_count == 0 and students:
+            conn.executemany(
+                "INSERT INTO students (name_en, name_ur, roll_no, class_id, parent_phone) VALUES (?, ?, ?, ?, ?)",
+                students
+            )
+            for class_id in class_ids:
+                refresh_class_totals(conn, class_id)
+                bump_report_version(conn, class_id)
+            inserted = len(students)
+
+    errors.sort(key=lambda e: e["row"])
+    return {
+        "dry_run": dry_run,
+        "rows": rows,
+        "valid": rows - error_count,
+        "inserted": inserted,
+        "error_count": error_count,
+        "errors": errors,
+    }
@@ -2,7 +2,7 @@
 # Creates sample data: 1 admin, 1 principal, 5 teachers, 8 classes, 160 students
 
 from database import init_db, execute_query, execute_insert
-from auth import hash_password
+from auth import create_users
 
 
 def seed_database():
@@ -16,21 +16,15 @@ def seed_database():
 
     print("Seeding database with sample data...")
 
-    # Create users
-    admin_id = create_user("admin", "school123", "admin", "Admin User", "منتظم")
-    principal_id = create_user("principal", "school123", "principal", "Principal", "پرنسپل")
-
-    # Create 5 teachers
-    teacher_ids = []
-    for i in range(1, 6):
-        teacher_id = create_user(
-            f"teacher{i}",
-            "school123",
-            "teacher",
-            f"Teacher {i}",
-            f"استاد {i}"
-        )
-        teacher_ids.append(teacher_id)
+    # Create users (passwords are hashed in parallel)
+    user_ids = create_users([
+        ("admin", "school123", "admin", "Admin User", "منتظم"),
+        ("principal", "school123", "principal", "Principal", "پرنسپل"),
+    ] + [
+        (f"teacher{i}", "school123", "teacher", f"Teacher {i}", f"استاد {i}")
+        for i in range(1, 6)
+    ])
+    teacher_ids = user_ids[2:]
 
     print(f"Created {len(teacher_ids) + 2} users (1 admin, 1 principal, 5 teachers)")
 
@@ -80,15 +74,6 @@ def seed_database():
     print("\nDatabase seeding complete!")
 
 
-def create_user(username, password, role, name_en, name_ur=None):
-    """Create a user with hashed password."""
-    hashed = hash_password(password)
-    return execute_insert(
-        "INSERT INTO users (username, password, role, name_en, name_ur) VALUES (?, ?, ?, ?, ?)",
-        (username, hashed, role, name_en, name_ur)
-    )
-
-
 if __name__ == "__main__":
     # Initialize database schema
     init_db()
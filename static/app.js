@@ -27,7 +27,7 @@ async function apiRequest(endpoint, options = {}) {
         ...options,
     };
 
-    if (options.body && typeof options.body === 'object') {
+    if (options.body && typeof options.body === 'object' && !(options.body instanceof FormData)) {
         config.headers = {
             'Content-Type': 'application/json',
             ...config.headers,
@@ -45,6 +45,20 @@ async function apiRequest(endpoint, options = {}) {
     return response.json();
 }
 
+// List endpoints return a page ({ items, next_cursor }); follow the cursors to collect every item
+async function apiListAll(endpoint, params = {}) {
+    const items = [];
+    let cursor = null;
+    do {
+        const query = new URLSearchParams({ ...params, limit: 1000 });
+        if (cursor) query.set('cursor', cursor);
+        const page = await apiRequest(`${endpoint}?${query}`);
+        items.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor);
+    return items;
+}
+
 // Auth functions
 async function login(username, password) {
     const data = await apiRequest('/login', {
@@ -68,7 +82,7 @@ async function getCurrentUser() {
 
 // Admin functions - Teachers
 async function getTeachers() {
-    return apiRequest('/admin/teachers');
+    return apiListAll('/admin/teachers');
 }
 
 async function addTeacher(teacherData) {
@@ -85,9 +99,11 @@ async function deleteTeacher(id) {
 }
 
 // Admin functions - Students
-async function getStudents(classId = null) {
-    const params = classId ? `?class_id=${classId}` : '';
-    return apiRequest(`/admin/students${params}`);
+async function getStudents(classId = null, fields = null) {
+    const params = {};
+    if (classId) params.class_id = classId;
+    if (fields) params.fields = fields;
+    return apiListAll('/admin/students', params);
 }
 
 async function addStudent(studentData) {
@@ -97,6 +113,15 @@ async function addStudent(studentData) {
     });
 }
 
+async function importStudents(file, dryRun = false) {
+    const form = new FormData();
+    form.append('file', file);
+    return apiRequest(`/admin/students/import?dry_run=${dryRun}`, {
+        method: 'POST',
+        body: form,
+    });
+}
+
 async function deleteStudent(id) {
     return apiRequest(`/admin/students/${id}`, {
         method: 'DELETE',
@@ -105,7 +130,7 @@ async function deleteStudent(id) {
 
 // Admin functions - Classes
 async function getClasses() {
-    return apiRequest('/admin/classes');
+    return apiListAll('/admin/classes');
 }
 
 async function addClass(classData) {
@@ -157,14 +182,17 @@ async function downloadExcel(year, month, classId = null) {
     window.location.href = `${API_BASE}/principal/report/export${params}`;
 }
 
-async function getStudentReport(studentId) {
-    return apiRequest(`/principal/student/${studentId}`);
+async function getStudentReport(studentId, limit = 30) {
+    return apiRequest(`/principal/student/${studentId}?limit=${limit}`);
 }
 
 // Notification functions
-async function getNotifications(status = null) {
-    const params = status ? `?status=${status}` : '';
-    return apiRequest(`/notifications${params}`);
+// One page of notifications, newest first; pass the previous page's next_cursor for the next
+async function getNotifications(status = null, cursor = null) {
+    const params = new URLSearchParams();
+    if (status) params.set('status', status);
+    if (cursor) params.set('cursor', cursor);
+    return apiRequest(`/notifications?${params}`);
 }
 
 async function markNotificationSent(id) {
@@ -173,6 +201,12 @@ async function markNotificationSent(id) {
     });
 }
 
+async function sendPendingNotifications(date) {
+    return apiRequest(`/notifications/send-pending?date=${date}`, {
+        method: 'POST',
+    });
+}
+
 // UI helpers
 function redirectToRole(user) {
     if (!user) {
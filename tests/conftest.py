@@ -0,0 +1,83 @@
+# Shared fixtures for the test suite
+# Every test that needs data gets a school generated by generate_data in
+# its own scratch file, so the tests never touch school.db and can run in
+# any order.
+
+import os
+import tempfile
+from datetime import date
+
+# Fast hashes for generated users, and no re-hash on login; set before constants is imported
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest  # noqa: E402
+
+import database  # noqa: E402
+import generate_data  # noqa: E402
+
+# main runs init_db() when imported; keep that away from school.db too
+database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="school-tests-"), "import.db")
+
+END = date(2025, 3, 31)  # last generated school day: the end of the 2024-25 academic year
+PASSWORD = "school123"
+
+
+def clear_caches() -> None:
+    """Forget in-process state keyed by ids, which the next test's database reuses."""
+    from analytics import matrix_cache
+    from auth import _user_cache, forget_sessions
+    from report_cache import report_cache
+
+    matrix_cache.clear()
+    report_cache.clear()
+    _user_cache.clear()
+    forget_sessions()
+
+
+@pytest.fixture
+def make_school(tmp_path, monkeypatch):
+    """Factory generating a school into a scratch database, which becomes database.DB_FILE.
+
+    make_school(classes=2, students=10, years=0.25, end=END, **generate_data options)
+    returns the file's path. Users are admin, principal and teacher1..N.
+    """
+    monkeypatch.setattr(database, "DB_FILE", database.DB_FILE)  # restored afterwards
+    made = []
+
+    def make(classes: int = 2, students: int = 10, years: float = 0.25, end: date = END, **options) -> str:
+        path = str(tmp_path / f"school{len(made)}.db")
+        argv = ["--db", path, "--classes", str(classes), "--students", str(students), "--years", str(years),
+                "--end", end.isoformat(), "--password", PASSWORD, "--bcrypt-rounds", "4"]
+        for name, value in options.items():
+            argv += [f"--{name.replace('_', '-')}", str(value)]
+        generate_data.generate(generate_data.build_parser().parse_args(argv))
+        clear_caches()
+        made.append(path)
+        return path
+
+    yield make
+    database.close_pools()
+    clear_caches()
+
+
+@pytest.fixture
+def school(make_school) -> str:
+    """A small generated school: 2 classes of 10 students, a term of attendance up to END."""
+    return make_school()
+
+
+@pytest.fixture
+def client(school):
+    """A TestClient for the app on the ``school`` database; log in with login(client, username)."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def login(client, username: str) -> dict:
+    response = client.post("/api/login", json={"username": username, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()
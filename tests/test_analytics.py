@@ -0,0 +1,192 @@
+# Analytics tests
+# A cached attendance matrix, however it was kept current (saved days,
+# roster changes, a later end date), must hold the same cells as one
+# loaded afresh; the metrics computed over it must match a plain-Python
+# count of the same codes.
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from analytics import AttendanceMatrix, _class_percentiles, compute_metrics, load_matrix, matrix_cache, refresh_matrix
+from archive import compact_year
+from conftest import END
+from constants import ANALYTICS_TREND_DAYS, STATUS_ABSENT
+from database import execute_query
+from reports import STATUS_CODES
+
+ABSENT = STATUS_CODES[STATUS_ABSENT]
+
+
+def fresh(start: date, end: date, class_id=None) -> AttendanceMatrix:
+    matrix = AttendanceMatrix(start, end, class_id)
+    load_matrix(matrix)
+    return matrix
+
+
+def assert_same(matrix: AttendanceMatrix, expected: AttendanceMatrix) -> None:
+    assert matrix.students.tolist() == expected.students.tolist()
+    assert matrix.class_ids.tolist() == expected.class_ids.tolist()
+    assert matrix.cells.shape == expected.cells.shape
+    assert np.array_equal(matrix.cells, expected.cells)
+
+
+def test_load_matches_the_database(school):
+    start = date(2025, 1, 1)
+    matrix = fresh(start, END)
+    rows = execute_query("SELECT student_id, date, status FROM attendance WHERE date BETWEEN ? AND ?",
+                         (start.isoformat(), END.isoformat()))
+    assert rows
+    assert np.count_nonzero(matrix.cells) == len(rows)
+    students = matrix.students.tolist()
+    for row in rows:
+        column = (date.fromisoformat(row['date']) - start).days
+        assert matrix.cells[students.index(row['student_id']), column] == STATUS_CODES[row['status']]
+
+    [class_id] = execute_query("SELECT MIN(id) FROM classes")[0]
+    one_class = fresh(start, END, class_id)
+    assert set(one_class.class_ids.tolist()) == {class_id}
+    assert np.array_equal(one_class.cells, matrix.cells[matrix.class_ids == class_id])
+
+
+def test_refresh_follows_a_saved_day(school):
+    from main import _save_attendance
+
+    start = date(2025, 1, 1)
+    matrix = fresh(start, END)
+    assert refresh_matrix(matrix) == 0
+    [student] = execute_query("SELECT id, class_id FROM students ORDER BY id LIMIT 1")
+    day = execute_query("SELECT MAX(date) FROM attendance WHERE student_id = ?", (student['id'],))[0][0]
+    status = execute_query("SELECT status FROM attendance WHERE student_id = ? AND date = ?",
+                           (student['id'], day))[0][0]
+    _save_attendance(student['class_id'], day, {student['id']: "absent" if status != "absent" else "present"}, 1)
+
+    assert refresh_matrix(matrix) == 1  # that class and month only
+    assert_same(matrix, fresh(start, END))
+
+
+def test_refresh_follows_roster_changes(school):
+    from main import _delete_student, _insert_student, _save_attendance
+    from models import StudentCreate
+
+    start = date(2025, 1, 1)
+    matrix = fresh(start, END)
+    [first, second] = execute_query("SELECT id, class_id FROM students ORDER BY id LIMIT 2")
+    _delete_student(first['id'])
+    new_id = _insert_student(StudentCreate(name_en="New Student", roll_no="99", class_id=second['class_id']))
+    _save_attendance(second['class_id'], END.isoformat(), {new_id: "absent"}, 1)
+
+    assert refresh_matrix(matrix) > 0
+    assert_same(matrix, fresh(start, END))
+    assert first['id'] not in matrix.students.tolist()
+    assert matrix.cells[matrix.students.tolist().index(new_id), -1] == ABSENT
+
+
+@pytest.fixture
+def archived_school(make_school):
+    """Attendance from October 2023, with academic year 2023-24 (to March 2024) archived."""
+    path = make_school(years=1.5)
+    compact_year(2023, today=END)
+    assert execute_query("SELECT COUNT(*) FROM attendance WHERE date < '2024-04-01'")[0][0] == 0
+    return path
+
+
+@pytest.mark.parametrize("first_end, end", [
+    (date(2023, 12, 31), date(2024, 3, 31)),  # archived months only
+    (date(2023, 12, 15), date(2024, 1, 20)),  # from and to the middle of archived months
+    (date(2024, 2, 10), date(2024, 6, 30)),  # from archived into live months
+    (date(2024, 5, 10), END),  # live months only
+])
+def test_extended_range_matches_a_fresh_load(archived_school, first_end, end):
+    start = date(2023, 10, 1)
+    matrix = fresh(start, first_end)
+    refresh_matrix(matrix, end)
+    expected = fresh(start, end)
+    assert np.count_nonzero(expected.cells[:, (first_end - start).days + 1:])
+    assert_same(matrix, expected)
+
+
+def test_cache_extends_and_reads_prefixes(archived_school):
+    start = date(2023, 10, 1)
+    matrix = matrix_cache.matrix(start, date(2023, 12, 31))
+    assert matrix_cache.matrix(start, date(2024, 3, 31)) is matrix
+    assert_same(matrix, fresh(start, date(2024, 3, 31)))
+    assert matrix_cache.matrix(start, date(2023, 11, 30)) is matrix  # a prefix of the loaded days
+
+
+def reference_metrics(cells: np.ndarray) -> list[dict]:
+    """compute_metrics' per-student values, counted one student and day at a time."""
+    school_days = [j for j in range(cells.shape[1]) if any(cells[:, j])]
+    window = min(ANALYTICS_TREND_DAYS, len(school_days) // 2)
+
+    def rate(codes):
+        marked = sum(1 for code in codes if code)
+        return (sum(1 for code in codes if code == ABSENT) / marked if marked else 0.0), marked
+
+    students = []
+    for row in cells:
+        codes = [int(row[j]) for j in school_days]
+        streak = longest = 0
+        for code in codes:
+            if code == ABSENT:
+                streak += 1
+                longest = max(longest, streak)
+            elif code:
+                streak = 0  # unmarked days don't break a streak
+        recent, recent_marked = rate(codes[len(codes) - window:])
+        previous, previous_marked = rate(codes[len(codes) - 2 * window:len(codes) - window])
+        students.append({
+            "rate": rate(codes)[0],
+            "days_marked": rate(codes)[1],
+            "longest_streak": longest,
+            "current_streak": streak,
+            "recent_rate": recent,
+            "previous_rate": previous,
+            "rise": recent - previous if recent_marked and previous_marked else 0.0,
+        })
+    return students
+
+
+def interpolated(values: list[float], percent: float) -> float:
+    values = sorted(values)
+    position = percent / 100 * (len(values) - 1)
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def test_metrics_match_a_plain_count():
+    rng = np.random.default_rng(7)
+    cells = rng.choice(np.array([0, 1, 2, 3], np.uint8), size=(40, 90), p=[0.15, 0.5, 0.25, 0.1])
+    cells[5, -20:] = ABSENT  # a student on a long current streak
+    cells[3] = 0  # and one with no records
+    cells[:, ::7] = 0  # days without school
+    class_ids = np.repeat(np.array([2, 1, 3, 1]), 10)
+    metrics = compute_metrics(cells, class_ids)
+
+    assert metrics["school_days"].tolist() == [j for j in range(90) if j % 7]
+    for i, expected in enumerate(reference_metrics(cells)):
+        for name, value in expected.items():
+            assert metrics[name][i] == pytest.approx(value), (i, name)
+
+    rates = [student["rate"] for student in reference_metrics(cells)]
+    marked = [i for i in range(len(cells)) if cells[i].any()]
+    for i in marked:
+        classmates = [rates[k] for k in marked if class_ids[k] == class_ids[i]]
+        below = sum(1 for other in classmates if other < rates[i])
+        assert metrics["class_percentile"][i] == pytest.approx(below / (len(classmates) - 1) * 100)
+    assert metrics["class_percentile"][3] == 0
+    assert metrics["classes"].tolist() == [1, 2, 3]
+    for k, class_id in enumerate([1, 2, 3]):
+        classmates = [rates[i] for i in marked if class_ids[i] == class_id]
+        assert metrics["class_sizes"][k] == len(classmates)
+        assert metrics["class_percentiles"][k] == pytest.approx(
+            [interpolated(classmates, p) for p in (10, 25, 50, 75, 90)])
+
+
+def test_percentiles_of_tied_and_single_students():
+    stats = _class_percentiles(np.array([1, 1, 1, 2]), np.array([0.2, 0.1, 0.2, 0.5]))
+    assert stats["rank"].tolist() == [50.0, 0.0, 50.0, 0.0]
+    assert stats["class_sizes"].tolist() == [3, 1]
+    assert stats["class_percentiles"][1].tolist() == [0.5] * 5
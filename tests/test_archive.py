@@ -0,0 +1,73 @@
+# Cold storage tests
+# A compacted academic year reads back through archived_attendance exactly
+# as it was in attendance, and the SQL archive_code() decodes what
+# pack_codes() packed.
+
+import random
+from datetime import date
+
+import pytest
+
+import database
+from archive import compact_year, year_bounds
+from conftest import END
+from database import execute_query
+from reports import pack_codes
+from rollups import student_summary
+
+YEAR = 2023  # April 2023 to March 2024, closed before END
+
+
+def attendance_of(source: str, start: str, end: str) -> list[tuple]:
+    return [tuple(row) for row in execute_query(f"""
+        SELECT student_id, class_id, date, status FROM {source}
+        WHERE date BETWEEN ? AND ? ORDER BY student_id, date
+    """, (start, end))]
+
+
+@pytest.fixture
+def two_years(make_school):
+    """A school with attendance from October 2023, so academic year 2023-24 can be compacted."""
+    return make_school(years=1.5)
+
+
+def test_archive_code_decodes_pack_codes():
+    rng = random.Random(1)
+    for days in (28, 29, 30, 31):
+        codes = bytes(rng.randrange(4) for _ in range(days))
+        packed = pack_codes(codes)
+        assert [database._archive_code(packed, day) for day in range(1, days + 1)] == list(codes)
+        assert database._archive_code(packed, 33) == 0  # past the packed bytes
+    assert database._archive_code(None, 1) == 0
+
+
+def test_compact_year_round_trip(two_years):
+    start, end = year_bounds(YEAR)
+    live = attendance_of("attendance", start, end)
+    assert live
+    students = [row[0] for row in execute_query("SELECT id FROM students ORDER BY id LIMIT 3")]
+    summaries = {sid: student_summary(sid, "2023-10-15", "2024-12-10") for sid in students}
+
+    assert compact_year(YEAR, dry_run=True, today=END)["records"] == len(live)
+    assert attendance_of("attendance", start, end) == live  # rolled back
+
+    result = compact_year(YEAR, today=END)
+    assert result["records"] == len(live)
+    assert attendance_of("attendance", start, end) == []
+    assert attendance_of("archived_attendance", start, end) == live
+    assert attendance_of("attendance_all", start, end) == live
+    assert {sid: student_summary(sid, "2023-10-15", "2024-12-10") for sid in students} == summaries
+
+
+def test_compact_year_refuses_open_and_repeated_years(two_years):
+    with pytest.raises(ValueError, match="not ended"):
+        compact_year(2024, today=date(2025, 3, 31))
+    compact_year(YEAR, today=END)
+    with pytest.raises(ValueError, match="already archived"):
+        compact_year(YEAR, today=END)
+
+
+def test_compact_year_keeps_years_in_order(make_school):
+    make_school(years=2.5)  # from October 2022
+    with pytest.raises(ValueError, match="first"):
+        compact_year(YEAR, today=END)
@@ -0,0 +1,32 @@
+# Static asset delivery tests
+# Pages and assets are served from memory in the best encoding the
+# client's Accept-Encoding allows, with ETags per encoding.
+
+import brotli
+import pytest
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+    ("", None),
+])
+def test_login_page_encoding(client, accept_encoding, encoding):
+    response = client.get("/login", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert "<html" in response.text.lower()  # httpx decodes gzip and, with brotli installed, br
+
+
+def test_brotli_variant_and_revalidation(client):
+    import main
+
+    page, _ = main.assets.get("login.html")
+    assert brotli.decompress(page.variants["br"]) == page.content
+    etag = client.get("/login", headers={"Accept-Encoding": "br"}).headers["etag"]
+    assert etag == f'"{page.digest}-br"'
+    cached = client.get("/login", headers={"Accept-Encoding": "br", "If-None-Match": etag})
+    assert cached.status_code == 304
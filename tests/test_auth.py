@@ -0,0 +1,83 @@
+# Authentication tests
+# Sessions resolve through an in-process cache that logout and user
+# deletion invalidate, and deleting a user ends their sessions atomically.
+
+import pytest
+
+import auth
+from auth import create_session, delete_session, delete_user, get_user_from_session
+from database import execute_query
+
+
+def teacher_id() -> int:
+    return execute_query("SELECT id FROM users WHERE username = 'teacher1'")[0][0]
+
+
+def test_delete_user_ends_sessions(school):
+    user_id = teacher_id()
+    session_id = create_session(user_id)
+    assert get_user_from_session(session_id)['id'] == user_id
+
+    assert not delete_user(user_id, role="principal")  # wrong role: nothing deleted
+    assert delete_user(user_id, role="teacher")
+    assert execute_query("SELECT COUNT(*) FROM sessions WHERE user_id = ?", (user_id,))[0][0] == 0
+    assert get_user_from_session(session_id) is None
+
+
+def test_delete_user_is_atomic(school, monkeypatch):
+    user_id = teacher_id()
+    create_session(user_id)
+
+    def fail(self, user_id, conn=None):
+        raise RuntimeError("crashed between the two deletes")
+
+    monkeypatch.setattr(auth.SQLiteSessionBackend, "delete_user_sessions", fail)
+    with pytest.raises(RuntimeError):
+        delete_user(user_id)
+    assert execute_query("SELECT COUNT(*) FROM users WHERE id = ?", (user_id,))[0][0] == 1
+
+
+@pytest.fixture
+def session_lookups(monkeypatch):
+    """Counts reads of the sessions table."""
+    calls = []
+    original = auth.SQLiteSessionBackend.get
+
+    def get(self, session_id):
+        calls.append(session_id)
+        return original(self, session_id)
+
+    monkeypatch.setattr(auth.SQLiteSessionBackend, "get", get)
+    return calls
+
+
+def test_session_is_resolved_from_the_cache(school, session_lookups):
+    session_id = create_session(teacher_id())
+    for _ in range(5):
+        assert get_user_from_session(session_id)['username'] == "teacher1"
+    assert len(session_lookups) == 1
+
+
+def test_cached_session_expires(school, session_lookups, monkeypatch):
+    session_id = create_session(teacher_id())
+    get_user_from_session(session_id)
+    now = auth.time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now + auth.SESSION_CACHE_TTL + 1)
+    get_user_from_session(session_id)
+    assert len(session_lookups) == 2
+
+
+def test_logout_invalidates_the_cache(school):
+    session_id = create_session(teacher_id())
+    assert get_user_from_session(session_id) is not None
+    delete_session(session_id)
+    assert get_user_from_session(session_id) is None
+
+
+def test_delete_user_invalidates_the_cache(school, session_lookups):
+    user_id = teacher_id()
+    session_id = create_session(user_id)
+    assert get_user_from_session(session_id) is not None
+    delete_user(user_id)
+    assert get_user_from_session(session_id) is None
+    assert len(session_lookups) == 2  # went back to the (now empty) sessions table
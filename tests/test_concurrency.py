@@ -0,0 +1,61 @@
+# Report/request concurrency test
+# Whole-school monthly reports run through the app while /api/me is polled
+# back to back; the reports go through run_db, so no /api/me call may wait
+# on them longer than the bound.
+
+import asyncio
+import time
+
+import httpx
+
+from conftest import PASSWORD
+
+MAX_ME_MS = 250
+REPORTS = 3
+
+
+async def poll_me(client: httpx.AsyncClient, done: asyncio.Event) -> list[float]:
+    """Call /api/me back to back until ``done`` is set; returns latencies in ms.
+
+    Each latency includes the pause before the call, so a report blocking
+    the event loop shows up even while no call is in flight.
+    """
+    latencies = []
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        response = await client.get("/api/me")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000 - 5)
+    return latencies
+
+
+async def reports_alongside_me() -> tuple[float, list[float]]:
+    from main import app
+    from report_cache import report_cache
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        response = await client.post("/api/login", json={"username": "principal", "password": PASSWORD})
+        response.raise_for_status()
+        client.cookies = response.cookies
+
+        done = asyncio.Event()
+        poller = asyncio.create_task(poll_me(client, done))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        for _ in range(REPORTS):
+            report_cache.clear()
+            response = await client.get("/api/principal/report", params={"year": 2025, "month": 3})
+            response.raise_for_status()
+        elapsed = (time.perf_counter() - start) * 1000
+        done.set()
+        return elapsed, await poller
+
+
+def test_me_stays_responsive_during_whole_school_reports(make_school):
+    make_school(classes=100, students=40)  # 4,000 students; one report takes longer than the bound
+    elapsed, latencies = asyncio.run(reports_alongside_me())
+    assert elapsed > REPORTS * MAX_ME_MS / 2, f"reports took only {elapsed:.0f} ms; too small to block anything"
+    assert len(latencies) >= 5
+    assert max(latencies) < MAX_ME_MS, f"/api/me took {max(latencies):.1f} ms while reports ran"
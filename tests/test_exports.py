@@ -0,0 +1,94 @@
+# Export memory tests
+# A year of attendance for a whole school is exported in a fresh process
+# and its peak RSS growth must stay under a fixed ceiling, i.e. the
+# streaming pipelines never hold the whole export in memory.
+
+import multiprocessing
+import os
+import resource
+
+import pytest
+
+from exports import csv_chunks, gzip_chunks, iter_attendance_rows, month_range, write_range_report
+
+MAX_RSS_GROWTH_MB = 40  # streaming takes about 20 MB here; building the workbook in memory about 65 MB
+YEAR = month_range((2024, 4), (2025, 3))
+
+
+def _child(fn, args, results) -> None:
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    size = fn(*args)
+    results.put((size, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024))
+
+
+def rss_growth_mb(fn, *args) -> tuple[int, float]:
+    """Run fn in a forked process; returns (its result, peak RSS growth in MB)."""
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=_child, args=(fn, args, results))
+    process.start()
+    size, growth = results.get(timeout=300)
+    process.join()
+    return size, growth
+
+
+def excel_year(sheet_per: str) -> int:
+    path = write_range_report(YEAR, None, sheet_per)
+    size = os.path.getsize(path)
+    os.unlink(path)
+    return size
+
+
+def csv_year() -> int:
+    return sum(len(chunk) for chunk in gzip_chunks(csv_chunks(iter_attendance_rows("2024-04-01", "2025-03-31"))))
+
+
+@pytest.fixture(scope="module")
+def year_school(tmp_path_factory):
+    import database
+    import generate_data
+
+    path = str(tmp_path_factory.mktemp("exports") / "year.db")
+    original = database.DB_FILE
+    generate_data.generate(generate_data.build_parser().parse_args([
+        "--db", path, "--classes", "20", "--students", "40", "--years", "1", "--end", "2025-03-31",
+        "--bcrypt-rounds", "4",
+    ]))
+    database.close_pools()  # the children open their own connections
+    yield path
+    database.close_pools()
+    database.DB_FILE = original
+
+
+@pytest.mark.parametrize("sheet_per", ["month", "class"])
+def test_year_excel_export_memory_is_bounded(year_school, sheet_per):
+    size, growth = rss_growth_mb(excel_year, sheet_per)
+    assert size > 500_000
+    assert growth < MAX_RSS_GROWTH_MB, f"peak RSS grew {growth:.1f} MB"
+
+
+def test_year_csv_export_memory_is_bounded(year_school):
+    size, growth = rss_growth_mb(csv_year)
+    assert size > 100_000
+    assert growth < MAX_RSS_GROWTH_MB, f"peak RSS grew {growth:.1f} MB"
+
+
+@pytest.mark.parametrize("accept_encoding, gzipped", [
+    ("gzip, deflate", True),
+    ("gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("*", True),
+    ("*, gzip;q=0", False),
+    ("identity", False),
+])
+def test_attendance_export_honors_gzip_q_values(client, accept_encoding, gzipped):
+    import database
+    from conftest import login
+
+    login(client, "principal")
+    response = client.get("/api/principal/export/attendance.csv", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert (response.headers.get("content-encoding") == "gzip") is gzipped
+    assert response.text.startswith("id,date,")  # decoded by the client when gzipped
+    # the download's DB_MAX_PENDING slot is free again once it ends
+    assert all(slots._value == database.DB_MAX_PENDING for slots in database._slots.values())
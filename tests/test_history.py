@@ -0,0 +1,50 @@
+# Teacher history matrix tests
+# Status codes pack four to a byte and unpack to the same codes, and the
+# history matrix holds exactly the class's attendance records.
+
+import random
+
+import pytest
+
+from database import execute_query
+from reports import CODE_SYMBOLS, build_history_matrix, code_symbols, pack_codes, unpack_codes
+
+CODES = {"present": 1, "absent": 2, "late": 3}
+
+
+@pytest.mark.parametrize("count", [0, 1, 3, 4, 5, 31, 1000])
+def test_pack_codes_round_trip(count):
+    rng = random.Random(count)
+    codes = bytes(rng.randrange(4) for _ in range(count))
+    packed = pack_codes(codes)
+    assert len(packed) == (count + 3) // 4
+    assert unpack_codes(packed, count) == codes
+
+
+def test_pack_codes_layout():
+    # first code in the low bits, padding with 0 (not marked)
+    assert pack_codes(bytes([1, 2, 3, 0, 3])) == bytes([0b00_11_10_01, 0b11])
+    assert unpack_codes(bytes([0b11]), 4) == bytes([3, 0, 0, 0])
+
+
+def test_code_symbols():
+    assert code_symbols(bytes([0, 1, 2, 3])) == CODE_SYMBOLS == "-PAL"
+
+
+def test_history_matrix_matches_attendance(school):
+    class_id = execute_query("SELECT MIN(id) FROM classes")[0][0]
+    start, end = "2025-02-10", "2025-03-31"
+    matrix = build_history_matrix(class_id, start, end)
+
+    expected = {(row['student_id'], row['date']): CODES[row['status']] for row in execute_query(
+        "SELECT student_id, date, status FROM attendance WHERE class_id = ? AND date BETWEEN ? AND ?",
+        (class_id, start, end))}
+    assert matrix["dates"] == sorted({day for _, day in expected})
+    assert [s['id'] for s in matrix["students"]] == [row[0] for row in execute_query(
+        "SELECT id FROM students WHERE class_id = ? ORDER BY roll_no", (class_id,))]
+
+    flat = unpack_codes(pack_codes(b"".join(matrix["cells"])), len(matrix["students"]) * len(matrix["dates"]))
+    width = len(matrix["dates"])
+    for i, student in enumerate(matrix["students"]):
+        for j, day in enumerate(matrix["dates"]):
+            assert flat[i * width + j] == expected.get((student['id'], day), 0)
@@ -0,0 +1,25 @@
+# Metrics tests
+# Statement labels don't depend on the projection a client picks, and
+# statements run inside transaction() are timed too.
+
+from database import transaction
+from metrics import DB_DURATION, statement_label
+from pagination import Listing
+
+LISTING = Listing(columns={"id": "id", "name": "name", "grade": "grade"}, source="items", order=["id"])
+
+
+def test_listing_projection_is_not_part_of_the_label():
+    labels = {statement_label(LISTING.query(LISTING.fields(fields), None, 10)[0])
+              for fields in (None, "id", "name", "grade,name")}
+    assert labels == {"SELECT ... FROM items ORDER BY id LIMIT ?"}
+    assert statement_label("SELECT 1 FROM t WHERE a = 'x' AND b IN (?, ?)") == \
+        "SELECT ... FROM t WHERE a = ? AND b IN (...)"
+
+
+def test_transaction_statements_are_timed(school):
+    sql = "UPDATE classes SET name_ur = name_ur WHERE id > ?"
+    with transaction() as conn:
+        conn.execute(sql, (0,))
+    observed = {labels[0] for labels in DB_DURATION._series}
+    assert {statement_label(sql), "BEGIN IMMEDIATE", "COMMIT"} <= observed
@@ -0,0 +1,93 @@
+# Schema migration tests
+# Files at an older PRAGMA user_version are brought up to SCHEMA_VERSION
+# by init_db, one MIGRATIONS step at a time.
+
+import sqlite3
+
+import pytest
+
+import database
+from database import SCHEMA_VERSION, execute_query, init_db
+
+# notifications as of schema version 1: dispatch columns, but duplicates allowed and no 'cancelled'
+NOTIFICATIONS_V1 = """
+    CREATE TABLE notifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL REFERENCES students(id),
+        class_id INTEGER NOT NULL REFERENCES classes(id),
+        date TEXT NOT NULL,
+        message TEXT,
+        status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'queued', 'sending', 'sent', 'failed')),
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        sent_at TEXT
+    )
+"""
+
+
+def downgrade(path: str, version: int, *statements: str) -> None:
+    """Rewrite a generated file as an older schema version would have left it."""
+    database.close_pools()
+    conn = sqlite3.connect(path)
+    with conn:
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {version}")
+    conn.close()
+
+
+def user_version() -> int:
+    return execute_query("PRAGMA user_version")[0][0]
+
+
+def test_fresh_file_is_current(school):
+    assert user_version() == SCHEMA_VERSION
+
+
+def test_migration_2_deduplicates_notifications(school):
+    downgrade(
+        school,
+        1,
+        "ALTER TABLE notifications RENAME TO notifications_current",
+        NOTIFICATIONS_V1,
+        "INSERT INTO notifications SELECT * FROM notifications_current",
+        "DROP TABLE notifications_current",
+    )
+    [first] = execute_query("SELECT id, student_id, class_id, date FROM notifications ORDER BY id LIMIT 1")
+    duplicate = (first['student_id'], first['class_id'], first['date'])
+    conn = sqlite3.connect(school)
+    with conn:
+        conn.execute("UPDATE notifications SET status = 'pending' WHERE id = ?", (first['id'],))
+        conn.executemany("INSERT INTO notifications (student_id, class_id, date, status) VALUES (?, ?, ?, ?)",
+                         [duplicate + ("failed",), duplicate + ("sent",), duplicate + ("pending",)])
+    before = conn.execute("SELECT COUNT(DISTINCT student_id || date) FROM notifications").fetchone()[0]
+    conn.close()
+
+    init_db()
+    assert user_version() == SCHEMA_VERSION
+    rows = execute_query("SELECT status FROM notifications WHERE student_id = ? AND date = ?",
+                         (duplicate[0], duplicate[2]))
+    assert [row['status'] for row in rows] == ["sent"]  # the one furthest along survives
+    assert execute_query("SELECT COUNT(*) FROM notifications")[0][0] == before
+    indexes = {row[0] for row in execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'notifications'")}
+    assert "idx_notifications_dispatch" in indexes
+
+    with database.transaction() as conn:
+        conn.execute("UPDATE notifications SET status = 'cancelled' WHERE student_id = ? AND date = ?",
+                     (duplicate[0], duplicate[2]))
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO notifications (student_id, class_id, date) VALUES (?, ?, ?)", duplicate)
+
+
+def test_migration_3_populates_student_stats(school):
+    expected = [tuple(row) for row in execute_query("SELECT * FROM student_attendance_stats ORDER BY 1, 2")]
+    assert expected
+    downgrade(school, 2, "DELETE FROM student_attendance_stats")
+    assert execute_query("SELECT COUNT(*) FROM student_attendance_stats")[0][0] == 0
+
+    init_db()
+    assert user_version() == SCHEMA_VERSION
+    assert [tuple(row) for row in execute_query("SELECT * FROM student_attendance_stats ORDER BY 1, 2")] == expected
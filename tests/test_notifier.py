@@ -0,0 +1,163 @@
+# Notification dispatch tests
+# Claims are leases that expire, transient failures back off exponentially
+# until NOTIFY_MAX_ATTEMPTS, and the dispatcher sends through a gateway.
+
+import asyncio
+import time
+
+import pytest
+
+import notifier
+from constants import NOTIFY_RETRY_BASE, NOTIFY_RETRY_MAX
+from database import execute_query, transaction
+from notifier import Dispatcher, Gateway, GatewayError, claim_batch, queue_notifications, record_results, retry_delay
+
+
+class RecordingGateway(Gateway):
+    """Collects sent messages; fails each phone number for the first ``failures`` sends."""
+
+    name = "test"
+
+    def __init__(self, failures: int = 0, retryable: bool = True):
+        super().__init__(rate=0)
+        self.sent: list[tuple[str, str]] = []
+        self.failures = failures
+        self.retryable = retryable
+        self.calls: dict[str, int] = {}
+
+    async def send(self, phone: str, text: str) -> None:
+        self.calls[phone] = self.calls.get(phone, 0) + 1
+        if self.calls[phone] <= self.failures:
+            raise GatewayError("provider down", retryable=self.retryable)
+        self.sent.append((phone, text))
+
+
+def statuses() -> dict[int, str]:
+    return {row['id']: row['status'] for row in execute_query("SELECT id, status FROM notifications")}
+
+
+def queue_some(count: int = 3) -> list[int]:
+    """Queue ``count`` notifications of students with a phone number; returns their ids."""
+    ids = [row['id'] for row in execute_query("""
+        SELECT n.id FROM notifications n JOIN students s ON s.id = n.student_id
+        WHERE s.parent_phone IS NOT NULL ORDER BY n.id LIMIT ?
+    """, (count,))]
+    assert len(ids) == count
+    with transaction() as conn:
+        conn.execute(f"UPDATE notifications SET status = 'pending' WHERE id IN ({','.join('?' * count)})", ids)
+    for notification_id in ids:
+        assert queue_notifications(notification_id) == 1
+    return ids
+
+
+def test_gateway_is_abstract():
+    with pytest.raises(TypeError):
+        Gateway()
+
+
+@pytest.mark.parametrize("attempts", [1, 2, 3, 10, 20])
+def test_retry_delay_doubles_up_to_the_cap(attempts):
+    expected = min(NOTIFY_RETRY_MAX, NOTIFY_RETRY_BASE * 2 ** (attempts - 1))
+    for _ in range(20):
+        assert 0.8 * expected <= retry_delay(attempts) <= 1.2 * expected
+
+
+def test_claim_leases_rows_until_they_expire(school):
+    ids = queue_some()
+    claimed = claim_batch(10, lease=60)
+    assert sorted(row['id'] for row in claimed) == ids
+    assert all(row['attempts'] == 1 for row in claimed)
+    assert {statuses()[i] for i in ids} == {"sending"}
+    assert claim_batch(10, lease=60) == []  # still leased
+
+    with transaction() as conn:  # the worker holding the lease died a while ago
+        conn.execute(f"UPDATE notifications SET next_attempt_at = ? WHERE id IN ({','.join('?' * len(ids))})",
+                     (time.time() - 1, *ids))
+    reclaimed = claim_batch(10, lease=60)
+    assert sorted(row['id'] for row in reclaimed) == ids
+    assert all(row['attempts'] == 2 for row in reclaimed)
+
+
+def test_results_retry_with_backoff_then_fail(school):
+    ids = queue_some(2)
+    retryable, permanent = claim_batch(10)
+    before = time.time()
+    counts = record_results([(retryable, GatewayError("timeout")), (permanent, GatewayError("bad number", False))],
+                            max_attempts=2)
+    assert counts == {"sent": 0, "retry": 1, "failed": 1}
+    row = execute_query("SELECT status, next_attempt_at, last_error FROM notifications WHERE id = ?",
+                        (retryable['id'],))[0]
+    assert row['status'] == "queued" and row['last_error'] == "timeout"
+    assert before + 0.8 * NOTIFY_RETRY_BASE <= row['next_attempt_at'] <= time.time() + 1.2 * NOTIFY_RETRY_BASE
+    assert statuses()[permanent['id']] == "failed"
+
+    with transaction() as conn:  # the backoff has passed
+        conn.execute("UPDATE notifications SET next_attempt_at = 0 WHERE id = ?", (retryable['id'],))
+    [again] = claim_batch(10)
+    assert again['attempts'] == 2
+    assert record_results([(again, GatewayError("timeout"))], max_attempts=2)["failed"] == 1
+    assert statuses()[ids[0]] == "failed"
+
+
+def test_results_ignore_rows_whose_lease_was_lost(school):
+    [notification_id] = queue_some(1)
+    [row] = claim_batch(10)
+    with transaction() as conn:  # another worker reclaimed and finished it
+        conn.execute("UPDATE notifications SET status = 'sent' WHERE id = ?", (notification_id,))
+    record_results([(row, GatewayError("timeout"))])
+    assert statuses()[notification_id] == "sent"
+
+
+def test_dispatcher_retries_until_sent(school, monkeypatch):
+    monkeypatch.setattr(notifier, "retry_delay", lambda attempts: 0)
+    ids = queue_some()
+    gateway = RecordingGateway(failures=1)
+    dispatcher = Dispatcher(gateway, max_attempts=3)
+
+    async def drain():
+        while await dispatcher.dispatch_once():
+            pass
+
+    asyncio.run(drain())
+    assert {statuses()[i] for i in ids} == {"sent"}
+    assert len(gateway.sent) == 3 and set(gateway.calls.values()) == {2}
+
+
+def test_dispatcher_fails_non_retryable_errors_at_once(school):
+    ids = queue_some(2)
+    gateway = RecordingGateway(failures=1, retryable=False)
+    assert asyncio.run(Dispatcher(gateway).dispatch_once()) == 2
+    assert {statuses()[i] for i in ids} == {"failed"}
+    assert claim_batch(10) == []
+
+
+def test_wake_during_a_batch_is_not_lost(school):
+    first, second = queue_some(2)
+    with transaction() as conn:  # only the first is due for now
+        conn.execute("UPDATE notifications SET status = 'pending' WHERE id = ?", (second,))
+
+    async def run() -> None:
+        gateway = RecordingGateway()
+        dispatcher = Dispatcher(gateway, poll_interval=60)
+
+        original = gateway.send
+
+        async def send_and_queue(phone: str, text: str) -> None:
+            await original(phone, text)
+            if len(gateway.sent) == 1:  # a new notification is queued while the batch runs
+                await asyncio.to_thread(queue_notifications, second)
+                dispatcher.wake()
+
+        gateway.send = send_and_queue
+        dispatcher.start()
+        try:
+            for _ in range(100):
+                if len(gateway.sent) == 2:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await dispatcher.stop()
+        assert len(gateway.sent) == 2, "the second notification waited for the next poll"
+
+    asyncio.run(run())
+    assert statuses()[first] == statuses()[second] == "sent"
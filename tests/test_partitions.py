@@ -0,0 +1,74 @@
+# Partition file tests
+# Splitting a closed academic year into its own file keeps every read of
+# that year the same, including on pooled connections that were opened
+# (as in a running app's workers) before the split.
+
+import pytest
+
+import database
+from archive import compact_year
+from conftest import END, login
+from database import execute_query
+from partitions import partition_path, split_year
+
+YEAR = 2023  # April 2023 to March 2024, closed before END
+
+
+@pytest.fixture
+def school(make_school):
+    """Overrides conftest's: attendance from October 2023, so academic year 2023-24 can be split."""
+    return make_school(years=1.5)
+
+
+def year_reads(client, student_id: int) -> tuple:
+    notifications, cursor = [], None
+    while True:
+        page = client.get("/api/notifications", params={"year": YEAR, "limit": 1000}
+                          | ({"cursor": cursor} if cursor else {})).json()
+        notifications += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    report = client.get(f"/api/principal/student/{student_id}",
+                        params={"from": "2023-10-01", "to": "2024-03-31", "limit": 1000}).json()
+    export = client.get("/api/principal/export/attendance.csv", params={"start": "2023-10-01", "end": "2024-03-31"})
+    return notifications, report["records"], report["summary"], export.text
+
+
+def test_split_is_picked_up_by_open_connections(client):
+    login(client, "principal")
+    compact_year(YEAR, today=END)  # split_year would do it first; archived rows read back without ids
+    student_id = execute_query("SELECT MIN(id) FROM students")[0][0]
+    before = year_reads(client, student_id)
+    assert before[0] and before[1] and before[3].count("\n") > 1000
+    pools = dict(database._pools)
+
+    result = split_year(YEAR, today=END)  # as partitions.py would, with the app's pools left open
+    assert result["notifications"] == len(before[0])
+    assert database._pools == pools
+
+    assert year_reads(client, student_id) == before
+    with database.get_pool(readonly=True).connection() as conn:
+        assert database.attached_partitions(conn) == [f"y{YEAR}"]
+    assert execute_query("SELECT COUNT(*) FROM main.notifications WHERE date BETWEEN '2023-04-01' AND '2024-03-31'"
+                         )[0][0] == 0
+
+
+def test_split_refuses_open_and_repeated_years(school):
+    with pytest.raises(ValueError, match="not ended"):
+        split_year(2024, today=END)
+    split_year(YEAR, today=END)
+    with pytest.raises(ValueError, match="already split"):
+        split_year(YEAR, today=END)
+    assert partition_path(YEAR).endswith("-2023-24.db")
+
+
+def test_split_by_another_process_is_seen_after_the_check_interval(school, monkeypatch):
+    monkeypatch.setattr(database, "DB_PARTITIONS_CHECK_INTERVAL", 60)
+    assert database.partitions() == []
+    monkeypatch.setattr(database, "expire_partitions", lambda: None)  # as if split elsewhere
+    split_year(YEAR, today=END)
+    assert database.partitions() == []
+
+    monkeypatch.setattr(database, "_partitions_checked", 0.0)
+    assert [p.year for p in database.partitions()] == [YEAR]
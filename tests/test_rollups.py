@@ -0,0 +1,66 @@
+# Student rollup tests
+# student_summary combines whole months from student_attendance_stats with
+# raw counts for the partly covered months at either edge; every range
+# must give the same totals as counting attendance_all directly.
+
+import pytest
+
+from database import execute_query
+from rollups import student_summary
+
+
+def direct_counts(student_id: int, start, end) -> dict[str, int]:
+    row = execute_query("""
+        SELECT COALESCE(SUM(status = 'present'), 0), COALESCE(SUM(status = 'absent'), 0),
+               COALESCE(SUM(status = 'late'), 0)
+        FROM attendance_all
+        WHERE student_id = ? AND date BETWEEN ? AND ?
+    """, (student_id, start or "0001-01-01", end or "9999-12-31"))[0]
+    return {"present": row[0], "absent": row[1], "late": row[2], "total": sum(row)}
+
+
+@pytest.fixture
+def half_year(make_school):
+    """A school with attendance from October 2024 to March 2025, across a calendar year."""
+    return make_school(years=0.5)
+
+
+@pytest.mark.parametrize("start, end", [
+    (None, None),
+    ("2024-11-01", "2025-02-28"),  # whole months only
+    ("2024-11-15", "2025-02-28"),  # partial first month
+    ("2024-11-01", "2025-02-14"),  # partial last month
+    ("2024-11-15", "2025-02-14"),  # both edges partial
+    ("2024-12-31", "2025-01-31"),  # one day before a whole month, across the new year
+    ("2025-01-10", "2025-01-20"),  # inside one month
+    ("2025-01-20", "2025-02-10"),  # parts of two months, none whole
+    ("2025-03-03", "2025-03-03"),  # a single day
+    ("2025-02-01", None),  # open end
+    (None, "2024-12-15"),  # open start
+    ("2026-01-01", "2026-12-31"),  # no attendance
+])
+def test_summary_matches_direct_counts(half_year, start, end):
+    assert execute_query("SELECT MIN(date) FROM attendance")[0][0] < "2024-11-01"
+    students = [row[0] for row in execute_query("SELECT id FROM students ORDER BY id LIMIT 5")]
+    for student_id in students:
+        summary = student_summary(student_id, start, end)
+        assert {k: summary[k] for k in ("present", "absent", "late", "total")} == \
+            direct_counts(student_id, start, end), (student_id, start, end)
+
+
+def test_summary_follows_saved_attendance(school):
+    from main import _save_attendance
+
+    [student] = execute_query("SELECT id, class_id FROM students ORDER BY id LIMIT 1")
+    day = execute_query("SELECT MAX(date) FROM attendance WHERE student_id = ?", (student['id'],))[0][0]
+    before = student_summary(student['id'], "2025-01-01", "2025-03-31")
+    status = execute_query("SELECT status FROM attendance WHERE student_id = ? AND date = ?",
+                           (student['id'], day))[0][0]
+    new_status = "late" if status != "late" else "absent"
+    _save_attendance(student['class_id'], day, {student['id']: new_status}, 1)
+
+    after = student_summary(student['id'], "2025-01-01", "2025-03-31")
+    assert after[new_status] == before[new_status] + 1 and after[status] == before[status] - 1
+    assert {k: after[k] for k in ("present", "absent", "late", "total")} == \
+        direct_counts(student['id'], "2025-01-01", "2025-03-31")
+    assert student_summary(student['id'])["total"] == direct_counts(student['id'], None, None)["total"]